@@ -0,0 +1,116 @@
+"""Benchmark dashboard aggregations: pandas from scratch vs incremental rollups.
+
+Also checks that the rollups reproduce the dashboard's pandas output
+(daily counts, 7-day rolling means, monthly totals, task statistics).
+
+Usage: python benchmarks/bench_analytics.py [--events 1000000,10000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from civildoc.analytics import ACTIVITY_METRICS, AnalyticsAggregator
+
+TASK_TYPES = np.array(["Environmental Report", "Data Extraction", "Compliance Check"], dtype=object)
+BATCH = 100_000
+
+
+def make_events(n, seed):
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2021-01-01")
+    return {
+        "date": start + rng.integers(0, 3 * 365, n).astype("timedelta64[D]"),
+        "metric": rng.integers(0, len(ACTIVITY_METRICS), n),
+        "task_type": TASK_TYPES[rng.integers(0, len(TASK_TYPES), n)],
+        "completion_time": rng.normal(25, 8, n),
+        "accuracy": rng.normal(96, 2, n)
+    }
+
+
+def pandas_from_scratch(events):
+    """What the dashboard computed on every run, over the raw event log."""
+    frame = pd.DataFrame(events)
+    daily = (
+        frame.groupby(["date", "metric"]).size().unstack(fill_value=0)
+        .reindex(columns=range(len(ACTIVITY_METRICS)), fill_value=0)
+    )
+    daily = daily.reindex(pd.date_range(daily.index.min(), daily.index.max(), freq="D"), fill_value=0)
+    daily.columns = list(ACTIVITY_METRICS)
+    rolling = daily["documents_created"].rolling(7).mean()
+    month_end = "ME" if pd.__version__ >= "2.2" else "M"
+    monthly = daily.resample(month_end).sum()
+    insights = frame.groupby("task_type").agg({
+        "completion_time": ["mean", "std", "min", "max"],
+        "accuracy": ["mean", "std"]
+    }).round(2)
+    insights.columns = ["Avg Time", "Time Std", "Min Time", "Max Time", "Avg Accuracy", "Accuracy Std"]
+    return daily, rolling, monthly, insights
+
+
+def read_rollups(analytics):
+    daily = analytics.daily_frame()
+    rolling = daily["documents_created"].rolling(7).mean()
+    return daily, rolling, analytics.monthly_frame(), analytics.task_stats_frame().round(2)
+
+
+def ingest(analytics, events, start, stop):
+    for lo in range(start, stop, BATCH):
+        hi = min(lo + BATCH, stop)
+        metrics = np.asarray(ACTIVITY_METRICS, dtype=object)[events["metric"][lo:hi]]
+        analytics.add_activity(events["date"][lo:hi], metrics)
+        analytics.add_task_results(
+            events["task_type"][lo:hi], events["completion_time"][lo:hi], events["accuracy"][lo:hi]
+        )
+
+
+def check_equal(expected, actual):
+    daily, rolling, monthly, insights = expected
+    r_daily, r_rolling, r_monthly, r_insights = actual
+    assert np.array_equal(daily.to_numpy(), r_daily[list(ACTIVITY_METRICS)].to_numpy())
+    assert np.array_equal(daily.index.to_numpy(), r_daily["date"].to_numpy())
+    pd.testing.assert_series_equal(rolling.reset_index(drop=True), r_rolling, check_names=False)
+    assert np.array_equal(monthly.to_numpy(), r_monthly.to_numpy())
+    assert np.array_equal(monthly.index.to_numpy(), r_monthly.index.to_numpy())
+    pd.testing.assert_frame_equal(insights, r_insights, check_names=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", default="1000000,10000000")
+    parser.add_argument("--append", type=int, default=10_000, help="events in the incremental batch")
+    args = parser.parse_args()
+
+    print(f"{'events':>12} {'pandas run':>12} {'ingest':>10} {'append+read':>13} {'read only':>11}  match")
+    for n in [int(size) for size in args.events.split(",")]:
+        events = make_events(n + args.append, seed=n)
+
+        analytics = AnalyticsAggregator()
+        start = time.perf_counter()
+        ingest(analytics, events, 0, n)
+        ingest_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ingest(analytics, events, n, n + args.append)
+        actual = read_rollups(analytics)
+        append_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        read_rollups(analytics)
+        read_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        expected = pandas_from_scratch(events)
+        pandas_s = time.perf_counter() - start
+
+        check_equal(expected, actual)
+        print(f"{n:>12,} {pandas_s:>10.2f} s {ingest_s:>8.2f} s {append_ms:>10.1f} ms {read_ms:>8.1f} ms  yes")
+
+
+if __name__ == "__main__":
+    main()
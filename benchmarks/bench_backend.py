@@ -0,0 +1,143 @@
+"""Measure model backend throughput and latency at many concurrent sessions.
+
+Starts ``civildoc.mock_backend`` in its own process (4 calls at once,
+20 ms per call plus 1 ms per input, like a small inference server) and
+runs ``--sessions`` threads against it, each sending "suggest" requests
+back to back, as script threads of that many sessions would. Three
+clients are compared:
+
+* connection per request: a plain ``urllib`` POST per request, the
+  straightforward way to call a server from a script;
+* pooled: ``BackendClient`` with batching off (``max_batch=1``);
+* pooled + batched: ``BackendClient`` with its defaults.
+
+Reported per client: requests per second, p50 and p99 latency as seen by
+the sessions, errors, and the calls and connections the backend saw.
+Per-tenant rate limiting is off, since every session would hit it.
+
+Usage: python benchmarks/bench_backend.py [--sessions 200] [--duration 10]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from civildoc.backend import BackendClient, percentile
+
+SERVER = """
+import json, sys
+sys.path.insert(0, {root!r})
+from civildoc.mock_backend import MockBackend
+backend = MockBackend(slots={slots}, call_latency={call_latency}, input_latency={input_latency},
+                      failure_rate={failure_rate}, seed=0).start()
+print(backend.url, flush=True)
+sys.stdin.readline()
+print(json.dumps(backend.stats()), flush=True)
+"""
+
+
+class PlainClient:
+    """One urllib request, and so one connection, per call."""
+
+    def __init__(self, url, timeout):
+        self.url = url
+        self.timeout = timeout
+
+    def call(self, operation, input, tenant="local"):
+        request = urllib.request.Request(f"{self.url}/v1/{operation}", json.dumps({"inputs": [input]}).encode(),
+                                         {"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())["outputs"][0]
+
+    def close(self):
+        pass
+
+
+def start_server(args):
+    code = SERVER.format(root=ROOT, slots=args.slots, call_latency=args.call_latency,
+                         input_latency=args.input_latency, failure_rate=args.failure_rate)
+    server = subprocess.Popen([sys.executable, "-c", code], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    return server, server.stdout.readline().strip()
+
+
+def stop_server(server):
+    server.stdin.write("\n")
+    server.stdin.flush()
+    stats = json.loads(server.stdout.readline())
+    server.wait()
+    return stats
+
+
+def run_sessions(client, sessions, duration):
+    latencies = [[] for _ in range(sessions)]
+    errors = [0] * sessions
+    deadline = time.monotonic() + duration
+
+    def session(number):
+        input = {"heading": f"Section {number}", "text": f"Load case {number}: 12.5 kN/m over a 30 m span."}
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                client.call("suggest", input, tenant=f"user-{number}")
+            except Exception:
+                errors[number] += 1
+                continue
+            latencies[number].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=session, args=(number,)) for number in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    samples = [seconds for session_samples in latencies for seconds in session_samples]
+    return {
+        "requests_per_second": len(samples) / elapsed,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+        "errors": sum(errors)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--slots", type=int, default=4, help="calls the mock backend runs at once")
+    parser.add_argument("--call-latency", type=float, default=0.02)
+    parser.add_argument("--input-latency", type=float, default=0.001)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of backend calls answered with 503")
+    args = parser.parse_args()
+
+    clients = {
+        "connection per request": lambda url: PlainClient(url, timeout=30),
+        "pooled": lambda url: BackendClient(url, max_batch=1, tenant_rate=None),
+        "pooled + batched": lambda url: BackendClient(url, tenant_rate=None)
+    }
+    print(f"{args.sessions} sessions for {args.duration:g} s each; backend: {args.slots} slots, "
+          f"{args.call_latency * 1000:g} ms/call + {args.input_latency * 1000:g} ms/input")
+    print(f"{'client':>24} {'req/s':>8} {'p50':>9} {'p99':>9} {'errors':>7} {'calls':>7} {'inputs/call':>12} "
+          f"{'connections':>12}")
+    for name, make_client in clients.items():
+        server, url = start_server(args)
+        client = make_client(url)
+        try:
+            result = run_sessions(client, args.sessions, args.duration)
+        finally:
+            client.close()
+            backend = stop_server(server)
+        per_call = backend["inputs"] / backend["calls"] if backend["calls"] else 0.0
+        print(f"{name:>24} {result['requests_per_second']:>8.1f} {result['p50_ms']:>6.0f} ms {result['p99_ms']:>6.0f} ms "
+              f"{result['errors']:>7} {backend['calls']:>7} {per_call:>12.1f} {backend['connections']:>12}")
+
+
+if __name__ == "__main__":
+    main()
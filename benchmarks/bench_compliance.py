@@ -0,0 +1,119 @@
+"""Time full and incremental compliance checks of a long engineering report.
+
+A report of ``--pages`` pages (about 3,000 characters each) is generated
+with numbered section headings and clauses that trip some rules. The
+benchmark reports a cold full check, an unchanged re-check, and a
+re-check after a one-paragraph edit, against targets of 200 ms and
+20 ms.
+
+Usage: python benchmarks/bench_compliance.py [--pages 100] [--runs 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from civildoc.compliance import ComplianceChecker, RuleIndex, load_rules
+
+SECTIONS = [
+    "Project Overview", "Structural Design", "Foundations", "Fire Safety Strategy", "Access and Egress",
+    "Drainage", "Energy and Thermal Envelope", "Materials", "Construction Sequence", "Monitoring Plan"
+]
+FILLER = [
+    "The contractor shall coordinate temporary works with the principal designer before any excavation.",
+    "Loads have been combined in accordance with the partial factors for the persistent design situation.",
+    "Survey data was reconciled against the topographical model and the utility records provided.",
+    "All connections are to be inspected and signed off by the temporary works coordinator.",
+    "Settlement monitoring points will be installed along the boundary and read weekly during piling.",
+    "Quality records for concrete pours are retained with the cube test results for each element.",
+]
+CLAUSES = [
+    "Slab design follows BS 8110 for the podium.",
+    "The stair has a pitch of {n}° between floors.",
+    "Headroom of {m} mm is provided over the landing.",
+    "Balcony guarding at {g} mm above finished floor level.",
+    "Travel distance is {t} m to the nearest storey exit.",
+    "Access ramp at {r}% gradient to the side entrance.",
+    "Final levels TBC pending the topographical survey.",
+]
+
+
+def make_report(pages, seed=0):
+    rng = random.Random(seed)
+    paragraphs_per_page = 6
+    parts = []
+    for page in range(pages):
+        if page % 3 == 0:
+            number = page // 3 + 1
+            parts.append(f"## {number}. {SECTIONS[page // 3 % len(SECTIONS)]}")
+        for _ in range(paragraphs_per_page):
+            sentences = rng.choices(FILLER, k=4)
+            if rng.random() < 0.2:
+                sentences.append(rng.choice(CLAUSES).format(
+                    n=rng.choice([38, 42, 45]), m=rng.choice([1900, 2000, 2100]), g=rng.choice([900, 1100]),
+                    t=rng.choice([18, 45, 60]), r=rng.choice([5, 8, 10])
+                ))
+            parts.append(" ".join(sentences))
+    return "\n\n".join(parts)
+
+
+def timed(func, runs):
+    samples = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    rules = load_rules()
+    report = make_report(args.pages)
+    print(f"{args.pages} pages, {len(report):,} characters, {len(rules)} rules")
+
+    start = time.perf_counter()
+    index = RuleIndex(rules)
+    print(f"{'compile rule index':>24} {(time.perf_counter() - start) * 1000:8.2f} ms")
+
+    cold, cold_max, findings = timed(lambda: ComplianceChecker(index).check(report), args.runs)
+    print(f"{'full check (cold)':>24} {cold:8.2f} ms  max {cold_max:7.2f} ms  {len(findings)} findings  (target 200 ms)")
+
+    checker = ComplianceChecker(index)
+    checker.check(report)
+    warm, warm_max, _ = timed(lambda: checker.check(report), args.runs)
+    print(f"{'unchanged re-check':>24} {warm:8.2f} ms  max {warm_max:7.2f} ms")
+
+    paragraphs = report.split("\n\n")
+    rng = random.Random(1)
+    edits = []
+    for i in range(args.runs):
+        target = rng.randrange(len(paragraphs))
+        edited = list(paragraphs)
+        edited[target] += f" Revised note {i}: the stair has a pitch of 44° after re-levelling."
+        edits.append("\n\n".join(edited))
+    checked_before = checker.blocks_checked
+    samples = []
+    for text in edits:
+        checker.check(report)
+        start = time.perf_counter()
+        edited_findings = checker.check(text)
+        samples.append((time.perf_counter() - start) * 1000)
+    rechecked = (checker.blocks_checked - checked_before) / len(edits)
+    print(f"{'one-paragraph edit':>24} {statistics.median(samples):8.2f} ms  max {max(samples):7.2f} ms  "
+          f"{rechecked:.1f} block(s) re-checked  (target 20 ms)")
+    assert len(edited_findings) >= len(findings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Measure per-rerun payload size and render time of the document list.
+
+Compares rendering every document card (the old ``for doc in documents``
+loop) against the cursor-paged window, headlessly through AppTest.
+
+Usage: python benchmarks/bench_document_list.py [--documents 1000] [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.testing.v1 import AppTest
+
+from civildoc.store import DocumentStore
+from bench_store import make_documents
+
+SCRIPTS = {
+    "all cards": """
+import sys
+sys.path.insert(0, {root!r})
+from civildoc.components import render_document_card
+from civildoc.store import DocumentStore
+store = DocumentStore({db!r})
+for doc in store.list_documents(limit=store.count_documents()):
+    render_document_card(doc)
+""",
+    "paged window": """
+import sys
+sys.path.insert(0, {root!r})
+from civildoc.components import render_document_list
+from civildoc.store import DocumentStore
+render_document_list(DocumentStore({db!r}), [None], page_size=20)
+""",
+}
+
+
+def payload_bytes(node):
+    """Sum the serialized protobuf size of every element in the tree."""
+    total = 0
+    proto = getattr(node, "proto", None)
+    if proto is not None and hasattr(proto, "ByteSize"):
+        total += proto.ByteSize()
+    for child in getattr(node, "children", {}).values():
+        total += payload_bytes(child)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "bench.db")
+        DocumentStore(db).upsert_documents(make_documents(args.documents))
+
+        print(f"{args.documents:,} documents")
+        print(f"{'variant':>14} {'payload':>12} {'elements':>10} {'rerun p50':>12}")
+        for name, script in SCRIPTS.items():
+            at = AppTest.from_string(script.format(root=ROOT, db=db), default_timeout=120).run()
+            samples = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                at.run()
+                samples.append((time.perf_counter() - start) * 1000)
+            elements = len(at.markdown) + len(at.button)
+            print(f"{name:>14} {payload_bytes(at._tree) / 1024:>9.1f} KB {elements:>10,} "
+                  f"{statistics.median(samples):>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
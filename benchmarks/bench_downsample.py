@@ -0,0 +1,58 @@
+"""Benchmark serialized figure size and build time with chart downsampling.
+
+Builds the Document Activity Trend figure for a long daily/hourly series
+and reports the serialized figure JSON size and the time to downsample,
+build and serialize it. Browser-side rendering time scales with the
+number of points sent, which the "points" column shows.
+
+Usage: python benchmarks/bench_downsample.py [--points 10000,100000,1000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import plotly.graph_objects as go
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from civildoc.downsample import METHODS, downsample, max_points_for_width
+
+
+def build_figure(x, y, method, max_points):
+    xs, ys = downsample(x, y, max_points, method=method)
+    fig = go.Figure(go.Scatter(x=xs, y=ys, mode="lines", name="Documents Created"))
+    fig.update_layout(height=400, xaxis_title="Date", yaxis_title="Count (7-day average)")
+    return fig, len(xs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", default="10000,100000,1000000")
+    parser.add_argument("--width", type=int, default=600, help="chart width in pixels")
+    args = parser.parse_args()
+
+    max_points = max_points_for_width(args.width)
+    rng = np.random.default_rng(0)
+    # Plotly validates lazily on first use; keep that out of the measurements
+    build_figure(np.arange(10), np.arange(10.0), "none", max_points)[0].to_json()
+
+    print(f"cap {max_points:,} points for a {args.width}px chart")
+    print(f"{'raw points':>11} {'method':>7} {'points':>9} {'figure JSON':>13} {'build+serialize':>16}")
+    for n in [int(size) for size in args.points.split(",")]:
+        x = np.datetime64("2000-01-01T00") + np.arange(n).astype("timedelta64[h]")
+        y = np.convolve(rng.poisson(2, n).astype(float), np.ones(7) / 7, mode="same")
+        y[rng.integers(0, n, 5)] += 25  # isolated peaks that must survive
+        for method in METHODS:
+            start = time.perf_counter()
+            fig, points = build_figure(x, y, method, max_points)
+            payload = fig.to_json()
+            elapsed = (time.perf_counter() - start) * 1000
+            kept_peak = np.isclose(max(fig.data[0].y), y.max())
+            print(f"{n:>11,} {method:>7} {points:>9,} {len(payload) / 1024:>10.1f} KB {elapsed:>13.1f} ms"
+                  f"{'' if kept_peak else '  (peak lost)'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Measure embedding index latency and recall at 10k, 100k and 1M passages.
+
+Passage vectors are synthetic: unit vectors scattered around a few
+thousand topic directions, 256-dimensional like the hashing embedder.
+Queries are perturbed copies of random passages. Each index is built
+and saved, then reopened memory-mapped. Exhaustive search is timed, and
+IVF search is timed for several ``nprobe`` values, with recall@10
+measured against the exhaustive results.
+
+A separate text run chunks and embeds a generated corpus with the
+hashing embedder and times an incremental document update.
+
+Usage: python benchmarks/bench_embeddings.py [--sizes 10000,100000,1000000] [--queries 100]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from civildoc.retrieval import EmbeddingIndex, HashingEmbedder, embed_documents
+
+DIM = 256
+TOPICS = 2000
+NPROBES = (8, 24, 64)
+
+
+def synthetic_vectors(n, rng, topics):
+    vectors = np.empty((n, DIM), dtype=np.float32)
+    for i in range(0, n, 100_000):
+        m = min(100_000, n - i)
+        block = topics[rng.integers(0, len(topics), m)] + rng.standard_normal((m, DIM), dtype=np.float32) * 0.06
+        vectors[i:i + m] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    return vectors
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.95) - 1]
+
+
+def time_queries(index, queries, nprobe):
+    samples, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = index.search_vector(query, k=10, nprobe=nprobe)
+        samples.append((time.perf_counter() - start) * 1000)
+        results.append({(hit["doc_id"], hit["start"]) for hit in hits})
+    return samples, results
+
+
+def bench_size(n, args, rng, topics):
+    vectors = synthetic_vectors(n, rng, topics)
+    doc_ids = [f"doc-{i // 20}" for i in range(n)]
+    spans = [(i % 20 * 800, i % 20 * 800 + 800) for i in range(n)]
+    picks = rng.integers(0, n, args.queries)
+    queries = vectors[picks] + rng.standard_normal((args.queries, DIM), dtype=np.float32) * 0.03
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        index = EmbeddingIndex.from_vectors(vectors, doc_ids, spans, path=tmp)
+        build = time.perf_counter() - start
+        del vectors
+        size_mb = os.path.getsize(os.path.join(tmp, "base", "vectors.npy")) / 1e6
+        nlist = len(index._base.centroids) if index._base.centroids is not None else 0
+        print(f"{n:>9,} passages  {size_mb:7.1f} MB memory-mapped  built in {build:6.1f} s"
+              f"{f'  (IVF, {nlist} lists)' if nlist else ''}")
+
+        # Warm the page cache once so every configuration reads from memory
+        time_queries(index, queries[:5], 0)
+        exact_times, exact = time_queries(index, queries, 0)
+        p50, p95 = percentiles(exact_times)
+        print(f"{'exhaustive':>22}  p50 {p50:8.2f} ms  p95 {p95:8.2f} ms  recall@10 1.000")
+        if nlist:
+            for nprobe in NPROBES:
+                times, results = time_queries(index, queries, nprobe)
+                recall = np.mean([len(a & b) / 10 for a, b in zip(results, exact)])
+                p50, p95 = percentiles(times)
+                print(f"{f'IVF nprobe={nprobe}':>22}  p50 {p50:8.2f} ms  p95 {p95:8.2f} ms  recall@10 {recall:.3f}")
+
+
+WORDS = (
+    "soil bearing capacity clay groundwater pile foundation highway pavement drainage culvert bridge deck "
+    "girder load span reinforcement concrete steel settlement survey gradient embankment noise dust habitat "
+    "the of and to for with is on at by"
+).split()
+
+
+def bench_text(args):
+    rng = random.Random(0)
+    documents = [
+        {"id": f"doc-{i}", "title": f"Report {i}",
+         "body": "\n\n".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(60, 160))) + "."
+                             for _ in range(rng.randint(5, 20)))}
+        for i in range(args.text_docs)
+    ]
+    embedder = HashingEmbedder(dim=DIM)
+    start = time.perf_counter()
+    vectors, doc_ids, spans = embed_documents(embedder, documents)
+    elapsed = time.perf_counter() - start
+    print(f"text pipeline: {len(documents):,} documents -> {len(vectors):,} passages chunked and embedded "
+          f"in {elapsed:.1f} s ({len(vectors) / elapsed:,.0f} passages/s)")
+    with tempfile.TemporaryDirectory() as tmp:
+        index = EmbeddingIndex.from_vectors(vectors, doc_ids, spans, embedder=embedder, path=tmp)
+        doc = dict(documents[0], body=documents[0]["body"] + "\n\nRevised groundwater monitoring plan.")
+        start = time.perf_counter()
+        index.update_document(doc)
+        update = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        hits = index.search("revised groundwater monitoring plan", k=5)
+        query = (time.perf_counter() - start) * 1000
+        print(f"{'incremental update':>22}  {update:8.2f} ms  (one document re-embedded into the delta)")
+        print(f"{'text query':>22}  {query:8.2f} ms  top hit {hits[0]['doc_id']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--text-docs", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    topics = rng.standard_normal((TOPICS, DIM), dtype=np.float32)
+    topics /= np.linalg.norm(topics, axis=1, keepdims=True)
+    for n in (int(size) for size in args.sizes.split(",")):
+        bench_size(n, args, rng, topics)
+    bench_text(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Measure dashboard cold-load time and memory against the selected date range.
+
+Writes a multi-year activity history into a temporary event log, then
+loads 30 days, one year and the full history in fresh subprocesses and
+reports load time and peak resident memory of each.
+
+Usage: python benchmarks/bench_events.py [--years 5] [--events-per-day 5000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from civildoc.analytics import ACTIVITY_METRICS
+from civildoc.events import EventLog
+
+LOAD_SCRIPT = """
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+from civildoc.analytics import AnalyticsAggregator
+from civildoc.events import EventLog
+log = EventLog({path!r})
+activity = log.read("activity", ["metric"], {start!r}, {end!r})
+analytics = AnalyticsAggregator()
+analytics.add_activity(activity["date"], log.decode("activity", "metric", activity["metric"]))
+analytics.daily_frame()
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "rows": len(activity["date"]),
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+}}))
+"""
+
+
+def write_history(log, years, per_day):
+    rng = np.random.default_rng(0)
+    start = np.datetime64("2019-01-01")
+    projects = np.array(["Highway Design", "Bridge Analysis", "Soil Testing"], dtype=object)
+    metrics = np.asarray(ACTIVITY_METRICS, dtype=object)
+    for month in range(years * 12):
+        first = (start.astype("datetime64[M]") + month).astype("datetime64[D]")
+        days = ((first.astype("datetime64[M]") + 1).astype("datetime64[D]") - first).astype(int)
+        n = days * per_day
+        log.append(
+            "activity",
+            first + rng.integers(0, days, n).astype("timedelta64[D]"),
+            metric=metrics[rng.integers(0, len(metrics), n)],
+            project_type=projects[rng.integers(0, len(projects), n)]
+        )
+    return start, start + np.timedelta64(years * 365, "D")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--events-per-day", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = EventLog(tmp)
+        start = time.perf_counter()
+        first, last = write_history(log, args.years, args.events_per_day)
+        print(f"wrote {args.years} years x {args.events_per_day:,} events/day in {time.perf_counter() - start:.1f}s")
+
+        ranges = {
+            "30 days": (str(last - 29), str(last)),
+            "1 year": (str(last - 364), str(last)),
+            "full history": (None, None)
+        }
+        print(f"{'range':>14} {'rows':>12} {'load':>9} {'peak RSS':>10}")
+        for name, (range_start, range_end) in ranges.items():
+            script = LOAD_SCRIPT.format(root=ROOT, path=tmp, start=range_start, end=range_end)
+            result = json.loads(subprocess.run(
+                [sys.executable, "-c", script], capture_output=True, text=True, check=True
+            ).stdout)
+            print(f"{name:>14} {result['rows']:>12,} {result['seconds']:>7.2f} s {result['max_rss_mb']:>7.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Measure dashboard render time with and without the figure cache.
+
+The Analytics Dashboard is rerun through Streamlit's AppTest. For the
+"rebuilt" runs the "figures" cache region is cleared first, so all five
+figures are built and serialized as before the cache. For the "cached"
+runs they come from the region. The region's size after the runs is its
+memory footprint; every entry is one figure's JSON.
+
+Usage: python benchmarks/bench_figures.py [--runs 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.testing.v1 import AppTest
+
+DASHBOARD_SCRIPT = os.path.join(ROOT, "pages", "1_📊_Analytics_Dashboard.py")
+
+
+def time_runs(at, runs, before=None):
+    samples = []
+    for _ in range(runs):
+        if before:
+            before()
+        start = time.perf_counter()
+        at.run()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["CIVILDOC_DATA_DIR"] = tmp
+        from civildoc.figures import figure_cache
+        figures = figure_cache()
+
+        at = AppTest.from_file(DASHBOARD_SCRIPT, default_timeout=120).run()
+        at.run()
+        rebuilt = time_runs(at, args.runs, before=figures.invalidate)
+        cached = time_runs(at, args.runs)
+        assert not at.exception, at.exception
+        stats = figures.stats()
+
+    print(f"dashboard rerun, median of {args.runs}:")
+    print(f"  figures rebuilt  {rebuilt:7.1f} ms")
+    print(f"  figures cached   {cached:7.1f} ms  saves {rebuilt - cached:.1f} ms per render "
+          f"({(rebuilt - cached) / rebuilt:.0%})")
+    print(f"figure cache: {stats['entries']} figures, {stats['bytes'] / 1024:.1f} KB of JSON, "
+          f"hit rate {stats['hit_rate']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Measure filtered dashboard aggregation against a full-year scan.
+
+Writes a year of activity and task results across five project types
+and three task types, then times ``aggregate_events()`` (what the
+dashboard caches per filter combination) for narrowing date ranges and
+filters. The last line reads the full year and filters afterwards, as
+the dashboard would without pushdown. Timings are the median of
+``--repeats`` warm runs.
+
+Usage: python benchmarks/bench_filters.py [--events-per-day 20000] [--repeats 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from civildoc.analytics import ACTIVITY_METRICS, AnalyticsAggregator, aggregate_events
+from civildoc.events import EventLog
+
+PROJECT_TYPES = ("Highway Design", "Bridge Analysis", "Soil Testing", "Environmental Impact", "Building Plans")
+TASK_TYPES = ("Environmental Report", "Data Extraction", "Compliance Check")
+
+YEAR = ("2023-01-01", "2023-12-31")
+MONTH = ("2023-10-01", "2023-10-31")
+
+
+def write_year(log, per_day, tasks_per_day):
+    rng = np.random.default_rng(0)
+    metrics = np.asarray(ACTIVITY_METRICS, dtype=object)
+    projects = np.asarray(PROJECT_TYPES, dtype=object)
+    tasks = np.asarray(TASK_TYPES, dtype=object)
+    first = np.datetime64(YEAR[0])
+    for month in range(12):
+        start = (first.astype("datetime64[M]") + month).astype("datetime64[D]")
+        days = ((start.astype("datetime64[M]") + 1).astype("datetime64[D]") - start).astype(int)
+        n = days * per_day
+        log.append(
+            "activity",
+            start + rng.integers(0, days, n).astype("timedelta64[D]"),
+            metric=metrics[rng.integers(0, len(metrics), n)],
+            project_type=projects[rng.integers(0, len(projects), n)]
+        )
+        n = days * tasks_per_day
+        log.append(
+            "task_results",
+            start + rng.integers(0, days, n).astype("timedelta64[D]"),
+            task_type=tasks[rng.integers(0, len(tasks), n)],
+            project_type=projects[rng.integers(0, len(projects), n)],
+            completion_time=rng.normal(25, 8, n),
+            accuracy=rng.normal(96, 2, n)
+        )
+
+
+def filter_after_scan(log, start, end, project_types, task_types):
+    """Full read of the range, filtered in memory afterwards."""
+    analytics = AnalyticsAggregator()
+    activity = log.read("activity", ["metric", "project_type"], start, end)
+    keep = np.isin(log.decode("activity", "project_type", activity["project_type"]), project_types)
+    analytics.add_activity(activity["date"][keep], log.decode("activity", "metric", activity["metric"][keep]))
+    results = log.read("task_results", ["task_type", "project_type", "completion_time", "accuracy"], start, end)
+    keep = np.isin(log.decode("task_results", "project_type", results["project_type"]), project_types)
+    if task_types is not None:
+        keep &= np.isin(log.decode("task_results", "task_type", results["task_type"]), task_types)
+    analytics.add_task_results(
+        log.decode("task_results", "task_type", results["task_type"][keep]),
+        results["completion_time"][keep],
+        results["accuracy"][keep]
+    )
+    return analytics
+
+
+def timed(func, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events-per-day", type=int, default=20000)
+    parser.add_argument("--tasks-per-day", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    cases = [
+        ("full year, all types", YEAR, None, None),
+        ("full year, 1 project type", YEAR, ("Bridge Analysis",), None),
+        ("1 month, all types", MONTH, None, None),
+        ("1 month, 1 project type", MONTH, ("Bridge Analysis",), None),
+        ("1 month, 1 project, 1 task type", MONTH, ("Bridge Analysis",), ("Data Extraction",))
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        log = EventLog(tmp)
+        start = time.perf_counter()
+        write_year(log, args.events_per_day, args.tasks_per_day)
+        print(f"wrote 1 year x {args.events_per_day:,} activity + {args.tasks_per_day:,} task events/day "
+              f"in {time.perf_counter() - start:.1f} s")
+
+        print(f"{'query':>34} {'activity rows':>14} {'time':>10} {'vs full year':>13}")
+        full = None
+        for name, (range_start, range_end), projects, tasks in cases:
+            ms, analytics = timed(lambda: aggregate_events(log, range_start, range_end, projects, tasks), args.repeats)
+            rows = int(analytics.daily_frame()[list(ACTIVITY_METRICS)].to_numpy().sum())
+            full = full or ms
+            print(f"{name:>34} {rows:>14,} {ms:>7.1f} ms {ms / full:>12.1%}")
+
+        ms, _ = timed(lambda: filter_after_scan(log, *YEAR, ("Bridge Analysis",), None), args.repeats)
+        print(f"{'full year, 1 project, no pushdown':>34} {'':>14} {ms:>7.1f} ms {ms / full:>12.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Measure ingestion throughput of building plans in pages per second per core.
+
+Sample plan sets are generated locally: PDFs whose pages carry a title
+block, dimension strings and a few thousand vector drawing operators (as
+CAD exports do), plus a multi-page TIFF. They are then ingested into a
+temporary store with 1 worker and with every core.
+
+Usage: python benchmarks/bench_ingest.py [--files 4] [--pages 100] [--ops 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image
+
+from civildoc.ingest import ingest_files, make_pool
+from civildoc.store import DocumentStore
+
+
+def _page_content(number, ops, rng):
+    lines = [
+        f"DRAWING A-{100 + number} GROUND FLOOR PLAN",
+        "SCALE 1:100 @ A1",
+        f"Room {number}.01 clear span {rng.randint(2400, 7200)} x {rng.randint(2400, 7200)} mm",
+        f"Slab thickness {rng.choice([150, 200, 250])} mm, imposed load {rng.choice([1.5, 2.5, 5.0])} kN/m\xb2",
+        f"Ramp gradient {rng.choice([5, 8])}% over {rng.randint(3, 12)} m",
+    ]
+    text = ["BT", "/F1 10 Tf", "40 800 Td"]
+    for i, line in enumerate(lines):
+        escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        if i:
+            text.append("0 -14 Td")
+        if i == 2:
+            # Kerned arrays as produced by most CAD drivers
+            head, tail = escaped.split(" clear span ")
+            text.append(f"[({head}) -250 (clear span {tail})] TJ")
+        else:
+            text.append(f"({escaped}) Tj")
+    text.append("ET")
+    drawing = [f"{rng.uniform(0, 595):.2f} {rng.uniform(0, 842):.2f} m "
+               f"{rng.uniform(0, 595):.2f} {rng.uniform(0, 842):.2f} l S" for _ in range(ops)]
+    return "\n".join(drawing + text).encode("cp1252")
+
+
+def write_sample_pdf(path, pages, ops, seed=0):
+    """Write a Flate-compressed, multi-page PDF plan set."""
+    rng = random.Random(seed)
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    }
+    kids = []
+    for number in range(1, pages + 1):
+        page_id, content_id = 2 + number * 2, 3 + number * 2
+        content = zlib.compress(_page_content(number, ops, rng))
+        objects[content_id] = (f"<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n".encode()
+                               + content + b"\nendstream")
+        objects[page_id] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 2384 1684] "
+                            f"/Contents {content_id} 0 R >>").encode()
+        kids.append(f"{page_id} 0 R")
+    objects[2] = (f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} "
+                  f"/Resources << /Font << /F1 3 0 R >> >> >>").encode()
+
+    offsets = {}
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        for num in sorted(objects):
+            offsets[num] = f.tell()
+            f.write(f"{num} 0 obj\n".encode() + objects[num] + b"\nendobj\n")
+        xref = f.tell()
+        size = max(objects) + 1
+        f.write(f"xref\n0 {size}\n0000000000 65535 f \n".encode())
+        for num in range(1, size):
+            f.write(f"{offsets.get(num, 0):010d} 00000 {'n' if num in offsets else 'f'} \n".encode())
+        f.write(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+
+
+def write_sample_tiff(path, pages):
+    frames = []
+    for number in range(pages):
+        frame = Image.new("L", (1200, 850), 255)
+        frames.append(frame)
+    frames[0].save(path, save_all=True, append_images=frames[1:], compression="tiff_deflate",
+                   description="Site survey sheet, SCALE 1:500, benchmark 12.450 m AOD")
+
+
+def run(paths, workers):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DocumentStore(os.path.join(tmp, "bench.db"))
+        with make_pool(workers) as pool:
+            # Warm the pool so process start-up is not counted
+            list(pool.map(abs, range(workers)))
+            start = time.perf_counter()
+            pages = 0
+            documents = []
+            for event in ingest_files(paths, store, executor=pool, workers=workers):
+                if event["type"] == "progress":
+                    pages = event["pages_done"]
+                elif event["type"] == "document":
+                    documents.append(event["document"])
+            elapsed = time.perf_counter() - start
+        measurements = sum(
+            len(page["measurements"]) for doc in documents for page in store.iter_pages(doc["id"])
+        )
+    return pages, elapsed, measurements
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--ops", type=int, default=2000)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.files):
+            path = os.path.join(tmp, f"plan_set_{i + 1}.pdf")
+            write_sample_pdf(path, args.pages, args.ops, seed=i)
+            paths.append(path)
+        tiff = os.path.join(tmp, "site_survey.tiff")
+        write_sample_tiff(tiff, 10)
+        paths.append(tiff)
+        size = sum(os.path.getsize(path) for path in paths)
+        print(f"{args.files} PDFs x {args.pages} pages ({args.ops:,} drawing ops/page) + 10-page TIFF, "
+              f"{size / 1e6:.1f} MB")
+
+        print(f"{'workers':>8} {'pages':>7} {'time':>9} {'pages/s':>9} {'pages/s/core':>13} {'measurements':>13}")
+        for workers in sorted({1, cores}):
+            pages, elapsed, measurements = run(paths, workers)
+            print(f"{workers:>8} {pages:>7,} {elapsed:>7.2f} s {pages / elapsed:>9,.1f} "
+                  f"{pages / elapsed / workers:>13,.1f} {measurements:>13,}")
+
+
+if __name__ == "__main__":
+    main()
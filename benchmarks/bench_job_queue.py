@@ -0,0 +1,121 @@
+"""Load-test the agent job queue: submit many jobs, report throughput and latency.
+
+Jobs are spread over several users with random priorities and the three
+seeded agent tasks. Each step sleeps for ``--step-ms`` to stand in for a
+model call. Queue latency is the time from submit to a worker starting
+the job. The peak number of running jobs per user is sampled to check
+the per-user limit.
+
+Usage: python benchmarks/bench_job_queue.py [--jobs 1000] [--users 8] [--workers 16] [--step-ms 5]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from civildoc.jobs import FINISHED_STATES, PRIORITIES, RUNNING, JobQueue
+from civildoc.store import SEED_DATA_PATH
+from civildoc.tasks import TaskEngine
+
+
+class SleepGenerator:
+    """Emits one chunk per step after a fixed delay."""
+
+    def __init__(self, step_seconds):
+        self.step_seconds = step_seconds
+
+    def stream_step(self, task, step, previous_sections, tenant=None):
+        time.sleep(self.step_seconds)
+        yield f"{step['name']} done.\n\n"
+
+
+def sample_peaks(queue, stop, peaks):
+    while not stop.is_set():
+        rows = queue._conn().execute(
+            "SELECT user_id, COUNT(*) FROM jobs WHERE status = ? GROUP BY user_id", (RUNNING,)
+        )
+        for user, n in rows:
+            peaks[user] = max(peaks.get(user, 0), n)
+        time.sleep(0.01)
+
+
+def percentiles(values):
+    return " ".join(f"p{p}={np.percentile(values, p) * 1000:8.1f} ms" for p in (50, 95, 99))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--user-limit", type=int, default=4)
+    parser.add_argument("--step-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    with open(SEED_DATA_PATH, encoding="utf-8") as f:
+        tasks = json.load(f)["agentTasks"]
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = JobQueue(os.path.join(tmp, "jobs.db"))
+        engine = TaskEngine(
+            max_workers=args.workers,
+            generator=SleepGenerator(args.step_ms / 1000),
+            queue=queue,
+            user_limit=args.user_limit
+        )
+        peaks = {}
+        stop = threading.Event()
+        sampler = threading.Thread(target=sample_peaks, args=(JobQueue(queue.path), stop, peaks))
+        sampler.start()
+
+        start = time.perf_counter()
+        submit_times = []
+        for i in range(args.jobs):
+            t0 = time.perf_counter()
+            engine.submit(
+                rng.choice(tasks),
+                user_id=f"user-{i % args.users}",
+                priority=rng.choice(list(PRIORITIES.values()))
+            )
+            submit_times.append(time.perf_counter() - t0)
+        submitted = time.perf_counter() - start
+
+        while sum(queue.counts().get(status, 0) for status in FINISHED_STATES) < args.jobs:
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        sampler.join()
+        engine.shutdown()
+
+        rows = queue._conn().execute("SELECT priority, complexity, submitted_at, started_at, finished_at FROM jobs")
+        rows = [tuple(row) for row in rows]
+
+    waits = np.array([started - submitted_at for _, _, submitted_at, started, _ in rows])
+    print(f"{args.jobs:,} jobs, {args.users} users, {args.workers} workers, "
+          f"user limit {args.user_limit}, {args.step_ms:g} ms per step")
+    print(f"submit      {percentiles(submit_times)}  ({args.jobs / submitted:,.0f} submits/s)")
+    print(f"throughput  {args.jobs / elapsed:,.1f} jobs/s over {elapsed:.2f} s")
+    print(f"queue wait  {percentiles(waits)}")
+    print("by priority")
+    for name, value in sorted(PRIORITIES.items(), key=lambda item: -item[1]):
+        priority_waits = [started - submitted_at for p, _, submitted_at, started, _ in rows if p == value]
+        print(f"  {name:>6}    {percentiles(priority_waits)}")
+    print("by complexity")
+    for complexity in sorted({row[1] for row in rows}):
+        complexity_waits = [started - submitted_at for _, c, submitted_at, started, _ in rows if c == complexity]
+        print(f"  {complexity:>6}    {percentiles(complexity_waits)}")
+    print(f"peak running per user: {max(peaks.values()) if peaks else 0} (limit {args.user_limit})")
+
+
+if __name__ == "__main__":
+    main()
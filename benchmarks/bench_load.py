@@ -0,0 +1,300 @@
+"""Load-test both pages headlessly with simulated concurrent sessions.
+
+Each simulated user gets its own AppTest sessions for the main app and
+the Analytics Dashboard, and runs in its own thread. Every few seconds
+(``--think``) the user does something a person would do: switches page,
+opens or edits and saves a document, searches, launches a task and
+watches it, or refreshes the dashboard. AppTest patches process-wide
+state on every run, so script runs are serialized with a lock, much as
+one server process runs them under the GIL. Task workers, suggestions
+and other background threads keep running in between.
+
+Reported: reruns per second, p50/p95/p99 rerun latency (overall and by
+action), time spent waiting for the lock, and resident memory added per
+session. ``--save-baseline`` writes these to JSON; ``--baseline``
+compares against a saved file and exits with status 1 when a latency or
+memory figure grows, or throughput drops, by more than ``--threshold``,
+or when any rerun raised.
+
+Usage: python benchmarks/bench_load.py [--sessions 8] [--duration 60] [--baseline FILE | --save-baseline FILE]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.testing.v1 import AppTest
+
+MAIN_SCRIPT = os.path.join(ROOT, "streamlit_app.py")
+DASHBOARD_SCRIPT = os.path.join(ROOT, "pages", "1_📊_Analytics_Dashboard.py")
+
+# Relative frequency of each user action
+ACTIONS = {
+    "navigate": 3,
+    "open_document": 2,
+    "search": 1,
+    "edit_document": 1,
+    "launch_task": 1,
+    "refresh_dashboard": 1
+}
+
+SEARCH_TERMS = ("report", "bridge", "soil", "highway", "structural", "zzz-no-match")
+
+# Metrics compared against a baseline: whether larger is worse, and a
+# change too small to count whatever the threshold (RSS moves in pages
+# and arenas, so a few sessions' memory is noisy)
+COMPARED = {
+    "reruns_per_second": (False, 0.2),
+    "p50_ms": (True, 5),
+    "p95_ms": (True, 10),
+    "p99_ms": (True, 20),
+    "memory_per_session_mb": (True, 2)
+}
+
+# Script runs of every session go through this lock; see module docstring
+_run_lock = threading.Lock()
+
+
+def rss_mb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Session:
+    """One simulated user with a main-app tab and a dashboard tab."""
+
+    def __init__(self, number, seed, timeout):
+        self.number = number
+        self.rng = random.Random(seed)
+        self.timeout = timeout
+        self.main = None
+        self.dashboard = None
+        self.page = "home"
+        self.samples = []
+        self.waits = []
+        self.errors = []
+
+    def step(self, action, interact):
+        """Run one interaction as one rerun and record its latency."""
+        queued = time.perf_counter()
+        with _run_lock:
+            start = time.perf_counter()
+            app = interact()
+            elapsed = time.perf_counter() - start
+        self.waits.append(start - queued)
+        self.samples.append((action, elapsed))
+        if app.exception:
+            self.errors.append(f"{action}: {app.exception[0].message}")
+        return app
+
+    def open(self):
+        with _run_lock:
+            self.main = AppTest.from_file(MAIN_SCRIPT, default_timeout=self.timeout).run()
+            self.dashboard = AppTest.from_file(DASHBOARD_SCRIPT, default_timeout=self.timeout).run()
+
+    def go_to(self, page, action):
+        if self.page != page:
+            button = {"home": 0, "documents": 1, "ai_tasks": 2}[page]
+            self.step(action, lambda: self.main.sidebar.button[button].click().run())
+            self.page = page
+
+    def navigate(self):
+        self.go_to(self.rng.choice(("home", "documents", "ai_tasks")), "navigate")
+
+    def open_document(self):
+        self.go_to("documents", "open_document")
+        views = [button for button in self.main.button if button.key and button.key.startswith("view_")]
+        if views:
+            self.step("open_document", self.rng.choice(views).click().run)
+
+    def search(self):
+        self.go_to("documents", "search")
+        term = self.rng.choice(SEARCH_TERMS)
+        self.step("search", lambda: self.main.text_input("document_search").input(term).run())
+        self.step("search", lambda: self.main.text_input("document_search").input("").run())
+
+    def edit_document(self):
+        self.go_to("documents", "edit_document")
+        edits = [button for button in self.main.button if button.key and button.key.startswith("edit_")]
+        if not edits:
+            return
+        self.step("edit_document", self.rng.choice(edits).click().run)
+        bodies = [area for area in self.main.text_area if area.key and area.key.startswith("document_body_")]
+        if not bodies:
+            return
+        body = bodies[0]
+        text = (body.value or "") + f"\n\nLoad test edit {self.number}-{self.rng.randrange(10**6)}."
+        self.step("edit_document", lambda: self.main.text_area(body.key).input(text).run())
+        saves = [button for button in self.main.button if "Save" in button.label]
+        if saves:
+            self.step("edit_document", saves[0].click().run)
+
+    def launch_task(self):
+        self.go_to("ai_tasks", "launch_task")
+        launches = [button for button in self.main.button if button.key and button.key.startswith("launch_")]
+        if not launches:
+            return
+        self.step("launch_task", self.rng.choice(launches).click().run)
+        # Progress polls, as the fragment timer would make
+        for _ in range(2):
+            time.sleep(self.rng.uniform(0.5, 1.0))
+            self.step("launch_task", self.main.run)
+
+    def refresh_dashboard(self):
+        refresh = [button for button in self.dashboard.button if "Refresh" in button.label]
+        if refresh:
+            self.step("refresh_dashboard", refresh[0].click().run)
+        else:
+            self.step("refresh_dashboard", self.dashboard.run)
+
+    def run(self, deadline, think):
+        names = list(ACTIONS)
+        weights = [ACTIONS[name] for name in names]
+        while time.monotonic() < deadline:
+            action = self.rng.choices(names, weights)[0]
+            try:
+                getattr(self, action)()
+            except Exception as exc:
+                self.errors.append(f"{action}: {exc!r}")
+            time.sleep(self.rng.uniform(0, 2 * think))
+
+
+def summarize(sessions, elapsed, memory_per_session):
+    latencies = [seconds * 1000 for session in sessions for _, seconds in session.samples]
+    waits = [seconds * 1000 for session in sessions for seconds in session.waits]
+    by_action = defaultdict(list)
+    for session in sessions:
+        for action, seconds in session.samples:
+            by_action[action].append(seconds * 1000)
+    return {
+        "sessions": len(sessions),
+        "reruns": len(latencies),
+        "reruns_per_second": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "wait_p95_ms": percentile(waits, 0.95),
+        "memory_per_session_mb": memory_per_session,
+        "errors": sum(len(session.errors) for session in sessions),
+        "actions": {
+            action: {
+                "reruns": len(samples),
+                "p50_ms": percentile(samples, 0.50),
+                "p95_ms": percentile(samples, 0.95)
+            }
+            for action, samples in sorted(by_action.items())
+        }
+    }
+
+
+def report(result):
+    print(f"{result['sessions']} sessions, {result['reruns']:,} reruns, "
+          f"{result['reruns_per_second']:.1f} reruns/s, {result['errors']} errors")
+    print(f"rerun latency p50 {result['p50_ms']:.1f} ms  p95 {result['p95_ms']:.1f} ms  "
+          f"p99 {result['p99_ms']:.1f} ms  (lock wait p95 {result['wait_p95_ms']:.1f} ms)")
+    print(f"memory per session {result['memory_per_session_mb']:.1f} MB")
+    for action, stats in result["actions"].items():
+        print(f"  {action:>17}  {stats['reruns']:>5} reruns  p50 {stats['p50_ms']:7.1f} ms  p95 {stats['p95_ms']:7.1f} ms")
+
+
+def regressions(result, baseline, threshold):
+    found = []
+    for metric, (larger_is_worse, slack) in COMPARED.items():
+        old, new = baseline.get(metric), result[metric]
+        if not old:
+            continue
+        worse = new - old if larger_is_worse else old - new
+        change = (new - old) / old
+        if worse > slack and worse / old > threshold:
+            found.append(f"{metric}: {old:.2f} -> {new:.2f} ({change:+.0%})")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=60, help="seconds of load after every session is open")
+    parser.add_argument("--think", type=float, default=1.0, help="mean seconds between a user's actions")
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed per rerun")
+    parser.add_argument("--baseline", help="compare against this baseline JSON and fail on regressions")
+    parser.add_argument("--save-baseline", help="write the results to this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # bench_store imports civildoc.store, which reads the data dir on import
+        os.environ["CIVILDOC_DATA_DIR"] = tmp
+        from bench_store import make_documents
+        from civildoc.store import open_store
+        open_store().upsert_documents(make_documents(args.documents))
+
+        # A throwaway session loads modules and process-wide caches, so the
+        # memory measured below is what each further session adds
+        Session(-1, args.seed, args.timeout).open()
+        gc.collect()
+        before = rss_mb()
+        sessions = [Session(number, args.seed * 1000 + number, args.timeout) for number in range(args.sessions)]
+        for session in sessions:
+            session.open()
+
+        deadline = time.monotonic() + args.duration
+        threads = [threading.Thread(target=session.run, args=(deadline, args.think)) for session in sessions]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        gc.collect()
+        result = summarize(sessions, elapsed, (rss_mb() - before) / args.sessions)
+        result["args"] = {"sessions": args.sessions, "duration": args.duration, "think": args.think,
+                          "documents": args.documents}
+
+    report(result)
+    for session in sessions:
+        for error in session.errors[:3]:
+            print(f"  session {session.number}: {error}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"baseline written to {args.save_baseline}")
+
+    failed = result["errors"] > 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("args") != result["args"]:
+            print(f"warning: baseline was recorded with {baseline.get('args')}")
+        found = regressions(result, baseline, args.threshold)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if not found:
+            print(f"no regressions beyond {args.threshold:.0%} of {args.baseline}")
+        failed = failed or bool(found)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Break down per-rerun time and payload of the main app by page region.
+
+Every delta a run sends is recorded and sorted into the static chrome
+(CSS, header, feature cards, footer), the sidebar, fragment regions and
+the rest of the page. A full rerun sends all of them. A click inside a
+fragment resends only that fragment's deltas, which is what the
+"fragment rerun" column shows. AppTest itself reruns the whole script on
+fragment clicks, so fragment rerun time is not measured here.
+
+Usage: python benchmarks/bench_page_shell.py [--documents 1000] [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+from streamlit.testing.v1 import AppTest
+
+PAGES = {"home": 0, "documents": 1, "ai_tasks": 2}
+REGIONS = ("chrome", "sidebar", "fragments", "page")
+
+_recorded = []
+_enqueue = ForwardMsgQueue.enqueue
+
+
+def _record(self, msg):
+    _recorded.append(msg)
+    return _enqueue(self, msg)
+
+
+def breakdown(messages, static_bodies):
+    """Bytes per region for the deltas in ``messages``."""
+    sizes = dict.fromkeys(REGIONS, 0)
+    for msg in messages:
+        if not msg.HasField("delta"):
+            continue
+        delta = msg.delta
+        size = msg.ByteSize()
+        if delta.fragment_id:
+            sizes["fragments"] += size
+        elif msg.metadata.delta_path[:1] == [1]:
+            sizes["sidebar"] += size
+        elif delta.HasField("new_element") and delta.new_element.markdown.body in static_bodies:
+            sizes["chrome"] += size
+        else:
+            sizes["page"] += size
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # bench_store imports civildoc.store, which reads the data dir on import
+        os.environ["CIVILDOC_DATA_DIR"] = tmp
+        from bench_store import make_documents
+        from civildoc.shell import STATIC_BODIES
+        from civildoc.store import open_store
+        open_store().upsert_documents(make_documents(args.documents))
+
+        ForwardMsgQueue.enqueue = _record
+        print(f"{args.documents:,} documents, median of {args.runs} full reruns")
+        print(f"{'page':>10} {'rerun p50':>11} " + " ".join(f"{region:>10}" for region in REGIONS)
+              + f" {'full rerun':>11} {'fragment rerun':>15}")
+        at = AppTest.from_file(os.path.join(ROOT, "streamlit_app.py"), default_timeout=120).run()
+        for page, button in PAGES.items():
+            at.sidebar.button[button].click().run()
+            samples = []
+            for _ in range(args.runs):
+                _recorded.clear()
+                start = time.perf_counter()
+                at.run()
+                samples.append((time.perf_counter() - start) * 1000)
+            sizes = breakdown(_recorded, STATIC_BODIES)
+            print(f"{page:>10} {statistics.median(samples):>8.1f} ms "
+                  + " ".join(f"{sizes[region] / 1024:>7.1f} KB" for region in REGIONS)
+                  + f" {sum(sizes.values()) / 1024:>8.1f} KB {sizes['fragments'] / 1024:>12.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Kill a task worker mid-task and check that the next one runs only the remaining steps.
+
+Two worker processes run a ``TaskEngine`` on one job queue in a
+temporary directory, with the stub generator slowed to ``--step-seconds``
+per step and leases of ``--lease`` seconds. Each step they generate is
+logged. Once ``--kill-after`` steps are checkpointed, the worker running
+the job is killed with SIGKILL, as a crash or redeploy would end it.
+The other worker must leave the job alone until then, and take it over
+once the dead worker's lease expires.
+
+Then, in one process, the job is stopped with ``cancel()`` after the
+same number of steps and continued with ``resume()``.
+
+Each scenario passes when the job completes, the steps generated after
+the interruption are exactly those not checkpointed before it, and the
+report matches an uninterrupted run. Reported: the steps each attempt
+ran, and the time after the interruption (including the lease) compared
+with a run from scratch. Exits with status 1 if a check fails.
+
+Usage: python benchmarks/bench_resume.py [--step-seconds 0.5] [--kill-after 3] [--lease 2]
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from civildoc.generation import StubGenerator
+from civildoc.jobs import COMPLETED, FINISHED_STATES, LEASE_SECONDS, JobQueue
+from civildoc.store import SEED_DATA_PATH
+from civildoc.tasks import TASK_STEPS, TaskEngine
+
+WORKER = """
+import sys
+sys.path.insert(0, {root!r})
+sys.path.insert(0, {benchmarks!r})
+from bench_resume import make_engine
+engine = make_engine({queue_path!r}, {log_path!r}, {step_seconds!r}, {lease!r})
+print(engine.worker_id, flush=True)
+sys.stdin.readline()
+"""
+
+
+class LoggedGenerator(StubGenerator):
+    """Stub generator that logs each step it starts and takes ``step_seconds`` per step."""
+
+    def __init__(self, log_path, step_seconds):
+        super().__init__(token_delay=0)
+        self.log_path = log_path
+        self.step_seconds = step_seconds
+
+    def stream_step(self, task, step, previous_sections, passages=None, tenant=None):
+        with open(self.log_path, "a", encoding="utf-8") as log:
+            log.write(f"{os.getpid()} {len(previous_sections)}\n")
+        time.sleep(self.step_seconds)
+        yield from super().stream_step(task, step, previous_sections, passages, tenant)
+
+
+def make_engine(queue_path, log_path, step_seconds, lease=LEASE_SECONDS):
+    return TaskEngine(generator=LoggedGenerator(log_path, step_seconds), queue=JobQueue(queue_path),
+                      lease_seconds=lease)
+
+
+def logged_steps(log_path):
+    """Step indexes started by each worker process, in order of first appearance."""
+    by_pid = {}
+    if os.path.exists(log_path):
+        with open(log_path, encoding="utf-8") as log:
+            for line in log:
+                pid, index = line.split()
+                by_pid.setdefault(pid, []).append(int(index))
+    return list(by_pid.values())
+
+
+def wait_for(queue, job_id, condition, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if condition(job):
+            return job
+        time.sleep(0.01)
+    raise TimeoutError(f"job {job_id} did not reach the expected state")
+
+
+def start_worker(queue_path, log_path, step_seconds, lease):
+    """Start a worker process; returns it once its engine runs, with its ``worker_id``."""
+    code = WORKER.format(root=ROOT, benchmarks=os.path.dirname(os.path.abspath(__file__)),
+                         queue_path=queue_path, log_path=log_path, step_seconds=step_seconds, lease=lease)
+    worker = subprocess.Popen([sys.executable, "-c", code], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    worker.worker_id = worker.stdout.readline().strip()
+    return worker
+
+
+def reference_report(task, tmp):
+    engine = make_engine(os.path.join(tmp, "reference.db"), os.path.join(tmp, "reference.log"), 0)
+    job_id = engine.submit(task)
+    job = wait_for(engine.queue, job_id, lambda job: job["status"] in FINISHED_STATES)
+    engine.shutdown()
+    return job["sections"]
+
+
+def check(name, job, attempts, checkpointed, expected, resumed_seconds, full_seconds):
+    failures = []
+    if job["status"] != COMPLETED:
+        failures.append(f"job ended {job['status']}")
+    if len(attempts) != 2:
+        failures.append(f"expected 2 attempts, saw {len(attempts)}")
+    elif attempts[1] != list(range(checkpointed, len(TASK_STEPS))):
+        failures.append(f"second attempt ran steps {attempts[1]}, expected {list(range(checkpointed, len(TASK_STEPS)))}")
+    if job["sections"] != expected:
+        failures.append("report differs from an uninterrupted run")
+    print(f"{name:>22}  checkpointed {checkpointed}/{len(TASK_STEPS)}  "
+          f"steps run: {' then '.join(str(steps) for steps in attempts)}  "
+          f"after interruption {resumed_seconds:.2f} s vs {full_seconds:.2f} s from scratch  "
+          f"{'ok' if not failures else 'FAILED: ' + '; '.join(failures)}")
+    return not failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--step-seconds", type=float, default=0.5)
+    parser.add_argument("--kill-after", type=int, default=3, help="checkpointed steps before the interruption")
+    parser.add_argument("--lease", type=float, default=2.0, help="seconds before a dead worker's job is requeued")
+    args = parser.parse_args()
+
+    with open(SEED_DATA_PATH, encoding="utf-8") as f:
+        task = json.load(f)["agentTasks"][0]
+    full_seconds = args.step_seconds * len(TASK_STEPS)
+    passed = True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        expected = reference_report(task, tmp)
+
+        # Crash: two workers share the queue; SIGKILL the one running the job
+        queue_path = os.path.join(tmp, "killed.db")
+        log_path = os.path.join(tmp, "killed.log")
+        queue = JobQueue(queue_path)
+        workers = [start_worker(queue_path, log_path, args.step_seconds, args.lease) for _ in range(2)]
+        job_id = queue.submit(task, "bench", total_steps=len(TASK_STEPS))
+        job = wait_for(queue, job_id, lambda job: job["step"] >= args.kill_after)
+        holder = next(worker for worker in workers if worker.worker_id == job["worker_id"])
+        stolen = len(logged_steps(log_path)) > 1
+        holder.send_signal(signal.SIGKILL)
+        holder.wait()
+        checkpointed = queue.get(job_id)["step"]
+        start = time.perf_counter()
+        job = wait_for(queue, job_id, lambda job: job["status"] in FINISHED_STATES)
+        resumed_seconds = time.perf_counter() - start
+        for worker in workers:
+            if worker is not holder:
+                worker.stdin.write("\n")
+                worker.stdin.close()
+                worker.wait()
+        if stolen:
+            print("the second worker ran steps of the job while its first worker was alive")
+        passed &= check("killed, taken over", job, logged_steps(log_path), checkpointed, expected,
+                        resumed_seconds, full_seconds) and not stolen
+
+        # Stop and resume within one engine
+        log_path = os.path.join(tmp, "stopped.log")
+        engine = make_engine(os.path.join(tmp, "stopped.db"), log_path, args.step_seconds)
+        job_id = engine.submit(task)
+        wait_for(engine.queue, job_id, lambda job: job["step"] >= args.kill_after)
+        engine.cancel(job_id)
+        job = wait_for(engine.queue, job_id, lambda job: job["status"] in FINISHED_STATES)
+        checkpointed = job["step"]
+        # Both attempts run in this process, so they are split at the resume
+        steps_before = logged_steps(log_path)[0]
+        start = time.perf_counter()
+        engine.resume(job_id)
+        job = wait_for(engine.queue, job_id, lambda job: job["status"] in FINISHED_STATES)
+        resumed_seconds = time.perf_counter() - start
+        engine.shutdown()
+        steps_after = logged_steps(log_path)[0][len(steps_before):]
+        passed &= check("stopped and resumed", job, [steps_before, steps_after], checkpointed, expected,
+                        resumed_seconds, full_seconds)
+
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Benchmark full-text search latency over a synthetic corpus.
+
+Queries run with ``--edits`` saved documents in the delta segment, as
+between two compactions.
+
+Usage: python benchmarks/bench_search.py [--documents 100000] [--edits 500]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from civildoc.search import COMPACT_AFTER, SearchIndex
+from civildoc.store import DocumentStore
+
+VOCABULARY = (
+    "highway bridge soil foundation load capacity drainage traffic flow structural steel concrete "
+    "reinforcement survey geological environmental noise air quality mitigation compliance regulation "
+    "design specification culvert embankment retaining wall pile settlement inspection"
+).split()
+
+QUERIES = ["A42", "b2", "soil testing", "structural steel reinforcement", "env", "culvert inspection", "Q9"]
+
+
+def make_documents(n):
+    rng = random.Random(7)
+    for i in range(n):
+        ident = f"{rng.choice('ABMQ')}{rng.randint(1, 999)}"
+        words = rng.choices(VOCABULARY, k=120)
+        yield {
+            "id": f"doc-{i}",
+            "title": f"{ident} {' '.join(rng.choices(VOCABULARY, k=3)).title()} Report",
+            "date": f"20{rng.randint(15, 23)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "status": rng.choice(["Draft", "Completed", "In Review"]),
+            "preview": " ".join(words[:20]),
+            "body": " ".join(words)
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--edits", type=int, default=500, help="saved documents in the delta segment while querying")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DocumentStore(os.path.join(tmp, "bench.db"))
+        store.upsert_documents(make_documents(args.documents))
+        index_path = os.path.join(tmp, "search")
+
+        start = time.perf_counter()
+        index = SearchIndex.open(store, index_path)
+        print(f"built index over {args.documents:,} documents in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        index.update_document({"id": "doc-0", "title": "A42 Culvert Notes", "body": "revised culvert inspection notes"})
+        print(f"incremental update after save: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+        # Stays below COMPACT_AFTER, so the edits remain in the delta
+        for doc in make_documents(min(args.edits, COMPACT_AFTER - 2)):
+            doc["body"] += " revised"
+            index.update_document(doc)
+
+        # Reopening maps the persisted segment and replays the journal instead of reindexing
+        start = time.perf_counter()
+        index = SearchIndex.open(store, index_path)
+        print(f"reopen index: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        print(f"{'query':>32} {'p50':>9} {'p95':>9}")
+        for query in QUERIES:
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                index.search(query, limit=20)
+                samples.append((time.perf_counter() - start) * 1000)
+            samples.sort()
+            p95 = samples[int(len(samples) * 0.95) - 1]
+            print(f"{query:>32} {statistics.median(samples):>7.2f}ms {p95:>7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
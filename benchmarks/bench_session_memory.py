@@ -0,0 +1,95 @@
+"""Report memory held per session at 50 and 500 simulated sessions.
+
+"dict state" reproduces the old session layout: every session held its
+own copy of the selected document and task dicts, including the body.
+st.cache_data hands out unpickled copies, which is reproduced here. "AppState" keeps ids and
+view flags only and resolves bodies through the shared DocumentCache.
+
+Usage: python benchmarks/bench_session_memory.py [--body-kb 50]
+"""
+import argparse
+import os
+import pickle
+import random
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from civildoc.state import AppState
+from civildoc.store import DocumentCache, DocumentStore
+
+TASK = {
+    "id": "task-1",
+    "title": "Generate Environmental Impact Report",
+    "description": "Create a comprehensive environmental impact assessment " * 3,
+    "estimatedTime": "45 minutes",
+    "complexity": "High",
+    "status": "Available"
+}
+
+
+def cache_data_copy(value):
+    return pickle.loads(pickle.dumps(value))
+
+
+def dict_session(doc):
+    return {
+        "current_page": "documents",
+        "selected_document": cache_data_copy(doc),
+        "selected_task": cache_data_copy(TASK),
+        "task_running": True,
+        "step_progress": 2,
+        "edit_mode": False
+    }
+
+
+def slim_session(doc, cache):
+    state = AppState()
+    state.current_page = "documents"
+    state.select_document(doc["id"])
+    state.selected_task_id = TASK["id"]
+    state.task_run_id = "0" * 32
+    cache.get(doc["id"])
+    return state
+
+
+def bytes_per_session(make_session, sessions, documents):
+    rng = random.Random(0)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = [make_session(rng.choice(documents)) for _ in range(sessions)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return (after - before) / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--body-kb", type=int, default=50)
+    parser.add_argument("--documents", type=int, default=20, help="distinct documents the sessions open")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DocumentStore(os.path.join(tmp, "bench.db"))
+        body = "Lorem ipsum structural load analysis. " * (args.body_kb * 1024 // 38)
+        store.upsert_documents(
+            {"id": f"doc-{i}", "title": f"Report {i}", "date": "2023-10-15", "status": "Draft",
+             "preview": body[:200], "body": body}
+            for i in range(args.documents)
+        )
+        documents = [store.get_document(f"doc-{i}") for i in range(args.documents)]
+
+        print(f"{args.body_kb} KB document bodies, {args.documents} distinct documents")
+        print(f"{'sessions':>9} {'dict state':>14} {'AppState':>14}")
+        for sessions in (50, 500):
+            cache = DocumentCache(store)
+            before = bytes_per_session(dict_session, sessions, documents)
+            after = bytes_per_session(lambda doc: slim_session(doc, cache), sessions, documents)
+            print(f"{sessions:>9} {before / 1024:>11.1f} KB {after / 1024:>11.2f} KB")
+
+
+if __name__ == "__main__":
+    main()
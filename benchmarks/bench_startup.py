@@ -0,0 +1,108 @@
+"""Measure cold-worker time to first byte and first render of both pages.
+
+Every sample is a fresh Python process, like a newly started container.
+It imports Streamlit (as the server does at boot), then runs one page
+once through AppTest. Reported:
+
+* boot: from process start until Streamlit is imported and the server
+  could accept a connection
+* first byte: from boot until the page's first element is queued for
+  the browser, i.e. the first request to a freshly booted worker
+* first render: from boot until that whole first run has finished
+
+Each page is measured with an empty data directory (nothing persisted,
+sample data is generated) and with a persisted one, where an earlier
+worker left the event log, the document store and the cache snapshot.
+Heavy modules imported by the first run are listed.
+
+Usage: python benchmarks/bench_startup.py [--repeats 5]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGES = {
+    "dashboard": os.path.join(ROOT, "pages", "1_📊_Analytics_Dashboard.py"),
+    "main app": os.path.join(ROOT, "streamlit_app.py")
+}
+
+HEAVY_MODULES = ("numpy", "pandas", "plotly.express", "plotly.graph_objects")
+
+CHILD = """
+import time
+started = time.perf_counter()
+import json, sys
+sys.path.insert(0, {root!r})
+import streamlit
+from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+from streamlit.testing.v1 import AppTest
+booted = time.perf_counter()
+before = {{name: name in sys.modules for name in {heavy!r}}}
+
+first_delta = []
+_enqueue = ForwardMsgQueue.enqueue
+
+
+def record(self, msg):
+    if not first_delta and msg.HasField("delta"):
+        first_delta.append(time.perf_counter())
+    return _enqueue(self, msg)
+
+
+ForwardMsgQueue.enqueue = record
+at = AppTest.from_file({page!r}, default_timeout=120).run()
+done = time.perf_counter()
+print(json.dumps({{
+    "boot": booted - started,
+    "first_byte": first_delta[0] - booted,
+    "first_render": done - booted,
+    "errors": [e.message for e in at.exception],
+    "imported": [name for name in {heavy!r} if name in sys.modules and not before[name]]
+}}))
+"""
+
+
+def cold_run(page, data_dir):
+    code = CHILD.format(root=ROOT, page=page, heavy=HEAVY_MODULES)
+    env = dict(os.environ, CIVILDOC_DATA_DIR=data_dir)
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"median of {args.repeats} fresh processes, seconds")
+    print(f"{'page':>10} {'data dir':>10} {'boot':>7} {'first byte':>11} {'first render':>13}  heavy imports")
+    with tempfile.TemporaryDirectory() as tmp:
+        persisted = os.path.join(tmp, "persisted")
+        for name, page in PAGES.items():
+            # One run leaves a persisted data directory behind, as an earlier worker would
+            cold_run(page, persisted)
+            for label in ("empty", "persisted"):
+                samples = []
+                for i in range(args.repeats):
+                    data_dir = persisted if label == "persisted" else os.path.join(tmp, f"empty-{name}-{i}")
+                    samples.append(cold_run(page, data_dir))
+                    if label == "empty":
+                        shutil.rmtree(data_dir, ignore_errors=True)
+                errors = [error for sample in samples for error in sample["errors"]]
+                if errors:
+                    print(f"  {name} raised: {errors[0]}")
+                median = {key: statistics.median(sample[key] for sample in samples)
+                          for key in ("boot", "first_byte", "first_render")}
+                print(f"{name:>10} {label:>10} {median['boot']:>6.2f}s {median['first_byte']:>10.2f}s "
+                      f"{median['first_render']:>12.2f}s  {', '.join(samples[-1]['imported']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
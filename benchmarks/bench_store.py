@@ -0,0 +1,61 @@
+"""Benchmark document store list and lookup latency as the corpus grows.
+
+Usage: python benchmarks/bench_store.py [--sizes 10,100,1000,10000,100000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from civildoc.store import DocumentStore
+
+STATUSES = ["Draft", "Completed", "In Review"]
+
+
+def make_documents(n):
+    rng = random.Random(42)
+    for i in range(n):
+        yield {
+            "id": f"doc-{i}",
+            "title": f"Engineering Report {i}",
+            "date": f"20{rng.randint(15, 23)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "status": rng.choice(STATUSES),
+            "preview": "Design specifications, load calculations and site survey results for the project..."
+        }
+
+
+def time_ms(fn, repeat=200):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,1000,10000,100000")
+    args = parser.parse_args()
+
+    print(f"{'documents':>10} {'first page':>12} {'by status':>12} {'lookup':>10}")
+    for n in [int(size) for size in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = DocumentStore(os.path.join(tmp, "bench.db"))
+            store.upsert_documents(make_documents(n))
+            ids = [f"doc-{random.randrange(n)}" for _ in range(200)]
+            lookups = iter(ids * 2)
+
+            first_page = time_ms(lambda: store.list_documents(limit=20))
+            by_status = time_ms(lambda: store.list_documents(limit=20, status="In Review"))
+            lookup = time_ms(lambda: store.get_document(next(lookups)))
+            print(f"{n:>10,} {first_page:>10.3f}ms {by_status:>10.3f}ms {lookup:>8.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Simulate typing in edit mode and measure suggestion cache hit rate and latency.
+
+Each simulated user edits their own report of ``--sections`` sections,
+committing the text area every 0.1-0.5 s (a rerun per commit) and
+occasionally moving on to another section. Every commit calls
+``SuggestionService.suggest()``, as the edit-mode page does. The stub
+model sleeps 200 ms per call plus 20 ms per section.
+
+A second pass replays the same session after clearing the in-memory
+region, as after a server restart, to show the disk cache.
+
+Usage: python benchmarks/bench_suggestions.py [--users 4] [--seconds 30]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from civildoc.generation import StubSuggestionModel
+from civildoc.suggestions import SuggestionService
+
+WORDS = (
+    "the contractor shall provide drainage for the site access road and confirm levels against "
+    "survey data approximately 150 mm of sub-base with a 2.5% crossfall etc"
+).split()
+
+
+def make_sections(count, rng):
+    return [
+        [f"## {i + 1}. Section {i + 1}", " ".join(rng.choice(WORDS) for _ in range(rng.randint(80, 200)))]
+        for i in range(count)
+    ]
+
+
+def type_session(service, user, sections, seconds, seed, commits):
+    rng = random.Random(seed)
+    current = rng.randrange(len(sections))
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if rng.random() < 0.1:
+            current = rng.randrange(len(sections))
+        sections[current][1] += " " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+        text = "\n\n".join(f"{heading}\n\n{body}" for heading, body in sections)
+        service.suggest(f"{user}:report", text, tenant=user)
+        commits.append(len(sections))
+        time.sleep(rng.uniform(0.1, 0.5))
+
+
+def report(label, service, commits, model):
+    stats = service.stats()
+    naive_calls = len(commits)
+    print(f"{label}:")
+    print(f"  {len(commits)} reruns, {stats['sections']:,} section lookups")
+    print(f"  hit rate {stats['hit_rate']:.1%} (memory {stats['memory_hits']:,}, disk {stats['disk_hits']:,})")
+    print(f"  model calls {stats['model_calls']:,} for {stats['sections_sent']:,} sections; "
+          f"{stats['debounced']:,} superseded sections never sent")
+    print(f"  without the service: {naive_calls:,} calls for {sum(commits):,} sections "
+          f"({naive_calls * model.call_latency + sum(commits) * model.section_latency:,.0f} s of model time)")
+    print(f"  suggestion latency p50 {stats['p50_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms "
+          f"(changed sections only: p50 {stats['fresh_p50_ms']:.0f} ms, p95 {stats['fresh_p95_ms']:.0f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--sections", type=int, default=30)
+    parser.add_argument("--seconds", type=float, default=30)
+    args = parser.parse_args()
+
+    model = StubSuggestionModel()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "suggestions.db")
+        for label in ("Live typing", "Replay after restart (memory cleared)"):
+            service = SuggestionService(model=model, path=path)
+            service.memory.invalidate()
+            commits = []
+            threads = [
+                threading.Thread(target=type_session, args=(
+                    service, user, make_sections(args.sections, random.Random(user)), args.seconds, user, commits
+                ))
+                for user in range(args.users)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            service.wait_idle()
+            report(label, service, commits, model)
+            service.close()
+
+
+if __name__ == "__main__":
+    main()
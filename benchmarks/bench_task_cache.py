@@ -0,0 +1,109 @@
+"""Measure agent task runs with and without the content-addressed result cache.
+
+Runs the seeded "Generate Environmental Impact Report" task through a
+``TaskEngine`` with the stub generator (``--token-ms`` per word, like a
+streaming model) and a retriever returning fixed passages, then:
+
+* runs it again on unchanged inputs;
+* changes one retrieved passage, as an edit to a cited document would;
+* changes the task description.
+
+For each run: wall time from submit to completion and the steps that
+had to be generated. Finally a cache bounded to ``--evict-kb`` is filled
+with distinct tasks to check that its size stays under the bound.
+
+Usage: python benchmarks/bench_task_cache.py [--token-ms 30] [--evict-kb 64]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from civildoc.generation import StubGenerator
+from civildoc.jobs import FINISHED_STATES, JobQueue
+from civildoc.store import SEED_DATA_PATH
+from civildoc.task_cache import TaskResultCache
+from civildoc.tasks import TaskEngine
+
+PASSAGES = [
+    {"doc_id": "doc-1", "title": "Highway Bridge Structural Analysis Report",
+     "text": "Load testing of the main span confirmed deflections within 80% of the design limit."},
+    {"doc_id": "doc-3", "title": "Soil Testing Report - North West Development Area",
+     "text": "Boreholes to 25 m found stiff clay over chalk; groundwater was met at 6 m."}
+]
+
+
+class CountingGenerator(StubGenerator):
+    """Stub generator that counts the steps it generates."""
+
+    def __init__(self, token_delay, passages):
+        super().__init__(token_delay, retriever=lambda text: passages)
+        self.passages = passages
+        self.steps_generated = 0
+
+    def stream_step(self, task, step, previous_sections, passages=None, tenant=None):
+        self.steps_generated += 1
+        yield from super().stream_step(task, step, previous_sections, passages, tenant)
+
+
+def run(engine, task):
+    before = engine.generator.steps_generated
+    start = time.perf_counter()
+    job_id = engine.submit(task)
+    while engine.status(job_id)["status"] not in FINISHED_STATES:
+        time.sleep(0.002)
+    return time.perf_counter() - start, engine.generator.steps_generated - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--token-ms", type=float, default=30)
+    parser.add_argument("--evict-kb", type=int, default=64)
+    parser.add_argument("--evict-tasks", type=int, default=100)
+    args = parser.parse_args()
+
+    with open(SEED_DATA_PATH, encoding="utf-8") as f:
+        task = json.load(f)["agentTasks"][0]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        passages = [dict(passage) for passage in PASSAGES]
+        generator = CountingGenerator(args.token_ms / 1000, passages)
+        cache = TaskResultCache(os.path.join(tmp, "task_cache.db"))
+        engine = TaskEngine(generator=generator, queue=JobQueue(os.path.join(tmp, "jobs.db")), cache=cache)
+
+        print(f"{task['title']!r}, {args.token_ms:g} ms per generated word")
+        print(f"{'run':>28} {'time':>10} {'steps generated':>16}")
+        seconds, generated = run(engine, task)
+        print(f"{'first run':>28} {seconds * 1000:>7.0f} ms {generated:>16}")
+        seconds, generated = run(engine, task)
+        print(f"{'unchanged inputs':>28} {seconds * 1000:>7.0f} ms {generated:>16}")
+        passages[1]["text"] += " A second campaign is planned for spring."
+        seconds, generated = run(engine, task)
+        print(f"{'one cited document changed':>28} {seconds * 1000:>7.0f} ms {generated:>16}")
+        seconds, generated = run(engine, dict(task, description=task["description"] + ", and construction traffic"))
+        print(f"{'task description changed':>28} {seconds * 1000:>7.0f} ms {generated:>16}")
+        stats = cache.stats()
+        print(f"runs from cache {stats['run_hits']} of {stats['run_hits'] + stats['run_misses']}, "
+              f"steps from cache {stats['step_hits']} of {stats['step_hits'] + stats['step_misses']}")
+        engine.shutdown()
+
+        generator = CountingGenerator(0, passages)
+        cache = TaskResultCache(os.path.join(tmp, "bounded.db"), max_bytes=args.evict_kb * 1024)
+        engine = TaskEngine(generator=generator, queue=JobQueue(os.path.join(tmp, "jobs2.db")), cache=cache)
+        largest = 0
+        for i in range(args.evict_tasks):
+            run(engine, dict(task, id=f"task-{i}", title=f"{task['title']} #{i}"))
+            largest = max(largest, cache.stats()["bytes"])
+        engine.shutdown()
+        stats = cache.stats()
+        print(f"bounded cache: {args.evict_tasks} distinct tasks, limit {args.evict_kb} KB, largest size "
+              f"{largest / 1024:.1f} KB, {stats['entries']} entries kept, {stats['evictions']} evicted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Measure the overhead of the timing spans, enabled and disabled.
+
+First the cost of one span, one ``@timed`` call and one rerun record is
+measured in isolation, with instrumentation on and off. Then the Home,
+Document Management and AI Agent Tasks pages are rerun through
+Streamlit's AppTest in a fresh process for each setting of
+``CIVILDOC_TELEMETRY``, alternating so drift affects both alike, and
+the median rerun times are compared. The spans recorded per rerun times
+the measured span cost gives the expected overhead, which is less noisy
+than the difference of two medians.
+
+Usage: python benchmarks/bench_telemetry.py [--reruns 30] [--rounds 3]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from civildoc import telemetry
+
+PAGES = ("home", "documents", "ai_tasks")
+
+# Runs inside a child process, so CIVILDOC_TELEMETRY is read at import
+CHILD = """
+import json, os, sys, time
+sys.path.insert(0, {root!r})
+from streamlit.testing.v1 import AppTest
+from civildoc import telemetry
+
+at = AppTest.from_file(os.path.join({root!r}, "streamlit_app.py"), default_timeout=60).run()
+results = {{}}
+for page, button in zip({pages!r}, range(3)):
+    at.sidebar.button[button].click().run()
+    for _ in range(3):
+        at.run()
+    telemetry.get_telemetry().reset()
+    samples = []
+    for _ in range({reruns}):
+        start = time.perf_counter()
+        at.run()
+        samples.append(time.perf_counter() - start)
+    spans = sum(row["calls"] for row in telemetry.get_telemetry().span_rows())
+    results[page] = {{"samples": samples, "spans": spans / {reruns}}}
+print(json.dumps(results))
+"""
+
+
+def per_call_ns(func, iterations):
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter_ns() - start) / iterations
+
+
+def bench_primitives(iterations):
+    def work():
+        pass
+
+    def in_span():
+        with telemetry.span("bench.span"):
+            pass
+
+    results = {}
+    for enabled in (False, True):
+        telemetry.ENABLED = enabled
+        decorated = telemetry.timed("bench.timed")(work)
+        results[enabled] = {
+            "span": per_call_ns(in_span, iterations),
+            "timed": per_call_ns(decorated, iterations) - per_call_ns(work, iterations),
+            "rerun": per_call_ns(lambda: telemetry.record_rerun("bench-session", "home"), iterations)
+        }
+    telemetry.get_telemetry().reset()
+    print(f"per call over {iterations:,} iterations:")
+    for name in ("span", "timed", "rerun"):
+        print(f"  {name:>6}  disabled {results[False][name]:7.0f} ns   enabled {results[True][name]:7.0f} ns")
+    return results
+
+
+def run_pages(enabled, reruns, data_dir):
+    env = dict(os.environ, CIVILDOC_TELEMETRY="1" if enabled else "0", CIVILDOC_DATA_DIR=data_dir)
+    code = CHILD.format(root=ROOT, pages=PAGES, reruns=reruns)
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1_000_000)
+    parser.add_argument("--reruns", type=int, default=30)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    primitives = bench_primitives(args.iterations)
+    span_ns = primitives[True]["span"]
+
+    samples = {False: {page: [] for page in PAGES}, True: {page: [] for page in PAGES}}
+    spans = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # Seed the data directory once so every child starts from the same store
+        run_pages(False, 1, tmp)
+        for _ in range(args.rounds):
+            for enabled in (False, True):
+                for page, result in run_pages(enabled, args.reruns, tmp).items():
+                    samples[enabled][page] += result["samples"]
+                    if enabled:
+                        spans[page] = result["spans"]
+
+    print(f"\nAppTest reruns ({args.rounds} x {args.reruns} per page and setting):")
+    for page in PAGES:
+        off = statistics.median(samples[False][page]) * 1000
+        on = statistics.median(samples[True][page]) * 1000
+        expected = spans[page] * span_ns / 1e6
+        print(f"  {page:>10}  off {off:7.2f} ms  on {on:7.2f} ms  measured {(on - off) / off:+6.1%}  "
+              f"expected {spans[page]:4.1f} spans x {span_ns:.0f} ns = {expected / off:.3%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Measure revision storage and checkout time for a large, repeatedly edited report.
+
+A report of about ``--mb`` megabytes is saved ``--revisions`` times, each
+revision editing, inserting or deleting one paragraph somewhere in the
+text. The benchmark reports bytes stored against the size of the edits
+and against full copies, save time, and checkout time of random
+revisions with a cold and a warm chunk cache.
+
+Usage: python benchmarks/bench_versions.py [--mb 5] [--revisions 100]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from civildoc.versions import VersionStore
+
+WORDS = (
+    "load slab beam column footing pile reinforcement concrete steel grade cover span deflection "
+    "settlement drainage culvert gradient survey level datum bearing stiffness moment shear tension "
+    "the of and to for with is be on at by from as per shall will where which"
+).split()
+
+
+def make_paragraph(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120))).capitalize() + "."
+
+
+def make_report(megabytes, rng):
+    paragraphs = []
+    size = 0
+    section = 0
+    while size < megabytes * 1_000_000:
+        if len(paragraphs) % 25 == 0:
+            section += 1
+            paragraphs.append(f"## {section}. Section {section}")
+        paragraph = make_paragraph(rng)
+        # Ingested reports wrap text at a fixed width
+        lines = [paragraph[i:i + 100] for i in range(0, len(paragraph), 100)]
+        paragraphs.append("\n".join(lines))
+        size += len(paragraph) + 2
+    return paragraphs
+
+
+def edit(paragraphs, rng):
+    """Apply one random paragraph edit in place and return the number of bytes it touched."""
+    i = rng.randrange(1, len(paragraphs))
+    action = rng.random()
+    if action < 0.6:
+        old = paragraphs[i]
+        words = old.split(" ")
+        j = rng.randrange(len(words))
+        words[j] = rng.choice(WORDS).upper()
+        paragraphs[i] = " ".join(words)
+        return len(words[j])
+    if action < 0.8:
+        paragraph = make_paragraph(rng)
+        paragraphs.insert(i, paragraph)
+        return len(paragraph)
+    return len(paragraphs.pop(i))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=float, default=5)
+    parser.add_argument("--revisions", type=int, default=100)
+    parser.add_argument("--checkouts", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    paragraphs = make_report(args.mb, rng)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "versions.db")
+        versions = VersionStore(path)
+        texts = []
+        save_times = []
+        edited_bytes = 0
+        for rev in range(args.revisions):
+            if rev:
+                edited_bytes += edit(paragraphs, rng)
+            text = "\n\n".join(paragraphs)
+            texts.append(text)
+            start = time.perf_counter()
+            versions.commit("report", text, author="bench")
+            save_times.append((time.perf_counter() - start) * 1000)
+
+        first = versions.history("report", limit=args.revisions)[-1]["stored_bytes"]
+        total = versions.stored_bytes("report")
+        full_copies = sum(len(text.encode()) for text in texts)
+        print(f"{len(texts[0]) / 1e6:.1f} MB report, {args.revisions} revisions, "
+              f"{edited_bytes / 1e3:.1f} KB of edited text")
+        print(f"{'first revision stored':>28} {first / 1e6:8.2f} MB (compressed)")
+        print(f"{'next revisions stored':>28} {(total - first) / 1e3:8.1f} KB "
+              f"({(total - first) / (args.revisions - 1) / 1e3:.1f} KB per revision)")
+        print(f"{'full copies would take':>28} {full_copies / 1e6:8.1f} MB")
+        print(f"{'database file':>28} {os.path.getsize(path) / 1e6:8.2f} MB")
+        print(f"{'save':>28} {statistics.median(save_times[1:]):8.1f} ms median, {max(save_times[1:]):.1f} ms max")
+
+        revs = [rng.randrange(1, args.revisions + 1) for _ in range(args.checkouts)]
+        for label, store in (("checkout (cold cache)", None), ("checkout (warm cache)", versions)):
+            samples = []
+            for rev in revs:
+                # A fresh store per checkout starts with an empty chunk cache
+                reader = store or VersionStore(path)
+                start = time.perf_counter()
+                text = reader.checkout("report", rev)
+                samples.append((time.perf_counter() - start) * 1000)
+                assert text == texts[rev - 1]
+            samples.sort()
+            print(f"{label:>28} {statistics.median(samples):8.1f} ms median, "
+                  f"{samples[int(len(samples) * 0.95) - 1]:.1f} ms p95")
+
+
+if __name__ == "__main__":
+    main()
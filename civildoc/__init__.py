@@ -0,0 +1 @@
+"""Backend services for the CivilDoc AI Streamlit app."""
@@ -0,0 +1,273 @@
+"""Incremental aggregation engine for the Analytics Dashboard.
+
+Raw events are folded into compact rollups as they arrive: daily and
+monthly counts per activity metric, and per-task-type running statistics
+(count, mean, M2, min, max) kept with Welford/Chan updates. The
+dashboard reads these rollups instead of re-aggregating the event log on
+every run. Appending a batch costs time proportional to the batch, not
+to the history already seen.
+
+``EventAggregate`` applies this to the event log: it remembers how many
+rows of each day partition it has folded in, so bringing a filtered
+range up to date reads only the rows appended since.
+"""
+import copy
+
+import numpy as np
+import pandas as pd
+
+# Activity metrics counted per day, in column order
+ACTIVITY_METRICS = ("documents_created", "documents_edited", "ai_tasks_completed")
+
+# Task results kept verbatim for scatter plots
+DEFAULT_SAMPLE_SIZE = 1000
+
+
+def _to_days(dates):
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+def _to_months(dates):
+    return np.asarray(dates, dtype="datetime64[M]").astype(np.int64)
+
+
+class _CountRollup:
+    """Dense 2-D counts indexed by period ordinal (day or month) and metric."""
+
+    def __init__(self, n_metrics):
+        self.origin = None
+        self.counts = np.zeros((0, n_metrics), dtype=np.int64)
+
+    def add(self, periods, metric_codes, weights):
+        lo, hi = int(periods.min()), int(periods.max())
+        if self.origin is None:
+            self.origin = lo
+        if lo < self.origin:
+            pad = np.zeros((self.origin - lo, self.counts.shape[1]), dtype=np.int64)
+            self.counts = np.vstack([pad, self.counts])
+            self.origin = lo
+        if hi - self.origin >= len(self.counts):
+            pad = np.zeros((hi - self.origin + 1 - len(self.counts), self.counts.shape[1]), dtype=np.int64)
+            self.counts = np.vstack([self.counts, pad])
+        flat = (periods - self.origin) * self.counts.shape[1] + metric_codes
+        self.counts += np.bincount(flat, weights=weights, minlength=self.counts.size).astype(np.int64).reshape(
+            self.counts.shape
+        )
+
+
+class RunningStats:
+    """Per-group count, mean, M2, min and max, mergeable batch by batch."""
+
+    def __init__(self):
+        self.groups = []
+        self.count = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(0)
+        self.m2 = np.zeros(0)
+        self.min = np.zeros(0)
+        self.max = np.zeros(0)
+
+    def _group_codes(self, labels):
+        inverse, uniques = pd.factorize(np.asarray(labels, dtype=object))
+        index = {group: i for i, group in enumerate(self.groups)}
+        for group in uniques:
+            if group not in index:
+                index[group] = len(self.groups)
+                self.groups.append(group)
+        grow = len(self.groups) - len(self.count)
+        if grow:
+            self.count = np.concatenate([self.count, np.zeros(grow, dtype=np.int64)])
+            self.mean = np.concatenate([self.mean, np.zeros(grow)])
+            self.m2 = np.concatenate([self.m2, np.zeros(grow)])
+            self.min = np.concatenate([self.min, np.full(grow, np.inf)])
+            self.max = np.concatenate([self.max, np.full(grow, -np.inf)])
+        return np.array([index[group] for group in uniques], dtype=np.int64)[inverse]
+
+    def add(self, labels, values):
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return
+        codes = self._group_codes(labels)
+        size = len(self.groups)
+
+        # Batch statistics per group
+        n_b = np.bincount(codes, minlength=size)
+        present = n_b > 0
+        sum_b = np.bincount(codes, weights=values, minlength=size)
+        mean_b = np.divide(sum_b, n_b, out=np.zeros(size), where=present)
+        m2_b = np.bincount(codes, weights=(values - mean_b[codes]) ** 2, minlength=size)
+        min_b = np.full(size, np.inf)
+        max_b = np.full(size, -np.inf)
+        np.minimum.at(min_b, codes, values)
+        np.maximum.at(max_b, codes, values)
+
+        # Chan et al. parallel merge into the running totals
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        safe_n = np.where(n > 0, n, 1)
+        self.mean = np.where(present, self.mean + delta * n_b / safe_n, self.mean)
+        self.m2 = np.where(present, self.m2 + m2_b + delta ** 2 * n_a * n_b / safe_n, self.m2)
+        self.count = n
+        self.min = np.minimum(self.min, min_b)
+        self.max = np.maximum(self.max, max_b)
+
+    def std(self):
+        """Sample standard deviation (ddof=1), matching pandas."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count > 1, np.sqrt(self.m2 / (self.count - 1)), np.nan)
+
+    def overall_mean(self):
+        total = self.count.sum()
+        return float((self.mean * self.count).sum() / total) if total else float("nan")
+
+
+class AnalyticsAggregator:
+    """Rollups behind the dashboard, updated incrementally as events append."""
+
+    def __init__(self, metrics=ACTIVITY_METRICS, sample_size=DEFAULT_SAMPLE_SIZE, seed=0):
+        self.metrics = tuple(metrics)
+        self._metric_codes = {metric: i for i, metric in enumerate(self.metrics)}
+        self._daily = _CountRollup(len(self.metrics))
+        self._monthly = _CountRollup(len(self.metrics))
+        self.completion_time = RunningStats()
+        self.accuracy = RunningStats()
+        self.sample_size = sample_size
+        self._sample_types = np.empty(0, dtype=object)
+        self._sample_values = np.empty((0, 2))
+        self._seen = 0
+        self._rng = np.random.default_rng(seed)
+
+    def add_activity(self, dates, metric, counts=None):
+        """Record activity events; ``counts`` weights pre-aggregated rows."""
+        dates = np.asarray(dates)
+        if not len(dates):
+            return
+        if isinstance(metric, str):
+            codes = np.full(len(dates), self._metric_codes[metric], dtype=np.int64)
+        else:
+            inverse, uniques = pd.factorize(np.asarray(metric, dtype=object))
+            codes = np.array([self._metric_codes[m] for m in uniques], dtype=np.int64)[inverse]
+        weights = None if counts is None else np.asarray(counts, dtype=np.float64)
+        self._daily.add(_to_days(dates), codes, weights)
+        self._monthly.add(_to_months(dates), codes, weights)
+
+    def add_task_results(self, task_types, completion_times, accuracies):
+        """Record completed task results."""
+        task_types = np.asarray(task_types, dtype=object)
+        completion_times = np.asarray(completion_times, dtype=np.float64)
+        accuracies = np.asarray(accuracies, dtype=np.float64)
+        self.completion_time.add(task_types, completion_times)
+        self.accuracy.add(task_types, accuracies)
+        self._add_to_sample(task_types, completion_times, accuracies)
+
+    def _add_to_sample(self, task_types, completion_times, accuracies):
+        # Vectorized reservoir sampling keeps a uniform, bounded sample of task results
+        values = np.column_stack([completion_times, accuracies])
+        free = max(self.sample_size - len(self._sample_types), 0)
+        if free:
+            self._sample_types = np.concatenate([self._sample_types, task_types[:free]])
+            self._sample_values = np.concatenate([self._sample_values, values[:free]])
+        positions = np.arange(self._seen + free, self._seen + len(task_types)) + 1
+        self._seen += len(task_types)
+        if not len(positions):
+            return
+        slots = (self._rng.random(len(positions)) * positions).astype(np.int64)
+        keep = slots < self.sample_size
+        # Later rows win on repeated slots, as in sequential Algorithm R
+        self._sample_types[slots[keep]] = task_types[free:][keep]
+        self._sample_values[slots[keep]] = values[free:][keep]
+
+    # Rollup views read by the dashboard
+
+    def daily_frame(self):
+        """Daily counts per metric over a continuous date range."""
+        if self._daily.origin is None:
+            return pd.DataFrame(columns=["date", *self.metrics])
+        days = np.arange(self._daily.origin, self._daily.origin + len(self._daily.counts))
+        frame = pd.DataFrame(self._daily.counts, columns=list(self.metrics))
+        frame.insert(0, "date", pd.to_datetime(days.astype("datetime64[D]")))
+        return frame
+
+    def monthly_frame(self):
+        """Monthly totals indexed by month end, like ``resample('M').sum()``."""
+        if self._monthly.origin is None:
+            return pd.DataFrame(columns=list(self.metrics))
+        months = np.arange(self._monthly.origin, self._monthly.origin + len(self._monthly.counts))
+        index = pd.PeriodIndex(months.astype("datetime64[M]"), freq="M").to_timestamp(how="end").normalize()
+        return pd.DataFrame(self._monthly.counts, index=pd.Index(index, name="date"), columns=list(self.metrics))
+
+    def task_stats_frame(self):
+        """Per-task-type statistics in the dashboard's Task Type Analysis layout."""
+        order = np.argsort(np.asarray(self.completion_time.groups, dtype=object))
+        return pd.DataFrame({
+            "Avg Time": self.completion_time.mean[order],
+            "Time Std": self.completion_time.std()[order],
+            "Min Time": self.completion_time.min[order],
+            "Max Time": self.completion_time.max[order],
+            "Avg Accuracy": self.accuracy.mean[order],
+            "Accuracy Std": self.accuracy.std()[order]
+        }, index=pd.Index([self.completion_time.groups[i] for i in order], name="task_type"))
+
+    def task_sample_frame(self):
+        """Bounded uniform sample of task results for scatter plots."""
+        return pd.DataFrame({
+            "task_type": self._sample_types,
+            "completion_time": self._sample_values[:, 0],
+            "accuracy": self._sample_values[:, 1]
+        })
+
+
+class EventAggregate:
+    """Rollups of the events in [start, end] that match the filters, kept current.
+
+    ``project_types`` and ``task_types`` are collections of values to keep,
+    or None for all. The filters are passed down to the event log, so only
+    matching partitions and rows are read and aggregated.
+    """
+
+    def __init__(self, start, end, project_types=None, task_types=None):
+        self.start = start
+        self.end = end
+        self.project_types = project_types
+        self.task_types = task_types
+        self.analytics = AnalyticsAggregator()
+        # Event log watermark and rows per day partition already folded in
+        self.watermark = None
+        self._offsets = {"activity": {}, "task_results": {}}
+
+    def updated(self, log):
+        """This aggregate if ``log`` has not grown since, else a copy with the new rows added.
+
+        Other sessions may still be reading this aggregate, so new rows go
+        into a copy rather than being added in place.
+        """
+        watermark = log.watermark()
+        if watermark == self.watermark:
+            return self
+        aggregate = copy.deepcopy(self)
+        aggregate.watermark = watermark
+        aggregate._add_new_rows(log)
+        return aggregate
+
+    def _add_new_rows(self, log):
+        # Only the columns and day partitions the charts need are read
+        activity = log.read("activity", ["metric"], self.start, self.end,
+                            where={"project_type": self.project_types}, since=self._offsets["activity"])
+        self.analytics.add_activity(activity["date"], log.decode("activity", "metric", activity["metric"]))
+
+        results = log.read(
+            "task_results", ["task_type", "completion_time", "accuracy"], self.start, self.end,
+            where={"project_type": self.project_types, "task_type": self.task_types},
+            since=self._offsets["task_results"]
+        )
+        if len(results["date"]):
+            self.analytics.add_task_results(
+                log.decode("task_results", "task_type", results["task_type"]),
+                results["completion_time"],
+                results["accuracy"]
+            )
+
+
+def aggregate_events(log, start, end, project_types=None, task_types=None):
+    """Fold the events in [start, end] matching the filters into a new aggregator."""
+    return EventAggregate(start, end, project_types, task_types).updated(log).analytics
@@ -0,0 +1,455 @@
+"""Asynchronous client for a remote model backend.
+
+Script threads of every session share one ``BackendClient``. It runs its
+own asyncio event loop on a background thread, so ``call()`` can be used
+from ordinary synchronous code, and ``acall()`` from coroutines on that
+loop. The backend speaks JSON over HTTP/1.1: ``POST /v1/<operation>``
+with ``{"inputs": [...]}`` returns ``{"outputs": [...]}``, one output per
+input.
+
+* Connections are kept alive and pooled, at most ``max_connections`` at
+  once, instead of one connection per click.
+* Concurrent requests for the same operation are micro-batched: a
+  request waits up to ``batch_window`` seconds for others to join it,
+  and up to ``max_batch`` inputs go to the backend in a single call.
+* Failed calls (connection errors, timeouts, 429 and 5xx responses) are
+  retried up to ``retries`` times with jittered exponential backoff,
+  honouring Retry-After, within the request's deadline.
+* Each tenant (a user, or a background service) has a token bucket of
+  ``tenant_rate`` requests per second with bursts of ``tenant_burst``; a
+  request that could not get a token before its deadline fails with
+  ``RateLimited`` without reaching the backend.
+* Every request has a deadline of ``timeout`` seconds, covering rate
+  limiting, batching, retries and the calls themselves.
+
+``BackendSuggestionModel`` and ``BackendGenerator`` plug the client into
+the suggestion service and the task engine in place of the offline
+stubs. ``civildoc.mock_backend`` serves the same protocol locally.
+"""
+import asyncio
+import json
+import os
+import random
+import ssl
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from civildoc.task_cache import DEFAULT_USES
+
+# Connections open at once, and seconds an idle one is kept
+MAX_CONNECTIONS = 32
+KEEPALIVE_SECONDS = 30.0
+
+# Seconds a request waits for others to batch with, and inputs per call
+BATCH_WINDOW = 0.005
+MAX_BATCH = 32
+
+# Seconds allowed per request, and per attempt to connect
+DEFAULT_TIMEOUT = 30.0
+CONNECT_TIMEOUT = 5.0
+
+# Retries after a failed call, and the backoff before each (doubling)
+RETRIES = 3
+BACKOFF_SECONDS = 0.1
+MAX_BACKOFF_SECONDS = 2.0
+
+# Requests per second per tenant, and the burst allowed above that
+TENANT_RATE = 10.0
+TENANT_BURST = 20
+
+# HTTP statuses worth retrying
+RETRY_STATUSES = frozenset((429, 502, 503, 504))
+
+# Latency samples kept for percentiles
+LATENCY_SAMPLES = 4096
+
+
+class BackendError(Exception):
+    """A backend call failed; ``status`` is the HTTP status, if there was one."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class RateLimited(BackendError):
+    pass
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class TokenBucket:
+    """``rate`` tokens per second, holding at most ``burst``."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def reserve(self, now):
+        """Take a token and return the seconds to wait before using it."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self):
+        self.tokens += 1
+
+
+class _Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.idle_since = time.monotonic()
+
+    def close(self):
+        self.writer.close()
+
+
+class ConnectionPool:
+    """Keep-alive HTTP/1.1 connections to one host, at most ``max_connections`` at once."""
+
+    def __init__(self, base_url, max_connections=MAX_CONNECTIONS, keepalive=KEEPALIVE_SECONDS,
+                 connect_timeout=CONNECT_TIMEOUT):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self.prefix = parts.path.rstrip("/")
+        self.keepalive = keepalive
+        self.connect_timeout = connect_timeout
+        self._idle = deque()
+        # Created on first use, so it binds to the client's loop
+        self._slots = None
+        self.max_connections = max_connections
+        self.opened = 0
+        self.reused = 0
+
+    async def request(self, path, body):
+        """POST ``body`` (bytes) to ``path``; returns ``(status, headers, body)``."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_connections)
+        async with self._slots:
+            connection = self._take_idle()
+            if connection is None:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port, ssl=self.ssl), self.connect_timeout
+                )
+                connection = _Connection(reader, writer)
+                self.opened += 1
+            else:
+                self.reused += 1
+            try:
+                status, headers, payload = await self._exchange(connection, path, body)
+            except BaseException:
+                # A reused connection the backend already closed fails here
+                # too; the client retries the call on a new one
+                connection.close()
+                raise
+            if headers.get("connection", "").lower() == "close":
+                connection.close()
+            else:
+                connection.idle_since = time.monotonic()
+                self._idle.append(connection)
+            return status, headers, payload
+
+    def _take_idle(self):
+        now = time.monotonic()
+        while self._idle:
+            connection = self._idle.pop()
+            if now - connection.idle_since < self.keepalive and not connection.reader.at_eof():
+                return connection
+            connection.close()
+        return None
+
+    async def _exchange(self, connection, path, body):
+        connection.writer.write(
+            f"POST {self.prefix}{path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: keep-alive\r\n\r\n".encode("ascii") + body
+        )
+        await connection.writer.drain()
+        status_line = await connection.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by the backend")
+        status = int(status_line.split(None, 2)[1])
+        headers = {}
+        while True:
+            line = await connection.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if "content-length" not in headers:
+            raise BackendError("Backend response has no Content-Length", status)
+        payload = await connection.reader.readexactly(int(headers["content-length"]))
+        return status, headers, payload
+
+    def close(self):
+        while self._idle:
+            self._idle.pop().close()
+
+
+class BackendClient:
+    """Pooled, batching, rate-limited client for one model backend; see module docstring."""
+
+    def __init__(self, base_url, max_connections=MAX_CONNECTIONS, batch_window=BATCH_WINDOW, max_batch=MAX_BATCH,
+                 timeout=DEFAULT_TIMEOUT, retries=RETRIES, backoff=BACKOFF_SECONDS, max_backoff=MAX_BACKOFF_SECONDS,
+                 tenant_rate=TENANT_RATE, tenant_burst=TENANT_BURST, connect_timeout=CONNECT_TIMEOUT):
+        self.base_url = base_url
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.tenant_rate = tenant_rate
+        self.tenant_burst = tenant_burst
+        self.pool = ConnectionPool(base_url, max_connections, connect_timeout=connect_timeout)
+        # Everything below is only touched on the client's event loop
+        self._buckets = {}
+        # operation -> [(input, future, deadline)] waiting to be sent
+        self._batches = {}
+        self._flushers = {}
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.calls = 0
+        self.inputs_sent = 0
+        self.retried = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="backend-client", daemon=True)
+        self._thread.start()
+
+    def call(self, operation, input, tenant="local", timeout=None):
+        """Run ``operation`` on one input and return its output; blocks the calling thread."""
+        return self.submit(operation, input, tenant, timeout).result()
+
+    def call_many(self, operation, inputs, tenant="local", timeout=None):
+        """Outputs for several inputs, counted as one request of ``tenant``."""
+        return asyncio.run_coroutine_threadsafe(self._request(operation, inputs, tenant, timeout), self._loop).result()
+
+    def submit(self, operation, input, tenant="local", timeout=None):
+        """Like ``call()``, but returns a ``concurrent.futures.Future``."""
+        return asyncio.run_coroutine_threadsafe(self.acall(operation, input, tenant, timeout), self._loop)
+
+    async def acall(self, operation, input, tenant="local", timeout=None):
+        """Coroutine form of ``call()``; must run on the client's loop."""
+        return (await self._request(operation, [input], tenant, timeout))[0]
+
+    async def _request(self, operation, inputs, tenant, timeout):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + (timeout or self.timeout)
+        self.requests += 1
+        try:
+            await self._admit(tenant, deadline)
+            futures = [self._enqueue(operation, input, deadline) for input in inputs]
+            try:
+                outputs = await asyncio.wait_for(asyncio.gather(*futures, return_exceptions=True),
+                                                 deadline - loop.time())
+            except asyncio.TimeoutError:
+                raise BackendError(f"{operation} timed out after {timeout or self.timeout:g} s") from None
+            for output in outputs:
+                if isinstance(output, BaseException):
+                    raise output
+        except BackendError:
+            self.errors += 1
+            raise
+        self.latencies.append(loop.time() - start)
+        return outputs
+
+    async def _admit(self, tenant, deadline):
+        if not self.tenant_rate:
+            return
+        bucket = self._buckets.get(tenant)
+        if bucket is None:
+            bucket = self._buckets[tenant] = TokenBucket(self.tenant_rate, self.tenant_burst)
+        now = asyncio.get_running_loop().time()
+        wait = bucket.reserve(now)
+        if now + wait > deadline:
+            bucket.refund()
+            self.rate_limited += 1
+            raise RateLimited(f"Tenant {tenant!r} is over its limit of {self.tenant_rate:g} requests/s", 429)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def _enqueue(self, operation, input, deadline):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._batches.setdefault(operation, [])
+        batch.append((input, future, deadline))
+        if len(batch) >= self.max_batch:
+            self._flush(operation)
+        elif len(batch) == 1:
+            self._flushers[operation] = loop.call_later(self.batch_window, self._flush, operation)
+        return future
+
+    def _flush(self, operation):
+        flusher = self._flushers.pop(operation, None)
+        if flusher is not None:
+            flusher.cancel()
+        # Requests that timed out while waiting are not sent
+        batch = [item for item in self._batches.pop(operation, ()) if not item[1].done()]
+        if batch:
+            asyncio.get_running_loop().create_task(self._send(operation, batch))
+
+    async def _send(self, operation, batch):
+        self.calls += 1
+        self.inputs_sent += len(batch)
+        try:
+            outputs = await self._post(operation, [input for input, _, _ in batch], max(d for _, _, d in batch))
+            if len(outputs) != len(batch):
+                raise BackendError(f"{operation} returned {len(outputs)} outputs for {len(batch)} inputs")
+        except BackendError as exc:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(BackendError(str(exc), exc.status))
+            return
+        for (_, future, _), output in zip(batch, outputs):
+            if not future.done():
+                future.set_result(output)
+
+    async def _post(self, operation, inputs, deadline):
+        loop = asyncio.get_running_loop()
+        body = json.dumps({"inputs": inputs}).encode("utf-8")
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                status, headers, payload = await asyncio.wait_for(self.pool.request(f"/v1/{operation}", body),
+                                                                  remaining)
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as exc:
+                error = BackendError(f"{operation} failed: {exc!r}")
+            else:
+                if status == 200:
+                    try:
+                        return json.loads(payload)["outputs"]
+                    except (ValueError, KeyError) as exc:
+                        raise BackendError(f"{operation} returned a malformed response: {exc!r}", status) from None
+                error = BackendError(f"{operation} returned HTTP {status}: "
+                                     f"{payload[:200].decode('utf-8', 'replace')}", status)
+                if status not in RETRY_STATUSES:
+                    raise error
+                retry_after = headers.get("retry-after")
+            if attempt >= self.retries:
+                raise error
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+            if retry_after:
+                try:
+                    delay = max(delay, float(retry_after))
+                except ValueError:
+                    pass
+            if loop.time() + delay >= deadline:
+                raise error
+            attempt += 1
+            self.retried += 1
+            await asyncio.sleep(delay)
+
+    async def _shutdown(self):
+        # Requests still in flight fail with CancelledError
+        pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self.pool.close()
+
+    def stats(self):
+        return asyncio.run_coroutine_threadsafe(self._stats(), self._loop).result()
+
+    async def _stats(self):
+        latencies = list(self.latencies)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "calls": self.calls,
+            "inputs_per_call": self.inputs_sent / self.calls if self.calls else 0.0,
+            "retries": self.retried,
+            "connections_opened": self.pool.opened,
+            "connections_reused": self.pool.reused,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000
+        }
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+class BackendSuggestionModel:
+    """Writing-assistant model served by the backend's "suggest" operation.
+
+    Drop-in replacement for ``StubSuggestionModel``. Calls are made for
+    the ``tenant`` they are given, so each user has their own rate limit,
+    and for the default ``tenant`` otherwise.
+    """
+
+    def __init__(self, client, version="backend-suggestions-1", tenant="suggestions"):
+        self.client = client
+        self.version = version
+        self.tenant = tenant
+
+    def suggest_batch(self, sections, tenant=None):
+        return self.client.call_many("suggest", [{"heading": heading, "text": text} for heading, text in sections],
+                                     tenant=tenant or self.tenant)
+
+
+class BackendGenerator:
+    """Task step generator served by the backend's "generate" operation.
+
+    Drop-in replacement for ``StubGenerator``; each step's section arrives
+    in one piece. A step is sent the inputs its ``"uses"`` declares, which
+    the task result cache keys it by: the passages found by ``retriever``
+    for "documents" and the sections before it for "sections". Steps are generated for the job's user as ``tenant``, and for the
+    default ``tenant`` otherwise.
+    """
+
+    def __init__(self, client, retriever=None, tenant="agent-tasks", version="backend-generator-2"):
+        self.client = client
+        self.retriever = retriever
+        self.tenant = tenant
+        self.version = version
+
+    def input_documents(self, task):
+        if self.retriever is None:
+            return []
+        return self.retriever(f"{task['title']}. {task.get('description', '')}")
+
+    def stream_step(self, task, step, previous_sections, passages=None, tenant=None):
+        uses = step.get("uses", DEFAULT_USES)
+        if "documents" not in uses:
+            passages = []
+        elif passages is None:
+            passages = self.input_documents(task)
+        output = self.client.call("generate", {
+            "task": {"title": task["title"], "description": task.get("description", "")},
+            "step": {"name": step["name"], "desc": step["desc"]},
+            "index": len(previous_sections),
+            "passages": [{"title": passage["title"], "text": passage["text"]} for passage in passages],
+            "sections": list(previous_sections) if "sections" in uses else []
+        }, tenant=tenant or self.tenant)
+        yield output["text"]
+
+
+def default_backend():
+    """A client for ``CIVILDOC_BACKEND_URL``, or None to use the offline stubs."""
+    url = os.environ.get("CIVILDOC_BACKEND_URL")
+    return BackendClient(url) if url else None
@@ -0,0 +1,402 @@
+"""Named, process-wide cache regions with TTL, LRU eviction and versioning.
+
+``st.cache_data.clear()`` drops every cached function for every user.
+Regions let each dataset family be sized, expired and invalidated on
+its own. Entries carry the watermark of the data source they were
+computed from. When the source moves on, the old entry counts as stale:
+it is recomputed on the next read or purged by ``invalidate_stale()``,
+and other regions are untouched.
+
+A region is bounded by entry count and, when given a ``sizeof``
+function, by the total size of its values (``max_bytes``).
+
+Each region counts hits, misses, evictions, expirations and
+invalidations. ``all_stats()`` exposes these for the sidebar or for
+export, together with any other cache passed to ``register_cache()``.
+
+``save_snapshot()`` writes chosen regions to a file that
+``load_snapshot()`` restores on the next start, so a new worker begins
+with warm caches. Entries stay versioned and are dropped on read if
+their data source moved on in between.
+
+``DiskCache`` is the persistent counterpart: an LRU of JSON values in a
+local SQLite file, bounded by entries and optionally by bytes, for
+results that are worth keeping across restarts.
+"""
+import functools
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class CacheRegion:
+    """Thread-safe LRU map with optional TTL, size bound and versioned entries."""
+
+    def __init__(self, name, max_entries=128, ttl=None, max_bytes=None, sizeof=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.bytes = 0
+        # Sets since creation; tells snapshots whether anything changed
+        self.writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key, version=None, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_version, value, expires_at, _ = entry
+                if expires_at is not None and expires_at <= time.monotonic():
+                    self._pop(key)
+                    self.expirations += 1
+                elif entry_version != version:
+                    self._pop(key)
+                    self.invalidations += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return default
+
+    def set(self, key, value, version=None):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        size = self.sizeof(value) if self.sizeof else 0
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (version, value, expires_at, size)
+            self.bytes += size
+            self.writes += 1
+            while len(self._entries) > self.max_entries or (
+                    self.max_bytes is not None and self.bytes > self.max_bytes and len(self._entries) > 1):
+                _, (_, _, _, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def _pop(self, key):
+        # Caller holds self._lock
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[3]
+        return entry
+
+    def get_or_compute(self, key, compute, version=None):
+        value = self.get(key, version, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value, version)
+        return value
+
+    def invalidate(self, key=_MISSING):
+        """Drop one entry, or every entry when no key is given."""
+        with self._lock:
+            if key is _MISSING:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self.bytes = 0
+            elif self._pop(key) is not None:
+                self.invalidations += 1
+
+    def invalidate_stale(self, current_version):
+        """Drop entries computed from any version other than ``current_version``."""
+        with self._lock:
+            stale = [key for key, (version, _, _, _) in self._entries.items() if version != current_version]
+            for key in stale:
+                self._pop(key)
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def items(self):
+        """``(key, value, version)`` of every entry, least recently used first."""
+        with self._lock:
+            return [(key, value, version) for key, (version, value, _, _) in self._entries.items()]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "region": self.name,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
+
+
+_regions = {}
+_regions_lock = threading.Lock()
+
+# Other caches with a stats() method, by name; dropped when garbage collected
+_registered = weakref.WeakValueDictionary()
+
+
+def get_region(name, max_entries=128, ttl=None, max_bytes=None, sizeof=None):
+    """Return the process-wide region ``name``, creating it on first use."""
+    with _regions_lock:
+        region = _regions.get(name)
+        if region is None:
+            region = _regions[name] = CacheRegion(name, max_entries=max_entries, ttl=ttl,
+                                                  max_bytes=max_bytes, sizeof=sizeof)
+        return region
+
+
+def register_cache(cache):
+    """Include ``cache`` (anything with ``name`` and ``stats()``) in ``all_stats()``."""
+    with _regions_lock:
+        _registered[cache.name] = cache
+
+
+def all_stats():
+    with _regions_lock:
+        regions = list(_regions.values()) + list(_registered.values())
+    return [region.stats() for region in regions]
+
+
+# Region writes already covered by each snapshot file, by path and region name
+_snapshot_marks = {}
+
+
+def save_snapshot(path, names):
+    """Write the entries of regions ``names`` to ``path``.
+
+    Nothing is written when no region changed since the last save or
+    load of ``path``. Returns True when the file was written.
+    """
+    with _regions_lock:
+        regions = [_regions[name] for name in names if name in _regions]
+    marks = {region.name: region.writes for region in regions}
+    if marks == _snapshot_marks.get(path):
+        return False
+    snapshot = {region.name: region.items() for region in regions}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    _snapshot_marks[path] = marks
+    return True
+
+
+def load_snapshot(path):
+    """Restore entries written by ``save_snapshot()`` into their regions.
+
+    Only regions that already exist are filled, so each keeps the size
+    limits its owner created it with. The file is trusted like the rest
+    of the data directory. Returns the number of entries restored.
+    """
+    try:
+        with open(path, "rb") as f:
+            snapshot = pickle.load(f)
+    except FileNotFoundError:
+        return 0
+    except Exception:
+        logger.exception("Ignoring unreadable cache snapshot %s", path)
+        return 0
+    restored = 0
+    marks = {}
+    for name, entries in snapshot.items():
+        with _regions_lock:
+            region = _regions.get(name)
+        if region is None:
+            continue
+        for key, value, version in entries:
+            region.set(key, value, version)
+        restored += len(entries)
+        marks[name] = region.writes
+    _snapshot_marks[path] = marks
+    return restored
+
+
+def cached(region_name, watermark=None, max_entries=128, ttl=None):
+    """Memoize a function in a named region, versioned by ``watermark()``.
+
+    The wrapped function gains ``region`` and ``invalidate_stale()``.
+    """
+    def decorator(func):
+        region = get_region(region_name, max_entries=max_entries, ttl=ttl)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__qualname__, args, tuple(sorted(kwargs.items())))
+            version = watermark() if watermark else None
+            return region.get_or_compute(key, lambda: func(*args, **kwargs), version)
+
+        def invalidate_stale():
+            return region.invalidate_stale(watermark() if watermark else None)
+
+        wrapper.region = region
+        wrapper.invalidate_stale = invalidate_stale
+        return wrapper
+
+    return decorator
+
+
+DISK_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    version TEXT,
+    value TEXT NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at);
+-- Entry count and value size, kept by triggers so every process sharing
+-- the file sees the same totals and rolled back writes leave them as they were
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    UPDATE totals SET entries = entries + 1, bytes = bytes + LENGTH(NEW.value);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF value ON entries BEGIN
+    UPDATE totals SET bytes = bytes + LENGTH(NEW.value) - LENGTH(OLD.value);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE totals SET entries = entries - 1, bytes = bytes - LENGTH(OLD.value);
+END;
+INSERT OR IGNORE INTO totals SELECT 0, COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM entries;
+"""
+
+
+class DiskCache:
+    """LRU map of JSON values persisted in a local SQLite file.
+
+    Entries are versioned like ``CacheRegion`` entries. Once the file holds
+    more than ``max_entries``, or values totalling more than ``max_bytes``
+    of JSON, the least recently read entries are deleted. The limits apply
+    to the file, whichever processes write to it.
+    """
+
+    def __init__(self, name, path, max_entries=100_000, max_bytes=None):
+        self.name = name
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conn().executescript(f"BEGIN IMMEDIATE; {DISK_CACHE_SCHEMA} COMMIT;")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        register_cache(self)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, version=None, default=None):
+        conn = self._conn()
+        row = conn.execute("SELECT version, value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is not None and row[0] != version:
+            dropped = conn.execute("DELETE FROM entries WHERE key = ?", (key,)).rowcount
+            with self._lock:
+                self.invalidations += dropped
+            row = None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+        conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[1])
+
+    def set(self, key, value, version=None):
+        self.set_many([(key, value)], version)
+
+    def set_many(self, items, version=None):
+        """Store ``(key, value)`` pairs in one transaction."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO entries (key, version, value, accessed_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET version = excluded.version, value = excluded.value, "
+                "accessed_at = excluded.accessed_at",
+                [(key, version, json.dumps(value), now) for key, value in items]
+            )
+            # Totals as of this transaction, including other processes' commits
+            entries, size = conn.execute("SELECT entries, bytes FROM totals").fetchone()
+            excess = entries - self.max_entries
+            excess_bytes = size - self.max_bytes if self.max_bytes is not None else 0
+            evicted = self._evict(conn, excess, excess_bytes) if excess > 0 or excess_bytes > 0 else 0
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+
+    def _evict(self, conn, entries, size):
+        """Delete the least recently read entries until ``entries`` and ``size`` bytes are gone.
+
+        Returns the number of entries deleted.
+        """
+        # Caller holds an open transaction
+        keys = []
+        freed = 0
+        for key, length in conn.execute("SELECT key, LENGTH(value) FROM entries ORDER BY accessed_at"):
+            if len(keys) >= entries and freed >= size:
+                break
+            keys.append((key,))
+            freed += length
+        conn.executemany("DELETE FROM entries WHERE key = ?", keys)
+        return len(keys)
+
+    def invalidate(self, key=_MISSING):
+        """Drop one entry, or every entry when no key is given."""
+        conn = self._conn()
+        if key is _MISSING:
+            dropped = conn.execute("DELETE FROM entries").rowcount
+        else:
+            dropped = conn.execute("DELETE FROM entries WHERE key = ?", (key,)).rowcount
+        with self._lock:
+            self.invalidations += dropped
+
+    def stats(self):
+        entries, size = self._conn().execute("SELECT entries, bytes FROM totals").fetchone()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "region": self.name,
+                "entries": entries,
+                "bytes": size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": 0,
+                "invalidations": self.invalidations
+            }
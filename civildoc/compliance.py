@@ -0,0 +1,280 @@
+"""Rule-based compliance checking of engineering documents.
+
+A rule set (``public/compliance-rules.json``, or YAML when PyYAML is
+installed) is compiled once into a ``RuleIndex``:
+
+* rules are grouped by the section headings they apply to, so a fire
+  rule never runs against a drainage section;
+* every trigger keyword is folded into a single regular expression, so
+  one scan of a block finds which keyword-gated rules can match at all.
+
+Documents are split into sections at their headings, and sections into
+paragraph blocks. Results are cached by content hash, per block for
+``forbid`` and ``range`` rules and per section for ``require`` rules.
+After an edit only the blocks whose text changed are checked again.
+Large batches of changed blocks can be spread over a process pool.
+"""
+import bisect
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from civildoc.store import PROJECT_ROOT
+
+DEFAULT_RULES_PATH = os.path.join(PROJECT_ROOT, "public", "compliance-rules.json")
+
+RULE_KINDS = ("forbid", "require", "range")
+SEVERITIES = ("high", "medium", "low")
+
+# Paragraphs are grouped into blocks of about this many characters
+BLOCK_CHARS = 2000
+
+# Changed text, in characters, above which blocks are checked in the pool
+PARALLEL_MIN_CHARS = 200_000
+
+# Cached block and section results
+DEFAULT_CACHE_ENTRIES = 20_000
+
+_HEADING = re.compile(r"^(?:#{1,6}[ \t]+(?P<md>[^\n]+)|(?P<num>\d+(?:\.\d+)*\.?[ \t]+[A-Z][^\n]{0,80}))$", re.MULTILINE)
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def load_rules(path=DEFAULT_RULES_PATH):
+    """Load a rule set from JSON or YAML."""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+            payload = yaml.safe_load(f)
+        else:
+            payload = json.load(f)
+    rules = payload["rules"] if isinstance(payload, dict) else payload
+    for rule in rules:
+        if rule.get("kind") not in RULE_KINDS:
+            raise ValueError(f"Rule {rule.get('id')!r} has unknown kind {rule.get('kind')!r}")
+    return rules
+
+
+def _keyword_pattern(keyword):
+    return r"\s+".join(re.escape(part) for part in keyword.lower().split())
+
+
+class RuleIndex:
+    """Rules compiled and indexed by section heading word and trigger keyword."""
+
+    def __init__(self, rules):
+        self.rules = {rule["id"]: dict(rule, compiled=re.compile(rule["pattern"], re.IGNORECASE)) for rule in rules}
+        # Fingerprint of the rule set, part of every cache key
+        self.version = hashlib.blake2b(json.dumps(rules, sort_keys=True).encode(), digest_size=8).hexdigest()
+
+        self._by_section_word = {}
+        self._any_section = []
+        for rule in self.rules.values():
+            if rule.get("sections"):
+                for word in rule["sections"]:
+                    self._by_section_word.setdefault(word.lower(), []).append(rule["id"])
+            else:
+                self._any_section.append(rule["id"])
+
+        self._by_keyword = {}
+        for rule in self.rules.values():
+            for keyword in rule.get("keywords", ()):
+                self._by_keyword.setdefault(" ".join(keyword.lower().split()), []).append(rule["id"])
+        keywords = sorted(self._by_keyword, key=len, reverse=True)
+        self._keywords = re.compile(
+            r"(?<![a-z0-9])(?:" + "|".join(_keyword_pattern(k) for k in keywords) + r")(?![a-z0-9])",
+            re.IGNORECASE
+        ) if keywords else None
+        self._section_rules = {}
+
+    def section_rules(self, heading):
+        """Ids of the rules that apply under ``heading``, split by kind."""
+        words = tuple(sorted(set(_WORD.findall(heading.lower()))))
+        cached = self._section_rules.get(words)
+        if cached is None:
+            ids = list(self._any_section)
+            for word in words:
+                ids += self._by_section_word.get(word, ())
+            ids = sorted(set(ids))
+            cached = self._section_rules[words] = (
+                tuple(i for i in ids if self.rules[i]["kind"] == "require"),
+                tuple(i for i in ids if self.rules[i]["kind"] != "require")
+            )
+        return cached
+
+    def triggered(self, text, rule_ids):
+        """The subset of ``rule_ids`` whose keywords occur in ``text``."""
+        present = set()
+        if self._keywords is not None:
+            present = {" ".join(match.group().lower().split()) for match in self._keywords.finditer(text)}
+        triggered_ids = set()
+        for keyword in present:
+            triggered_ids.update(self._by_keyword.get(keyword, ()))
+        return [i for i in rule_ids if not self.rules[i].get("keywords") or i in triggered_ids]
+
+    def check_block(self, text, rule_ids):
+        """Findings of ``forbid`` and ``range`` rules in one block, offsets relative to it."""
+        findings = []
+        for rule_id in self.triggered(text, rule_ids):
+            rule = self.rules[rule_id]
+            for match in rule["compiled"].finditer(text):
+                if rule["kind"] == "range":
+                    value = float(match.group("value"))
+                    if ("min" in rule and value < rule["min"]) or ("max" in rule and value > rule["max"]):
+                        findings.append(_finding(rule, match.start(), match.end(), rule["message"].format(value=f"{value:g}")))
+                else:
+                    findings.append(_finding(rule, match.start(), match.end(), rule["message"]))
+        return findings
+
+    def check_section(self, text, rule_ids):
+        """Findings of ``require`` rules that the section does not satisfy."""
+        return [
+            _finding(self.rules[rule_id], 0, 0, self.rules[rule_id]["message"])
+            for rule_id in rule_ids if not self.rules[rule_id]["compiled"].search(text)
+        ]
+
+
+def _finding(rule, start, end, message):
+    return {
+        "rule_id": rule["id"],
+        "title": rule.get("title", rule["id"]),
+        "severity": rule.get("severity", "medium"),
+        "message": message,
+        "start": start,
+        "end": end
+    }
+
+
+def split_sections(text):
+    """``(heading, start, end)`` for each section; text before the first heading has heading ""."""
+    bounds = [(match.group("md") or match.group("num") or "", match.start()) for match in _HEADING.finditer(text)]
+    if not bounds or bounds[0][1] > 0:
+        bounds.insert(0, ("", 0))
+    return [
+        (heading.strip(), start, bounds[i + 1][1] if i + 1 < len(bounds) else len(text))
+        for i, (heading, start) in enumerate(bounds)
+    ]
+
+
+def split_blocks(text, start, end, block_chars=BLOCK_CHARS):
+    """Paragraph-aligned ``(start, end)`` blocks of ``text[start:end]``."""
+    blocks = []
+    block_start = start
+    for match in _PARAGRAPH_BREAK.finditer(text, start, end):
+        if match.end() - block_start >= block_chars:
+            blocks.append((block_start, match.end()))
+            block_start = match.end()
+    if block_start < end:
+        blocks.append((block_start, end))
+    return blocks
+
+
+def _digest(text):
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+# Worker side of parallel checks: one compiled index per rule set and process
+_worker_indexes = {}
+
+
+def _check_blocks_in_worker(rules, version, items):
+    index = _worker_indexes.get(version)
+    if index is None:
+        index = _worker_indexes[version] = RuleIndex(rules)
+    return [index.check_block(text, rule_ids) for text, rule_ids in items]
+
+
+class ComplianceChecker:
+    """Checks documents against a ``RuleIndex``, re-checking only changed text."""
+
+    def __init__(self, index, executor=None, workers=1, max_entries=DEFAULT_CACHE_ENTRIES):
+        self.index = index
+        # Process pool for large re-checks, and the number of processes in it
+        self.executor = executor
+        self.workers = workers if executor else 1
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._rules = [{k: v for k, v in rule.items() if k != "compiled"} for rule in index.rules.values()]
+        self.blocks_checked = 0
+        self.blocks_reused = 0
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_RULES_PATH, executor=None, workers=1):
+        return cls(RuleIndex(load_rules(path)), executor=executor, workers=workers)
+
+    def _get(self, key):
+        with self._lock:
+            value = self._cache.get(key)
+            if value is not None:
+                self._cache.move_to_end(key)
+            return value
+
+    def _put(self, key, value):
+        with self._lock:
+            self._cache[key] = value
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def check(self, text):
+        """Check ``text`` and return findings sorted by position.
+
+        Each finding has the rule id, title, severity, message, absolute
+        ``start``/``end`` offsets, 1-based ``line`` and the ``section`` heading.
+        """
+        findings = []
+        misses = []
+        for heading, start, end in split_sections(text):
+            require_ids, block_ids = self.index.section_rules(heading)
+            if require_ids:
+                section_text = text[start:end]
+                key = ("section", self.index.version, require_ids, _digest(section_text))
+                result = self._get(key)
+                if result is None:
+                    result = self.index.check_section(section_text, require_ids)
+                    self._put(key, result)
+                # Missing requirements are reported against the heading line
+                heading_end = text.find("\n", start, end)
+                heading_end = end if heading_end < 0 else heading_end
+                findings += [dict(f, start=start, end=heading_end, section=heading) for f in result]
+            if not block_ids:
+                continue
+            for block_start, block_end in split_blocks(text, start, end):
+                block_text = text[block_start:block_end]
+                key = ("block", self.index.version, block_ids, _digest(block_text))
+                result = self._get(key)
+                if result is None:
+                    misses.append((key, block_text, block_ids, block_start, heading))
+                else:
+                    self.blocks_reused += 1
+                    findings += [dict(f, start=block_start + f["start"], end=block_start + f["end"], section=heading)
+                                 for f in result]
+
+        for (key, _, _, block_start, heading), result in zip(misses, self._check_misses(misses)):
+            self._put(key, result)
+            findings += [dict(f, start=block_start + f["start"], end=block_start + f["end"], section=heading)
+                         for f in result]
+        self.blocks_checked += len(misses)
+
+        line_starts = [0] + [match.end() for match in re.finditer("\n", text)]
+        for finding in findings:
+            finding["line"] = bisect.bisect_right(line_starts, finding["start"])
+            finding["excerpt"] = text[finding["start"]:finding["end"]][:120]
+        findings.sort(key=lambda f: (f["start"], f["rule_id"]))
+        return findings
+
+    def _check_misses(self, misses):
+        total_chars = sum(len(text) for _, text, _, _, _ in misses)
+        workers = self.workers
+        if workers < 2 or total_chars < PARALLEL_MIN_CHARS:
+            return [self.index.check_block(text, rule_ids) for _, text, rule_ids, _, _ in misses]
+        # Contiguous batches, one per worker, keep the pickling overhead low
+        items = [(text, rule_ids) for _, text, rule_ids, _, _ in misses]
+        size = -(-len(items) // workers)
+        batches = [items[i:i + size] for i in range(0, len(items), size)]
+        futures = [self.executor.submit(_check_blocks_in_worker, self._rules, self.index.version, batch)
+                   for batch in batches]
+        return [result for future in futures for result in future.result()]
@@ -0,0 +1,133 @@
+"""Reusable Streamlit view components for the CivilDoc AI pages."""
+import streamlit as st
+
+from civildoc import telemetry
+from civildoc.cache import all_stats
+
+
+def get_status_class(status):
+    status_map = {
+        "Draft": "status-draft",
+        "Completed": "status-completed",
+        "In Review": "status-review"
+    }
+    return status_map.get(status, "status-draft")
+
+
+def document_card_html(doc):
+    status_class = get_status_class(doc["status"])
+    return f"""
+    <div class="document-card">
+        <div style="display: flex; justify-content: between; align-items: center; margin-bottom: 1rem;">
+            <h3 style="margin: 0; color: #1f2937;">{doc['title']}</h3>
+            <span class="status-badge {status_class}">{doc['status']}</span>
+        </div>
+        <p style="color: #6b7280; margin-bottom: 1rem;">{doc['preview']}</p>
+        <div style="display: flex; justify-content: between; align-items: center;">
+            <small style="color: #9ca3af;">Created: {doc['date']}</small>
+        </div>
+    </div>
+    """
+
+
+def render_document_card(doc):
+    """Render one document card; return "view", "edit" or None."""
+    action = None
+    with st.container():
+        st.markdown(document_card_html(doc), unsafe_allow_html=True)
+
+        # Keys depend only on the document id, so they stay stable across pages
+        col1, col2, col3 = st.columns([1, 1, 2])
+        with col1:
+            if st.button(f"👁️ View", key=f"view_{doc['id']}"):
+                action = "view"
+        with col2:
+            if st.button(f"✏️ Edit", key=f"edit_{doc['id']}"):
+                action = "edit"
+    return action
+
+
+def render_document_list(store, cursors, page_size=20, key="documents"):
+    """Render one cursor-paged window of documents from ``store``.
+
+    Only the visible page is fetched and turned into widgets. ``cursors``
+    is the session's stack of page cursors (page 0 starts at None) and is
+    updated in place by the Previous/Next callbacks, so earlier pages are never rescanned.
+    Returns ``(action, doc)`` for the clicked card, or ``(None, None)``.
+    """
+    documents, next_cursor = store.page_documents(limit=page_size, cursor=cursors[-1])
+    if not documents and len(cursors) > 1:
+        # The page emptied underneath us (e.g. deletions); fall back to the start
+        cursors[:] = [None]
+        documents, next_cursor = store.page_documents(limit=page_size)
+
+    clicked = (None, None)
+    for doc in documents:
+        action = render_document_card(doc)
+        if action:
+            clicked = (action, doc)
+
+    # Page navigation
+    if len(cursors) > 1 or next_cursor:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            st.button("◀ Previous", key=f"{key}_prev", disabled=len(cursors) == 1, on_click=cursors.pop)
+        with col2:
+            st.markdown(f"Page {len(cursors)} · {store.count_documents():,} documents")
+        with col3:
+            st.button("Next ▶", key=f"{key}_next", disabled=next_cursor is None,
+                      on_click=cursors.append, args=(next_cursor,))
+
+    return clicked
+
+
+def render_profiling_panel(session_id=None):
+    """Admin sidebar panel: span timings, cache counters and reruns, with exports."""
+    collector = telemetry.get_telemetry()
+    with st.sidebar.expander("⏱️ Profiling"):
+        if not telemetry.ENABLED:
+            st.caption("Timing spans are off. Start the server with CIVILDOC_TELEMETRY=1 to collect them.")
+        spans = collector.span_rows()
+        if spans:
+            st.markdown("**Spans**")
+            st.dataframe(
+                [{
+                    "Span": row["span"],
+                    "Calls": row["calls"],
+                    "Mean (ms)": round(row["mean_ms"], 2),
+                    "p95 ≤ (ms)": round(row["p95_ms"], 2),
+                    "Max (ms)": round(row["max_ms"], 2),
+                    "Total (s)": round(row["total_s"], 3)
+                } for row in spans],
+                hide_index=True,
+                use_container_width=True
+            )
+        sessions = collector.session_rows()
+        if sessions:
+            mine = next((row["reruns"] for row in sessions if row["session"] == session_id), 0)
+            st.caption(f"Reruns: {mine:,} this session, {sum(row['reruns'] for row in sessions):,} "
+                       f"across {len(sessions):,} sessions")
+
+        st.markdown("**Caches**")
+        st.dataframe(
+            [{
+                "Cache": region["region"],
+                "Entries": region["entries"],
+                "Hits": region["hits"],
+                "Misses": region["misses"],
+                "Hit rate": f"{region['hit_rate']:.0%}",
+                "Evictions": region["evictions"]
+            } for region in all_stats()],
+            hide_index=True,
+            use_container_width=True
+        )
+
+        # Exports are serialized on every render of the panel; a few KB, and
+        # only admins see it
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("Prometheus", collector.prometheus_text(), file_name="civildoc_metrics.prom",
+                               mime="text/plain", use_container_width=True)
+        with col2:
+            st.download_button("JSON lines", collector.jsonl(), file_name="civildoc_metrics.jsonl",
+                               mime="application/x-ndjson", use_container_width=True)
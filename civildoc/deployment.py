@@ -0,0 +1,30 @@
+"""Deployment hooks for the main app, resolved once per process.
+
+``streamlit_deploy`` is optional. The page script used to attempt the
+import on every rerun, paying for a failed module search each time; the
+lookup now happens once, when this module is first imported, and the
+local fallbacks below stand in when it is missing.
+"""
+import streamlit as st
+
+try:
+    from streamlit_deploy import setup_deployment, display_deployment_info, get_deployment_status
+except ImportError:
+    # Fallback functions if streamlit_deploy is not available
+    def setup_deployment():
+        st.set_page_config(
+            page_title="CivilDoc AI - Documentation Assistant",
+            page_icon="🏗️",
+            layout="wide",
+            initial_sidebar_state="expanded"
+        )
+
+    def display_deployment_info():
+        pass
+
+    def get_deployment_status():
+        return {
+            "environment": "Local Development",
+            "streamlit_version": st.__version__,
+            "is_production": False
+        }
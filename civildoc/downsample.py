@@ -0,0 +1,98 @@
+"""Server-side downsampling of long time series before they reach Plotly.
+
+Two methods are available, chosen per chart:
+
+* ``"lttb"``: Largest-Triangle-Three-Buckets. It keeps the visual shape
+  of a line, including its peaks, with one point per bucket.
+* ``"minmax"``: keeps the minimum and maximum of every bucket. It suits
+  spiky series and bars where extremes must never disappear.
+
+Both return indices into the original arrays, so the x values keep
+their type (dates stay dates) and several traces can share a sampling.
+"""
+import numpy as np
+
+METHODS = ("lttb", "minmax", "none")
+
+# Points per horizontal pixel worth sending; more cannot be displayed
+POINTS_PER_PIXEL = 2
+
+
+def max_points_for_width(width_px, points_per_pixel=POINTS_PER_PIXEL):
+    return max(int(width_px * points_per_pixel), 3)
+
+
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+def lttb_indices(x, y, n_out):
+    """Indices of the ``n_out`` points LTTB keeps from ``(x, y)``."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = _as_float(x)
+    y = np.asarray(y, dtype=np.float64)
+
+    # First and last points are always kept; the rest are split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket is the third vertex of the triangle
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        areas = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(np.argmax(areas))
+        indices[i + 1] = a
+    return indices
+
+
+def minmax_indices(y, n_out):
+    """Indices of each bucket's minimum and maximum, in order, ``n_out`` at most."""
+    n = len(y)
+    if n_out >= n or n_out < 6:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    # Endpoints plus a possible remainder bucket take four of the n_out points
+    buckets = (n_out - 4) // 2
+    inner = y[1:n - 1]
+    size = len(inner) // buckets
+    whole = inner[:size * buckets].reshape(buckets, size)
+    starts = np.arange(buckets) * size + 1
+    picks = [starts + whole.argmin(axis=1), starts + whole.argmax(axis=1)]
+    remainder = inner[size * buckets:]
+    if len(remainder):
+        offset = 1 + size * buckets
+        picks.append(np.array([offset + remainder.argmin(), offset + remainder.argmax()]))
+    return np.unique(np.concatenate([[0, n - 1], *picks]))
+
+
+def downsample(x, y, max_points, method="lttb"):
+    """Return ``(x, y)`` reduced to at most ``max_points`` with ``method``.
+
+    Missing values (such as the head of a rolling mean) are dropped first.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    finite = np.isfinite(y)
+    if not finite.all():
+        x, y = x[finite], y[finite]
+    if method == "none" or len(y) <= max_points:
+        return x, y
+    if method == "lttb":
+        indices = lttb_indices(x, y, max_points)
+    elif method == "minmax":
+        indices = minmax_indices(y, max_points)
+    else:
+        raise ValueError(f"Unknown downsampling method: {method!r}")
+    return x[indices], y[indices]
@@ -0,0 +1,270 @@
+"""Append-only columnar event log backing the Analytics Dashboard.
+
+Each table is stored as one directory per day, and each column of a day
+is a raw little-endian file that only ever grows::
+
+    data/events/<table>/2023-10-15/<column>.bin
+
+Readers memory-map just the columns and day partitions they ask for, so
+load time and resident memory follow the selected date range rather than
+the size of the whole history. String columns are dictionary-encoded as
+small integer codes; the dictionaries live in the table's _schema.json.
+
+Filters on category columns (``where={"project_type": [...]}``) are
+evaluated against the stored codes inside each partition. Other columns
+are only read for the matching rows, and not at all for partitions
+without a match.
+"""
+import json
+import os
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+
+from civildoc.store import DATA_DIR
+
+DEFAULT_EVENTS_DIR = os.path.join(DATA_DIR, "events")
+
+# Column types per table; "category" columns are dictionary-encoded
+TABLES = {
+    "activity": {
+        "metric": "category",
+        "project_type": "category"
+    },
+    "task_results": {
+        "task_type": "category",
+        "project_type": "category",
+        "completion_time": "<f8",
+        "accuracy": "<f8"
+    }
+}
+
+CATEGORY_DTYPE = np.dtype("<u2")
+
+
+def _day(value):
+    return np.datetime64(value, "D")
+
+
+class EventLog:
+    """Day-partitioned, memory-mapped columnar event store."""
+
+    def __init__(self, root=DEFAULT_EVENTS_DIR, tables=TABLES):
+        self.root = root
+        self.tables = tables
+        self._lock = threading.Lock()
+        self._dictionaries = {table: self._load_dictionaries(table) for table in tables}
+
+    # Schema and dictionaries
+
+    def _schema_path(self, table):
+        return os.path.join(self.root, table, "_schema.json")
+
+    def _load_dictionaries(self, table):
+        path = self._schema_path(table)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)["dictionaries"]
+        return {column: [] for column, kind in self.tables[table].items() if kind == "category"}
+
+    def _save_dictionaries(self, table):
+        path = self._schema_path(table)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"columns": self.tables[table], "dictionaries": self._dictionaries[table]}, f)
+        os.replace(tmp_path, path)
+
+    def dictionary(self, table, column):
+        """Return the values behind a category column's codes."""
+        return list(self._dictionaries[table][column])
+
+    def _encode(self, table, column, values):
+        dictionary = self._dictionaries[table][column]
+        uniques, inverse = np.unique(np.asarray(values, dtype=object), return_inverse=True)
+        codes = {value: i for i, value in enumerate(dictionary)}
+        changed = False
+        for value in uniques:
+            if value not in codes:
+                codes[value] = len(dictionary)
+                dictionary.append(value)
+                changed = True
+        mapped = np.array([codes[value] for value in uniques], dtype=CATEGORY_DTYPE)
+        return mapped[inverse.ravel()], changed
+
+    def _dtype(self, table, column):
+        kind = self.tables[table][column]
+        return CATEGORY_DTYPE if kind == "category" else np.dtype(kind)
+
+    # Writing
+
+    def append(self, table, dates, **columns):
+        """Append events to ``table``; every column must have one value per date."""
+        days = np.asarray(dates, dtype="datetime64[D]")
+        if not len(days):
+            return
+        missing = set(self.tables[table]) - set(columns)
+        if missing:
+            raise ValueError(f"Missing columns for {table}: {sorted(missing)}")
+
+        with self._lock:
+            encoded = {}
+            dictionaries_changed = False
+            for column, values in columns.items():
+                if self.tables[table][column] == "category":
+                    encoded[column], changed = self._encode(table, column, values)
+                    dictionaries_changed = dictionaries_changed or changed
+                else:
+                    encoded[column] = np.asarray(values, dtype=self._dtype(table, column))
+            # Dictionaries are written before data so every stored code can be decoded
+            if dictionaries_changed:
+                self._save_dictionaries(table)
+
+            order = np.argsort(days, kind="stable")
+            days = days[order]
+            boundaries = np.flatnonzero(days[1:] != days[:-1]) + 1
+            for lo, hi in zip(np.r_[0, boundaries], np.r_[boundaries, len(days)]):
+                partition = os.path.join(self.root, table, str(days[lo]))
+                os.makedirs(partition, exist_ok=True)
+                rows = order[lo:hi]
+                for column, values in encoded.items():
+                    with open(os.path.join(partition, f"{column}.bin"), "ab") as f:
+                        f.write(np.ascontiguousarray(values[rows]).tobytes())
+            # Bumped after the data is written, so readers never see a watermark ahead of its rows
+            self._write_watermark(table, self._read_watermark(table) + 1)
+
+    def _watermark_path(self, table):
+        return os.path.join(self.root, table, "_watermark")
+
+    def _read_watermark(self, table):
+        try:
+            with open(self._watermark_path(table), encoding="utf-8") as f:
+                return int(f.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _write_watermark(self, table, value):
+        tmp_path = self._watermark_path(table) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(str(value))
+        os.replace(tmp_path, self._watermark_path(table))
+
+    def watermark(self):
+        """Append counters of every table; changes whenever any table grows."""
+        return tuple(self._read_watermark(table) for table in self.tables)
+
+    # Reading
+
+    def days(self, table):
+        """Sorted partition days present for ``table``."""
+        path = os.path.join(self.root, table)
+        if not os.path.isdir(path):
+            return []
+        return sorted(_day(name) for name in os.listdir(path) if not name.startswith("_"))
+
+    def is_empty(self):
+        return not any(self.days(table) for table in self.tables)
+
+    def _partition_columns(self, table, day, columns):
+        partition = os.path.join(self.root, table, str(day))
+        paths = {column: os.path.join(partition, f"{column}.bin") for column in columns}
+        # A crash mid-append can leave columns uneven; only whole rows are visible
+        rows = min(os.path.getsize(path) // self._dtype(table, column).itemsize for column, path in paths.items())
+        if not rows:
+            return 0, {}
+        return rows, {
+            column: np.memmap(path, dtype=self._dtype(table, column), mode="r", shape=(rows,))
+            for column, path in paths.items()
+        }
+
+    def _predicates(self, table, where):
+        """Per filtered column, a lookup table of allowed codes."""
+        predicates = {}
+        for column, values in where.items():
+            if self.tables[table].get(column) != "category":
+                raise ValueError(f"Only category columns can be filtered: {table}.{column}")
+            allowed = np.zeros(np.iinfo(CATEGORY_DTYPE).max + 1, dtype=bool)
+            codes = {value: i for i, value in enumerate(self._dictionaries[table][column])}
+            allowed[[codes[value] for value in values if value in codes]] = True
+            predicates[column] = allowed
+        return predicates
+
+    def iter_partitions(self, table, columns, start=None, end=None, where=None, since=None):
+        """Yield ``(day, rows, {column: array})`` for each day in [start, end].
+
+        ``where`` maps category columns to the values to keep; a None or
+        missing entry keeps every value. Arrays are memory maps when no
+        filter applies and the matching rows otherwise.
+
+        ``since`` maps days to the number of rows already read from them.
+        Only rows appended after those are yielded, and the map is moved
+        forward to every partition's current row count.
+        """
+        start = _day(start) if start is not None else None
+        end = _day(end) if end is not None else None
+        predicates = self._predicates(table, {column: values for column, values in (where or {}).items()
+                                              if values is not None})
+        if any(not allowed.any() for allowed in predicates.values()):
+            return
+        for day in self.days(table):
+            if (start is not None and day < start) or (end is not None and day > end):
+                continue
+            rows, arrays = self._partition_columns(table, day, list(dict.fromkeys([*predicates, *columns])))
+            if since is not None:
+                offset = since.get(day, 0)
+                if rows <= offset:
+                    continue
+                since[day] = rows
+                arrays = {column: values[offset:] for column, values in arrays.items()}
+                rows -= offset
+            if not rows:
+                continue
+            if not predicates:
+                yield day, rows, arrays
+                continue
+            mask = None
+            for column, allowed in predicates.items():
+                matches = allowed[arrays[column]]
+                mask = matches if mask is None else mask & matches
+            matched = np.flatnonzero(mask)
+            if not len(matched):
+                continue
+            if len(matched) == rows:
+                yield day, rows, {column: arrays[column] for column in columns}
+            else:
+                yield day, len(matched), {column: arrays[column][matched] for column in columns}
+
+    def read(self, table, columns, start=None, end=None, where=None, since=None):
+        """Read ``columns`` plus a ``date`` column for the days in [start, end].
+
+        Only the requested columns of the selected partitions are touched,
+        and with ``where`` only the rows matching it; with ``since``, only
+        rows appended after the last read (see ``iter_partitions()``).
+        """
+        parts = {column: [] for column in columns}
+        dates = []
+        for day, rows, arrays in self.iter_partitions(table, columns, start, end, where, since):
+            dates.append(np.full(rows, day))
+            for column in columns:
+                parts[column].append(arrays[column])
+        result = {
+            column: np.concatenate(chunks) if chunks else np.empty(0, dtype=self._dtype(table, column))
+            for column, chunks in parts.items()
+        }
+        result["date"] = np.concatenate(dates) if dates else np.empty(0, dtype="datetime64[D]")
+        return result
+
+    def decode(self, table, column, codes):
+        """Map category codes back to their values."""
+        return np.asarray(self._dictionaries[table][column], dtype=object)[codes]
+
+
+def default_range(log, table, days=365):
+    """The most recent ``days`` of history in ``table``, as (start, end) dates."""
+    partitions = log.days(table)
+    if not partitions:
+        today = date.today()
+        return today - timedelta(days=days - 1), today
+    end = partitions[-1].astype(date)
+    return end - timedelta(days=days - 1), end
@@ -0,0 +1,51 @@
+"""Process-wide cache of serialized Plotly figures for the dashboard.
+
+Building a figure, with Plotly Express especially, costs far more than
+showing one. Dashboard figures are therefore built once per dataset
+version and chart parameters, and kept as their Plotly JSON in the
+"figures" cache region, which is shared by every session and bounded by
+the total size of the JSON it holds.
+
+``st.plotly_chart`` re-validates figures given as dicts, which would cost
+about as much as building them again. ``figure_from_json()`` returns a
+Figure instead, built without validation because the JSON came from a
+validated figure in the first place.
+
+Plotly is imported by the functions that use it, so importing this
+module does not load it.
+"""
+import json
+
+from civildoc.cache import get_region
+
+# Total size of cached figure JSON, and figures kept
+FIGURE_CACHE_BYTES = 32 * 1024 * 1024
+FIGURE_CACHE_ENTRIES = 256
+
+_figures = get_region("figures", max_entries=FIGURE_CACHE_ENTRIES, max_bytes=FIGURE_CACHE_BYTES, sizeof=len)
+
+
+def figure_json(name, version, params, build):
+    """Plotly JSON of figure ``name``, built by ``build()`` on a miss.
+
+    ``version`` identifies the data the figure shows and ``params`` the
+    chart options; a change to either builds the figure again.
+    """
+    import plotly.io as pio
+
+    return _figures.get_or_compute((name, params), lambda: pio.to_json(build(), validate=False), version)
+
+
+def figure_from_json(spec):
+    import plotly.graph_objects as go
+
+    return go.Figure(json.loads(spec), _validate=False)
+
+
+def cached_figure(name, version, params, build):
+    """Figure ``name`` rebuilt from its cached JSON, for ``st.plotly_chart``."""
+    return figure_from_json(figure_json(name, version, params, build))
+
+
+def figure_cache():
+    return _figures
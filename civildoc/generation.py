@@ -0,0 +1,148 @@
+"""Content generators for agent task steps.
+
+A generator turns one execution step into a stream of text chunks, so
+the task engine can publish partial output as soon as it exists instead
+of after the whole task. ``StubGenerator`` produces deterministic report
+text locally and is used until a real model backend is configured. Given
+a ``retriever``, its first step also cites the most relevant passages of
+existing reports. Generators have a ``version``, part of the key of
+cached task results, and ``input_documents(task)`` returns the passages
+a task's output depends on.
+
+``StubSuggestionModel`` stands in for the writing-assistant model in
+the same way. It reviews a batch of document sections per call and
+sleeps for a per-call plus per-section latency like a remote model.
+"""
+import re
+import time
+
+# Section written by each execution step, in TASK_STEPS order
+STEP_SECTIONS = {
+    "Analyze Project Scope": (
+        "Project Overview and Background",
+        "This section sets out the scope for \"{title}\". {description}. Key stakeholders, site boundaries "
+        "and the applicable planning framework have been identified from the project brief."
+    ),
+    "Environmental Data Collection": (
+        "Environmental Baseline Survey",
+        "Baseline data was gathered for air quality, ambient noise, hydrology and local ecology. Historical "
+        "monitoring records were reviewed to establish seasonal variation before construction starts."
+    ),
+    "Impact Assessment Analysis": (
+        "Potential Environmental Impact Analysis",
+        "Construction and operational impacts were scored by magnitude and sensitivity of the receptor. "
+        "Dust, vibration and temporary traffic diversions are the most significant short-term effects."
+    ),
+    "Mitigation Measures Recommendation": (
+        "Environmental Protection Measures",
+        "Recommended measures include dust suppression, acoustic hoarding near residential receptors, "
+        "working-hour restrictions and a habitat compensation plan agreed with the local authority."
+    ),
+    "Generate Final Report": (
+        "Monitoring and Management Plan",
+        "A monitoring schedule with trigger levels and reporting responsibilities closes the assessment. "
+        "Report generation completed, meets environmental department requirements."
+    )
+}
+
+
+# Characters of each retrieved passage quoted in the report
+QUOTED_PASSAGE_CHARS = 240
+
+
+class StubGenerator:
+    """Offline generator that streams canned report sections word by word.
+
+    ``retriever(text)`` returns passages (dicts with "title" and "text")
+    relevant to the task, e.g. ``EmbeddingIndex.passages``.
+    """
+
+    version = "stub-generator-1"
+
+    def __init__(self, token_delay=0.03, retriever=None):
+        self.token_delay = token_delay
+        self.retriever = retriever
+
+    def input_documents(self, task):
+        """Passages cited by the first step."""
+        if self.retriever is None:
+            return []
+        return self.retriever(f"{task['title']}. {task.get('description', '')}")
+
+    def stream_step(self, task, step, previous_sections, passages=None, tenant=None):
+        """Yield the markdown for ``step`` in small chunks.
+
+        ``passages`` are those from ``input_documents()``, looked up here
+        when not given. ``tenant`` is the user the task runs for; the stub
+        does not need it.
+        """
+        heading, template = STEP_SECTIONS.get(step["name"], (step["name"], step["desc"] + "."))
+        yield f"#### {len(previous_sections) + 1}. {heading}\n\n"
+        text = template.format(title=task["title"], description=task.get("description", "").rstrip("."))
+        for word in text.split(" "):
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield word + " "
+        yield "\n\n"
+        if not previous_sections:
+            if passages is None:
+                passages = self.input_documents(task)
+            if passages:
+                yield "**Relevant passages from existing reports:**\n\n"
+                for passage in passages:
+                    text = " ".join(passage["text"].split())
+                    # The first passage of a document starts with its title
+                    text = text[len(passage["title"]):].lstrip() if text.startswith(passage["title"]) else text
+                    if len(text) > QUOTED_PASSAGE_CHARS:
+                        text = text[:QUOTED_PASSAGE_CHARS].rsplit(" ", 1)[0] + "…"
+                    yield f"- *{passage['title']}*: {text}\n"
+                yield "\n"
+
+
+_VAGUE = re.compile(r"\b(?:etc|approximately|various|some|several|appropriate|as required)\b", re.IGNORECASE)
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_TABLE_OR_LIST = re.compile(r"^\s*(?:\||[-*] |\d+\. )", re.MULTILINE)
+
+# Paragraphs longer than this many words are flagged as hard to read
+LONG_PARAGRAPH_WORDS = 150
+
+
+class StubSuggestionModel:
+    """Offline writing-assistant model with rule-of-thumb suggestions.
+
+    ``suggest_batch`` takes ``(heading, text)`` pairs and returns, for each,
+    a list of ``{"kind", "text"}`` suggestions where kind is "success",
+    "info" or "warning". ``tenant`` names the user the sections belong to.
+    """
+
+    version = "stub-suggestions-1"
+
+    def __init__(self, call_latency=0.2, section_latency=0.02):
+        self.call_latency = call_latency
+        self.section_latency = section_latency
+
+    def suggest_batch(self, sections, tenant=None):
+        if self.call_latency or self.section_latency:
+            time.sleep(self.call_latency + self.section_latency * len(sections))
+        return [self._suggest(heading, text) for heading, text in sections]
+
+    def _suggest(self, heading, text):
+        suggestions = []
+        numbers = _NUMBER.findall(text)
+        if not numbers:
+            suggestions.append({"kind": "success", "text": "You can add quantities, dimensions or test results "
+                                                           "to support this section"})
+        elif len(numbers) >= 8 and not _TABLE_OR_LIST.search(text):
+            suggestions.append({"kind": "info", "text": f"{len(numbers)} figures in running text; would a table "
+                                                        "or chart present them better?"})
+        longest = max((len(paragraph.split()) for paragraph in text.split("\n\n")), default=0)
+        if longest > LONG_PARAGRAPH_WORDS:
+            suggestions.append({"kind": "info", "text": f"Split the longest paragraph ({longest} words) "
+                                                        "for readability"})
+        vague = sorted({match.group().lower() for match in _VAGUE.finditer(text)})
+        if vague:
+            suggestions.append({"kind": "warning", "text": "Replace vague wording with specific values: "
+                                                           + ", ".join(f"\"{word}\"" for word in vague)})
+        if not suggestions:
+            suggestions.append({"kind": "success", "text": "Section structure meets engineering standards"})
+        return suggestions
@@ -0,0 +1,314 @@
+"""Batch ingestion of building plans into the document store.
+
+Uploaded PDFs and images are split into batches of pages, and the
+batches are extracted in a process pool: page text from the PDF text
+layer (or image metadata), plus the measurements found in that text.
+Results stream back batch by batch and are written to the store as they
+arrive. Each file becomes one document whose pages are kept in the
+``document_pages`` table. At most a few batches are in flight at once,
+so memory stays bounded however large the plan set is.
+
+Images have no text layer and no OCR engine is bundled, so image pages
+keep only their size and any embedded description, and are flagged
+``needs_ocr``.
+"""
+import hashlib
+import multiprocessing
+import os
+import re
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date
+
+from PIL import Image
+
+from civildoc.pdf import PDFDocument, PDFError
+from civildoc.store import DATA_DIR
+
+DEFAULT_UPLOAD_DIR = os.path.join(DATA_DIR, "uploads")
+
+PDF_EXTENSIONS = (".pdf",)
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".gif", ".webp")
+SUPPORTED_EXTENSIONS = PDF_EXTENSIONS + IMAGE_EXTENSIONS
+
+# Processes in a pool from make_pool() by default
+POOL_WORKERS = os.cpu_count() or 1
+
+# Pages handed to a worker at a time
+PAGE_BATCH = 16
+
+# Batches in flight per worker; bounds memory in the parent process
+BATCHES_PER_WORKER = 2
+
+# Measurements listed in a document body; the rest are only counted
+MAX_LISTED_MEASUREMENTS = 50
+
+# Image metadata keys that may carry a drawing's text
+IMAGE_TEXT_KEYS = ("Title", "Description", "Comment", "Subject", "comment", "ImageDescription")
+
+_NUMBER = r"\d+(?:[.,]\d+)?"
+_MEASUREMENT = re.compile(
+    rf"(?P<value>{_NUMBER}(?:\s*[x×]\s*{_NUMBER})*)\s*"
+    r"(?P<unit>kN/m²|kN/m2|kN|kPa|MPa|mm|cm|km|m²|m2|m³|m3|m|kg|ft|in|°|%)(?![A-Za-z0-9])"
+    r"|(?P<scale>\b1\s*:\s*\d{1,5})\b"
+    r"|(?P<feet>\d+)'\s*-?\s*(?P<inches>\d+(?:\.\d+)?)\""
+)
+_UNIT_NAMES = {"m2": "m²", "m3": "m³", "kN/m2": "kN/m²"}
+
+
+def extract_measurements(text):
+    """Dimensions, areas, loads, angles and scales found in ``text``."""
+    found = []
+    for match in _MEASUREMENT.finditer(text):
+        if match.group("scale"):
+            value = [1.0, float(match.group("scale").split(":")[1])]
+            unit = "scale"
+        elif match.group("feet"):
+            value = float(match.group("feet")) * 12 + float(match.group("inches"))
+            unit = "in"
+        else:
+            parts = [float(part.replace(",", ".")) for part in re.split(r"\s*[x×]\s*", match.group("value"))]
+            value = parts[0] if len(parts) == 1 else parts
+            unit = _UNIT_NAMES.get(match.group("unit"), match.group("unit"))
+        found.append({"text": match.group().strip(), "value": value, "unit": unit, "start": match.start()})
+    return found
+
+
+def file_kind(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in PDF_EXTENSIONS:
+        return "pdf"
+    if extension in IMAGE_EXTENSIONS:
+        return "image"
+    raise ValueError(f"Unsupported file type: {path}")
+
+
+def page_count(path):
+    if file_kind(path) == "pdf":
+        with PDFDocument(path) as pdf:
+            return pdf.page_count()
+    with Image.open(path) as image:
+        return getattr(image, "n_frames", 1)
+
+
+# Worker side: one open PDF per process, reused across its batches
+_open_pdf = None
+
+
+def _pdf(path):
+    global _open_pdf
+    if _open_pdf is None or _open_pdf.path != path:
+        if _open_pdf is not None:
+            _open_pdf.close()
+        _open_pdf = PDFDocument(path)
+    return _open_pdf
+
+
+def _page_record(number, text, width, height, needs_ocr=False):
+    return {
+        "page": number,
+        "text": text,
+        "measurements": extract_measurements(text),
+        "width": round(width, 1),
+        "height": round(height, 1),
+        "needs_ocr": needs_ocr
+    }
+
+
+def extract_pages(path, start, stop):
+    """Extract pages [start, stop) of ``path``; page numbers are 1-based."""
+    pages = []
+    if file_kind(path) == "pdf":
+        pdf = _pdf(path)
+        for index in range(start, stop):
+            try:
+                text = pdf.page_text(index)
+            except (PDFError, ValueError, KeyError, IndexError, TypeError):
+                text = ""
+            width, height = pdf.page_size(index)
+            pages.append(_page_record(index + 1, text, width, height, needs_ocr=not text))
+        return pages
+
+    with Image.open(path) as image:
+        for index in range(start, stop):
+            # Seeking decodes only the frame's header; pixels are never loaded
+            image.seek(index)
+            info = dict(image.info)
+            description = image.getexif().get(270)
+            if description:
+                info["ImageDescription"] = description
+            text = "\n".join(str(info[key]) for key in IMAGE_TEXT_KEYS if info.get(key))
+            pages.append(_page_record(index + 1, text, image.width, image.height, needs_ocr=True))
+    return pages
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_pool(max_workers=POOL_WORKERS):
+    """Process pool for extraction; spawned, as forking a threaded server is unsafe."""
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _document_body(store, doc_id):
+    """Markdown body: measurement summary followed by the text of each page."""
+    parts = []
+    listed = []
+    total = 0
+    needs_ocr = 0
+    for page in store.iter_pages(doc_id):
+        total += len(page["measurements"])
+        needs_ocr += page["needs_ocr"]
+        for measurement in page["measurements"]:
+            if len(listed) < MAX_LISTED_MEASUREMENTS:
+                listed.append(f"| {page['page']} | {measurement['text']} | {measurement['unit']} |")
+        if page["text"]:
+            parts.append(f"### Page {page['page']}\n\n{page['text']}")
+    body = [f"## Extracted Measurements\n\n{total:,} found."]
+    if listed:
+        body.append("| Page | Measurement | Unit |\n|---|---|---|\n" + "\n".join(listed))
+    if needs_ocr:
+        body.append(f"{needs_ocr:,} page(s) have no text layer and need OCR.")
+    body.append("## Page Text\n\n" + ("\n\n".join(parts) or "No text layer found."))
+    return "\n\n".join(body)
+
+
+def ingest_files(paths, store, executor=None, workers=POOL_WORKERS, batch_pages=PAGE_BATCH):
+    """Extract ``paths`` into ``store``, yielding progress events.
+
+    ``workers`` is the number of processes in ``executor``, which bounds
+    the batches in flight.
+
+    Events are dicts with ``type`` "progress" (``pages_done``,
+    ``pages_total``), "document" (the finished ``document``) or "failed"
+    (``path``, ``id`` and ``error`` of a file that could not be read). A
+    failed file's placeholder document is kept, with the error as its
+    preview, and the other files carry on.
+    """
+    own_executor = executor is None
+    executor = executor or make_pool(workers)
+    try:
+        # Files are parsed in the pool only, so a malformed one cannot stall
+        # the calling script thread
+        counts = [executor.submit(page_count, path) for path in paths]
+        files = []
+        for path, count in zip(paths, counts):
+            try:
+                digest = file_digest(path)[:16]
+                pages = count.result()
+            except Exception as exc:
+                yield {"type": "failed", "path": path, "id": None, "error": _error_text(exc)}
+                continue
+            doc_id = "upload-" + digest
+            # save_upload prefixes stored names with the digest
+            name = os.path.basename(path)
+            if name.startswith(digest + "-"):
+                name = name[len(digest) + 1:]
+            title = os.path.splitext(name)[0].replace("_", " ")
+            files.append({"path": path, "id": doc_id, "title": title, "pages": pages, "remaining": 0,
+                          "pages_done": 0, "failed": False})
+            store.upsert_documents([{
+                "id": doc_id, "title": title, "date": date.today().isoformat(),
+                "status": "Draft", "preview": "Extracting text and measurements..."
+            }])
+            store.delete_pages(doc_id)
+
+        batches = [
+            (info, start, min(start + batch_pages, info["pages"]))
+            for info in files for start in range(0, info["pages"], batch_pages)
+        ]
+        for info, _, _ in batches:
+            info["remaining"] += 1
+        pages_total = sum(info["pages"] for info in files)
+        pages_done = 0
+        yield {"type": "progress", "pages_done": 0, "pages_total": pages_total}
+
+        pending = {}
+        queued = iter(batches)
+        finished_files = [info for info in files if not info["pages"]]
+        while True:
+            while len(pending) < workers * BATCHES_PER_WORKER:
+                batch = next(queued, None)
+                if batch is None:
+                    break
+                info, start, stop = batch
+                if info["failed"]:
+                    info["remaining"] -= 1
+                    continue
+                pending[executor.submit(extract_pages, info["path"], start, stop)] = info
+            if not pending and not finished_files:
+                break
+            if pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    info = pending.pop(future)
+                    info["remaining"] -= 1
+                    if info["failed"]:
+                        continue
+                    try:
+                        pages = future.result()
+                    except Exception as exc:
+                        # Drop the file, and its pages from the progress total
+                        info["failed"] = True
+                        pages_total -= info["pages"] - info["pages_done"]
+                        yield _fail_document(store, info, exc)
+                        continue
+                    store.upsert_pages(info["id"], pages)
+                    info["pages_done"] += len(pages)
+                    pages_done += len(pages)
+                    if not info["remaining"]:
+                        finished_files.append(info)
+                yield {"type": "progress", "pages_done": pages_done, "pages_total": pages_total}
+            for info in finished_files:
+                body = _document_body(store, info["id"])
+                first_text = next((page["text"] for page in store.iter_pages(info["id"]) if page["text"]), "")
+                preview = " ".join(first_text.split())[:200] or f"{info['pages']} page(s) with no text layer"
+                store.update_document(info["id"], body=body, preview=preview)
+                yield {"type": "document", "document": store.get_document(info["id"])}
+            finished_files = []
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+
+def _error_text(exc):
+    return str(exc) or type(exc).__name__
+
+
+def _fail_document(store, info, exc):
+    """Mark a file's placeholder document failed; return the "failed" event."""
+    error = _error_text(exc)
+    store.delete_pages(info["id"])
+    store.update_document(info["id"], body=f"## Extraction Failed\n\n{error}",
+                          preview=f"Extraction failed: {error}"[:200])
+    return {"type": "failed", "path": info["path"], "id": info["id"], "error": error}
+
+
+def save_upload(uploaded, upload_dir=DEFAULT_UPLOAD_DIR, chunk_size=1 << 20):
+    """Copy an uploaded file object to ``upload_dir`` in chunks; return its path.
+
+    The stored name starts with the start of the file's digest, as in its
+    document id, so uploads that share a name do not overwrite each other.
+    """
+    os.makedirs(upload_dir, exist_ok=True)
+    name = os.path.basename(getattr(uploaded, "name", "upload"))
+    digest = hashlib.sha1()
+    fd, partial = tempfile.mkstemp(dir=upload_dir, suffix=".part")
+    try:
+        uploaded.seek(0)
+        with os.fdopen(fd, "wb") as f:
+            for chunk in iter(lambda: uploaded.read(chunk_size), b""):
+                digest.update(chunk)
+                f.write(chunk)
+        path = os.path.join(upload_dir, f"{digest.hexdigest()[:16]}-{name}")
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return path
@@ -0,0 +1,268 @@
+"""Persistent, prioritized job queue for AI agent tasks.
+
+Every launch becomes a row in a local SQLite queue, so queued and
+finished jobs survive a server restart and every session sees the same
+list. ``claim()`` picks the next jobs to run:
+
+* higher priority first;
+* within a priority, shortest estimated time first (from the task's
+  ``estimatedTime``), aged by how long each job has waited so long
+  tasks are not starved;
+* never more than ``user_limit`` running jobs per user;
+* never more than ``heavy_limit`` running High-complexity jobs, so short
+  extraction jobs keep flowing while a long report is generated.
+
+Running jobs checkpoint the sections of their finished steps into their
+row. A job requeued after a crash or redeploy, or resumed after being
+stopped, is claimed with those sections and continues after them.
+
+Several server processes may share one queue. A claimed job records the
+claiming worker's id and a heartbeat that the worker renews while the
+job runs; ``requeue_expired()`` only returns a running job to the queue
+once its heartbeat is older than the lease, i.e. its worker has died.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+from civildoc.store import DATA_DIR
+
+DEFAULT_QUEUE_PATH = os.path.join(DATA_DIR, "jobs.db")
+
+# Priority names shown in the UI, lowest first
+PRIORITIES = {"Low": 0, "Normal": 1, "High": 2}
+DEFAULT_PRIORITY = PRIORITIES["Normal"]
+
+HEAVY_COMPLEXITY = "High"
+
+# Seconds of waiting that offset one second of estimated run time
+AGING_RATE = 1.0
+
+# Seconds without a heartbeat after which a running job's worker is
+# presumed dead and the job is requeued
+LEASE_SECONDS = 30.0
+
+# Job states
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+CANCELLED = "cancelled"
+FAILED = "failed"
+
+FINISHED_STATES = (COMPLETED, CANCELLED, FAILED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    task_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    complexity TEXT NOT NULL,
+    cost REAL NOT NULL,
+    status TEXT NOT NULL,
+    step INTEGER NOT NULL DEFAULT 0,
+    total_steps INTEGER NOT NULL,
+    submitted_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    error TEXT,
+    task TEXT NOT NULL,
+    output TEXT,
+    worker_id TEXT,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, priority DESC, submitted_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_submitted ON jobs (submitted_at DESC);
+"""
+
+# Columns added since the first release, created on queues that predate them
+ADDED_COLUMNS = {"worker_id": "TEXT", "heartbeat_at": "REAL"}
+
+# Columns for list views; task payloads and output are only loaded per job
+JOB_LIST_COLUMNS = (
+    "id, task_id, title, user_id, priority, complexity, cost, status, step, total_steps, "
+    "submitted_at, started_at, finished_at, error"
+)
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)\s*(second|sec|s|minute|min|m|hour|hr|h)", re.IGNORECASE)
+_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600}
+
+
+def estimated_seconds(text, default=900.0):
+    """Parse an ``estimatedTime`` such as "45 minutes" or "1 hour 30 min"."""
+    matches = _DURATION.findall(text or "")
+    if not matches:
+        return default
+    return sum(float(value) * _UNIT_SECONDS[unit[0].lower()] for value, unit in matches)
+
+
+def _job_from_row(row):
+    job = dict(row)
+    if "output" in job:
+        job["sections"] = json.loads(job.pop("output") or "[]")
+    if "task" in job:
+        job["task"] = json.loads(job["task"])
+    return job
+
+
+class JobQueue:
+    """Jobs persisted in a local SQLite file, claimed atomically by workers."""
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in ADDED_COLUMNS.items():
+            if column not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; claim() opens its own write transaction
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def submit(self, task, user_id, priority=DEFAULT_PRIORITY, total_steps=1):
+        """Queue ``task`` for ``user_id`` and return the new job id."""
+        job_id = uuid.uuid4().hex
+        self._conn().execute(
+            "INSERT INTO jobs (id, task_id, title, user_id, priority, complexity, cost, status, total_steps, "
+            "submitted_at, task) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, task["id"], task["title"], user_id, priority, task.get("complexity", "Medium"),
+             estimated_seconds(task.get("estimatedTime")), PENDING, total_steps, time.time(), json.dumps(task))
+        )
+        return job_id
+
+    def claim(self, limit, user_limit, heavy_limit, worker_id=None):
+        """Mark up to ``limit`` runnable jobs as running by ``worker_id`` and return them."""
+        if limit <= 0:
+            return []
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            running = {
+                row["user_id"]: row["n"] for row in conn.execute(
+                    "SELECT user_id, COUNT(*) AS n FROM jobs WHERE status = ? GROUP BY user_id", (RUNNING,)
+                )
+            }
+            heavy = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND complexity = ?", (RUNNING, HEAVY_COMPLEXITY)
+            ).fetchone()[0]
+
+            # Users already at their limit are filtered out in SQL
+            saturated = [user for user, n in running.items() if n >= user_limit]
+            query = "SELECT * FROM jobs WHERE status = ?"
+            params = [PENDING]
+            if saturated:
+                query += f" AND user_id NOT IN ({', '.join('?' * len(saturated))})"
+                params += saturated
+            query += " ORDER BY priority DESC, cost - (? - submitted_at) * ? ASC, submitted_at"
+            params += [now, AGING_RATE]
+
+            claimed = []
+            for row in conn.execute(query, params):
+                user = row["user_id"]
+                if running.get(user, 0) >= user_limit:
+                    continue
+                is_heavy = row["complexity"] == HEAVY_COMPLEXITY
+                if is_heavy and heavy >= heavy_limit:
+                    continue
+                claimed.append(row)
+                running[user] = running.get(user, 0) + 1
+                heavy += is_heavy
+                if len(claimed) == limit:
+                    break
+            conn.executemany(
+                "UPDATE jobs SET status = ?, started_at = ?, worker_id = ?, heartbeat_at = ? WHERE id = ?",
+                [(RUNNING, now, worker_id, now, row["id"]) for row in claimed]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        jobs = [_job_from_row(row) for row in claimed]
+        for job in jobs:
+            job.update(status=RUNNING, started_at=now, worker_id=worker_id, heartbeat_at=now)
+        return jobs
+
+    def heartbeat(self, worker_id):
+        """Renew the lease on every job ``worker_id`` is running."""
+        self._conn().execute(
+            "UPDATE jobs SET heartbeat_at = ? WHERE status = ? AND worker_id = ?",
+            (time.time(), RUNNING, worker_id)
+        )
+
+    def update(self, job_id, **fields):
+        if "sections" in fields:
+            fields["output"] = json.dumps(fields.pop("sections"))
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        self._conn().execute(f"UPDATE jobs SET {assignments} WHERE id = ?", [*fields.values(), job_id])
+
+    def checkpoint(self, job_id, step, sections):
+        """Record the sections of the first ``step`` steps, committed before returning."""
+        self.update(job_id, step=step, sections=sections)
+
+    def resume(self, job_id):
+        """Queue a stopped or failed job again; it keeps its checkpointed steps."""
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = ?, started_at = NULL, finished_at = NULL, error = NULL "
+            "WHERE id = ? AND status IN (?, ?)",
+            (PENDING, job_id, CANCELLED, FAILED)
+        )
+        return cursor.rowcount == 1
+
+    def cancel_pending(self, job_id):
+        """Cancel a job that has not started; return False if it already has."""
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+            (CANCELLED, time.time(), job_id, PENDING)
+        )
+        return cursor.rowcount == 1
+
+    def requeue_expired(self, lease=LEASE_SECONDS):
+        """Return running jobs whose worker missed its heartbeat for ``lease`` seconds to the queue.
+
+        They keep their checkpoints. Jobs claimed before heartbeats were
+        recorded have none and count as expired.
+        """
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = ?, started_at = NULL, worker_id = NULL, heartbeat_at = NULL "
+            "WHERE status = ? AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+            (PENDING, RUNNING, time.time() - lease)
+        )
+        return cursor.rowcount
+
+    def get(self, job_id):
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job_from_row(row) if row else None
+
+    def list_jobs(self, limit=50, user_id=None):
+        """Most recently submitted jobs, without payloads or output."""
+        query = f"SELECT {JOB_LIST_COLUMNS} FROM jobs"
+        params = []
+        if user_id:
+            query += " WHERE user_id = ?"
+            params.append(user_id)
+        query += " ORDER BY submitted_at DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self._conn().execute(query, params)]
+
+    def counts(self):
+        """Number of jobs in each state."""
+        rows = self._conn().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+        return {row["status"]: row["n"] for row in rows}
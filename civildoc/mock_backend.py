@@ -0,0 +1,204 @@
+"""Local stand-in for the model backend, for development and benchmarks.
+
+``MockBackend`` serves the protocol ``BackendClient`` speaks, from an
+asyncio server on a background thread, and answers with the offline
+stubs in ``civildoc.generation``. Like an inference server it runs only
+``slots`` calls at once, and a call takes ``call_latency`` plus
+``input_latency`` per input, so batching pays off as it would against
+the real thing. A ``failure_rate`` share of calls is answered with 503
+to exercise retries.
+
+Point the app at it with ``CIVILDOC_BACKEND_URL=http://127.0.0.1:8765``.
+
+Usage: python -m civildoc.mock_backend [--port 8765] [--slots 4]
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import threading
+
+from civildoc.compliance import split_sections
+from civildoc.generation import StubGenerator, StubSuggestionModel
+
+# Calls the server runs at once, and seconds per call and per input
+SLOTS = 4
+CALL_LATENCY = 0.02
+INPUT_LATENCY = 0.001
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 503: "Service Unavailable"}
+
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_SPACES = re.compile(r"[ \t]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+_suggestions = StubSuggestionModel(call_latency=0, section_latency=0)
+
+
+def suggest(input):
+    return _suggestions.suggest_batch([(input["heading"], input["text"])])[0]
+
+
+def generate(input):
+    passages = input.get("passages") or []
+    generator = StubGenerator(token_delay=0, retriever=(lambda text: passages) if passages else None)
+    sections = input.get("sections") or [""] * input.get("index", 0)
+    return {"text": "".join(generator.stream_step(input["task"], input["step"], sections))}
+
+
+def optimize(input):
+    """Tidy whitespace; reports the number of lines changed."""
+    lines = input["text"].split("\n")
+    tidy = [_SPACES.sub(" ", line).rstrip() for line in lines]
+    changes = sum(1 for old, new in zip(lines, tidy) if old != new)
+    text = _BLANK_LINES.sub("\n\n", "\n".join(tidy)).strip() + "\n"
+    return {"text": text, "changes": changes}
+
+
+def charts(input):
+    """One chart per section with at least two figures in it."""
+    text = input["text"]
+    found = []
+    for heading, start, end in split_sections(text):
+        values = [float(number) for number in _NUMBER.findall(text[start:end])]
+        if len(values) >= 2:
+            found.append({"title": heading or "Introduction", "values": values})
+    return {"charts": found}
+
+
+OPERATIONS = {"suggest": suggest, "generate": generate, "optimize": optimize, "charts": charts}
+
+
+class MockBackend:
+    """Model backend on ``127.0.0.1:port`` (0 picks a free port); see module docstring."""
+
+    def __init__(self, port=0, slots=SLOTS, call_latency=CALL_LATENCY, input_latency=INPUT_LATENCY,
+                 failure_rate=0.0, seed=None):
+        self.port = port
+        self.slots = slots
+        self.call_latency = call_latency
+        self.input_latency = input_latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.connections = 0
+        self.calls = 0
+        self.inputs = 0
+        self.failures = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        started = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._slots = asyncio.Semaphore(self.slots)
+            self._server = self._loop.run_until_complete(asyncio.start_server(self._handle, "127.0.0.1", self.port))
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="mock-backend", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self):
+        async def shutdown():
+            self._server.close()
+            # Handlers of open keep-alive connections end with the server
+            handlers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in handlers:
+                task.cancel()
+            await asyncio.gather(*handlers, return_exceptions=True)
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, payload = await self._respond(method, path, body)
+                data = json.dumps(payload).encode("utf-8")
+                close = headers.get("connection", "").lower() == "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n".encode("ascii") + data
+                )
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method, path, body):
+        operation = OPERATIONS.get(path[len("/v1/"):]) if method == "POST" and path.startswith("/v1/") else None
+        if operation is None:
+            return 404, {"error": f"No operation at {method} {path}"}
+        try:
+            inputs = json.loads(body)["inputs"]
+        except (ValueError, KeyError, TypeError):
+            return 400, {"error": "Expected a JSON body with an \"inputs\" list"}
+        async with self._slots:
+            await asyncio.sleep(self.call_latency + self.input_latency * len(inputs))
+            if self.failure_rate and self.rng.random() < self.failure_rate:
+                self.failures += 1
+                return 503, {"error": "Backend overloaded"}
+            try:
+                outputs = [operation(input) for input in inputs]
+            except (KeyError, TypeError) as exc:
+                return 400, {"error": f"Malformed input: {exc!r}"}
+        self.calls += 1
+        self.inputs += len(inputs)
+        return 200, {"outputs": outputs}
+
+    def stats(self):
+        return {"connections": self.connections, "calls": self.calls, "inputs": self.inputs,
+                "failures": self.failures}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--slots", type=int, default=SLOTS)
+    parser.add_argument("--call-latency", type=float, default=CALL_LATENCY)
+    parser.add_argument("--input-latency", type=float, default=INPUT_LATENCY)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    backend = MockBackend(args.port, args.slots, args.call_latency, args.input_latency, args.failure_rate).start()
+    print(f"mock backend listening on {backend.url}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        backend.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,472 @@
+"""Minimal, streaming PDF text reader for plan sets.
+
+Only what text extraction needs is implemented: an object index built by
+scanning the memory-mapped file, object streams, the page tree, Flate
+content streams, text-showing operators and ToUnicode CMaps. Pages are
+decoded one at a time, so memory follows the largest page, not the file.
+Scanned pages without a text layer come back empty.
+"""
+import bisect
+import mmap
+import re
+import zlib
+
+_OBJECT = re.compile(rb"(\d+)\s+(\d+)\s+obj\b")
+_OBJECT_STREAM = re.compile(rb"/Type\s*/ObjStm\b")
+_ROOT = re.compile(rb"/Root\s+(\d+)\s+\d+\s+R")
+_TEXT_OBJECT = re.compile(rb"(?<![A-Za-z0-9*'\"])BT(?![A-Za-z0-9*'\"])")
+_FONT_SELECT = re.compile(rb"/([^\s/<>\[\]()%{}]+)\s+[+-]?[\d.]+\s+Tf(?![A-Za-z0-9])")
+_WHITESPACE = re.compile(rb"(?:\s|%[^\r\n]*)*")
+_TOKEN = re.compile(rb"""
+    (?P<dict_open><<) | (?P<dict_close>>>) | (?P<array_open>\[) | (?P<array_close>\]) |
+    (?P<ref>\d+\s+\d+\s+R(?![A-Za-z])) |
+    (?P<number>[+-]?(?:\d+\.?\d*|\.\d+)) |
+    (?P<name>/[^\s/<>\[\]()%{}]*) |
+    (?P<string>\() | (?P<hex><[0-9A-Fa-f\s]*>) |
+    (?P<keyword>[A-Za-z'"][A-Za-z0-9*'"]*|\*) |
+    (?P<brace>[{}])
+""", re.VERBOSE)
+_ESCAPES = {ord("n"): b"\n", ord("r"): b"\r", ord("t"): b"\t", ord("b"): b"\b", ord("f"): b"\f"}
+_KEYWORDS = {b"true": True, b"false": False, b"null": None}
+
+# Deepest page tree accepted; real plan sets nest a few levels
+MAX_PAGE_TREE_DEPTH = 64
+
+# Largest decoded stream accepted, so a small compressed bomb cannot
+# exhaust a worker's memory
+MAX_STREAM_BYTES = 64 * 1024 * 1024
+
+
+class PDFError(Exception):
+    """The file is not a PDF this reader can handle."""
+
+
+class Ref(int):
+    """Indirect object reference."""
+
+
+class Operator(bytes):
+    """Content stream operator such as ``Tj``."""
+
+
+class _Parser:
+    """Recursive-descent parser for PDF objects over a bytes-like buffer."""
+
+    def __init__(self, data, pos=0):
+        self.data = data
+        self.pos = pos
+
+    def skip_whitespace(self):
+        self.pos = _WHITESPACE.match(self.data, self.pos).end()
+
+    def next_token(self):
+        self.skip_whitespace()
+        match = _TOKEN.match(self.data, self.pos)
+        if match is None:
+            if self.pos >= len(self.data):
+                return None, None
+            # Unknown byte: skip it rather than failing the whole page
+            self.pos += 1
+            return "skip", None
+        self.pos = match.end()
+        return match.lastgroup, match.group()
+
+    def value(self):
+        """Parse one object; keywords come back as Operator."""
+        while True:
+            kind, token = self.next_token()
+            if kind != "skip":
+                break
+        if kind is None:
+            raise PDFError("Unexpected end of data")
+        if kind == "number":
+            return float(token) if b"." in token else int(token)
+        if kind == "name":
+            return _decode_name(token[1:])
+        if kind == "ref":
+            return Ref(int(token.split()[0]))
+        if kind == "string":
+            return self.literal_string()
+        if kind == "hex":
+            digits = re.sub(rb"\s", b"", token[1:-1])
+            return bytes.fromhex((digits + b"0" * (len(digits) % 2)).decode("ascii"))
+        if kind == "array_open":
+            items = []
+            while True:
+                self.skip_whitespace()
+                if self.data[self.pos:self.pos + 1] == b"]":
+                    self.pos += 1
+                    return items
+                items.append(self.value())
+        if kind == "dict_open":
+            result = {}
+            while True:
+                self.skip_whitespace()
+                if self.data[self.pos:self.pos + 2] == b">>":
+                    self.pos += 2
+                    return result
+                key = self.value()
+                result[key] = self.value()
+        if kind == "keyword" and token in _KEYWORDS:
+            return _KEYWORDS[token]
+        return Operator(token)
+
+    def literal_string(self):
+        out = bytearray()
+        depth = 1
+        data = self.data
+        pos = self.pos
+        while pos < len(data):
+            c = data[pos]
+            if c == 0x5C:  # backslash
+                pos += 1
+                e = data[pos]
+                if e in _ESCAPES:
+                    out += _ESCAPES[e]
+                elif 0x30 <= e <= 0x37:
+                    end = pos + 1
+                    while end < pos + 3 and 0x30 <= data[end] <= 0x37:
+                        end += 1
+                    out.append(int(data[pos:end], 8) & 0xFF)
+                    pos = end - 1
+                elif e in (0x0A, 0x0D):
+                    if e == 0x0D and data[pos + 1:pos + 2] == b"\n":
+                        pos += 1
+                else:
+                    out.append(e)
+            elif c == 0x28:
+                depth += 1
+                out.append(c)
+            elif c == 0x29:
+                depth -= 1
+                if depth == 0:
+                    self.pos = pos + 1
+                    return bytes(out)
+                out.append(c)
+            else:
+                out.append(c)
+            pos += 1
+        self.pos = pos
+        return bytes(out)
+
+
+def _decode_name(raw):
+    if b"#" in raw:
+        raw = re.sub(rb"#([0-9A-Fa-f]{2})", lambda m: bytes([int(m.group(1), 16)]), raw)
+    return raw.decode("latin-1")
+
+
+def _decode_stream(info, data):
+    filters = info.get("Filter")
+    if filters is None:
+        return data
+    if not isinstance(filters, list):
+        filters = [filters]
+    for name in filters:
+        if name != "FlateDecode":
+            # Image codecs and rare text filters carry no extractable text here
+            return None
+        # A decompressor object also returns what it can of a truncated stream
+        decompressor = zlib.decompressobj()
+        data = decompressor.decompress(data, MAX_STREAM_BYTES)
+        if decompressor.unconsumed_tail:
+            raise PDFError(f"Stream decodes to more than {MAX_STREAM_BYTES // (1024 * 1024)} MB")
+    return data
+
+
+class PDFDocument:
+    """Read-only view of a PDF file, memory-mapped and indexed lazily."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise PDFError(f"Empty file: {path}")
+        if not self._data[:1024].lstrip().startswith(b"%PDF"):
+            self.close()
+            raise PDFError(f"Not a PDF file: {path}")
+        self._offsets = {}
+        for match in _OBJECT.finditer(self._data):
+            # Later definitions win, as with incremental updates
+            self._offsets[int(match.group(1))] = match.end()
+        self._compressed = None
+        self._cache = {}
+        # Objects being read, to catch one that refers back to itself
+        self._loading = set()
+        self._pages = None
+
+    def close(self):
+        self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Objects
+
+    def _load_object_streams(self):
+        # Objects packed in object streams are not visible to the offset scan
+        self._compressed = {}
+        starts = sorted(self._offsets.values())
+        by_start = {offset: num for num, offset in self._offsets.items()}
+        for match in _OBJECT_STREAM.finditer(self._data):
+            i = bisect.bisect_right(starts, match.start()) - 1
+            if i < 0:
+                continue
+            info, data = self._read_stream_at(starts[i])
+            if data is None or info.get("Type") != "ObjStm":
+                continue
+            header = _Parser(data[:info["First"]])
+            numbers = []
+            for _ in range(info["N"]):
+                numbers.append((header.value(), header.value()))
+            for num, offset in numbers:
+                if num not in self._offsets and num not in self._compressed:
+                    self._compressed[num] = (by_start[starts[i]], data, info["First"] + offset)
+
+    def _read_stream_at(self, offset):
+        parser = _Parser(self._data, offset)
+        info = parser.value()
+        if not isinstance(info, dict):
+            return info, None
+        parser.skip_whitespace()
+        if self._data[parser.pos:parser.pos + 6] != b"stream":
+            return info, None
+        start = parser.pos + 6
+        if self._data[start:start + 2] == b"\r\n":
+            start += 2
+        elif self._data[start:start + 1] in (b"\n", b"\r"):
+            start += 1
+        length = self.resolve(info.get("Length"))
+        if not isinstance(length, int) or self._data[start + length:start + length + 30].find(b"endstream") < 0:
+            # A wrong or missing /Length is common; fall back to the endstream marker
+            length = self._data.find(b"endstream", start) - start
+        return info, _decode_stream(info, self._data[start:start + length])
+
+    def get(self, num):
+        """The object ``num``; stream objects come back as (dict, bytes)."""
+        if num in self._cache:
+            return self._cache[num]
+        if num in self._loading:
+            raise PDFError(f"Object {num} refers to itself in {self.path}")
+        self._loading.add(num)
+        try:
+            value = self._read_object(num)
+        finally:
+            self._loading.discard(num)
+        # Streams are decoded on demand and not kept, so memory stays per page
+        if not isinstance(value, tuple):
+            self._cache[num] = value
+        return value
+
+    def _read_object(self, num):
+        offset = self._offsets.get(num)
+        if offset is not None:
+            parser = _Parser(self._data, offset)
+            value = parser.value()
+            parser.skip_whitespace()
+            if isinstance(value, dict) and self._data[parser.pos:parser.pos + 6] == b"stream":
+                value = self._read_stream_at(offset)
+        else:
+            if self._compressed is None:
+                self._load_object_streams()
+            entry = self._compressed.get(num)
+            if entry is None:
+                return None
+            _, data, start = entry
+            value = _Parser(data, start).value()
+        return value
+
+    def resolve(self, value):
+        seen = set()
+        while isinstance(value, Ref):
+            if value in seen:
+                raise PDFError(f"Reference loop through object {value} in {self.path}")
+            seen.add(value)
+            value = self.get(value)
+        return value
+
+    # Pages
+
+    def _root(self):
+        tail = self._data[max(0, len(self._data) - 65536):]
+        matches = list(_ROOT.finditer(tail)) or list(_ROOT.finditer(self._data))
+        if not matches:
+            raise PDFError(f"No document catalog in {self.path}")
+        return self.resolve(Ref(int(matches[-1].group(1))))
+
+    def pages(self):
+        """Page dictionaries in reading order, with inherited resources."""
+        if self._pages is None:
+            self._pages = []
+            catalog = self._root()
+            if not isinstance(catalog, dict):
+                raise PDFError(f"No document catalog in {self.path}")
+            stack = [(self.resolve(catalog.get("Pages")), None, 0)]
+            seen = set()
+            while stack:
+                node, resources, depth = stack.pop()
+                if not isinstance(node, dict) or id(node) in seen:
+                    continue
+                if depth > MAX_PAGE_TREE_DEPTH:
+                    raise PDFError(f"Page tree deeper than {MAX_PAGE_TREE_DEPTH} levels in {self.path}")
+                seen.add(id(node))
+                resources = node.get("Resources", resources)
+                if node.get("Type") == "Pages" or "Kids" in node:
+                    kids = self.resolve(node.get("Kids", []))
+                    for kid in reversed(kids if isinstance(kids, list) else []):
+                        stack.append((self.resolve(kid), resources, depth + 1))
+                else:
+                    self._pages.append((node, resources))
+        return self._pages
+
+    def page_count(self):
+        return len(self.pages())
+
+    def page_size(self, index):
+        page, _ = self.pages()[index]
+        box = self.resolve(page.get("MediaBox")) or [0, 0, 612, 792]
+        return float(box[2]) - float(box[0]), float(box[3]) - float(box[1])
+
+    def page_text(self, index):
+        """Extract the text layer of page ``index`` (0-based)."""
+        page, resources = self.pages()[index]
+        contents = self.resolve(page.get("Contents"))
+        if contents is None:
+            return ""
+        streams = contents if isinstance(contents, list) else [contents]
+        data = b"\n".join(
+            stream[1] for stream in (self.resolve(item) if isinstance(item, Ref) else item for item in streams)
+            if isinstance(stream, tuple) and stream[1] is not None
+        )
+        return _extract_text(data, self._fonts(self.resolve(resources) or {}))
+
+    def _fonts(self, resources):
+        fonts = {}
+        for name, ref in (self.resolve(resources.get("Font")) or {}).items():
+            font = self.resolve(ref) or {}
+            cmap = font.get("ToUnicode")
+            stream = self.resolve(cmap) if cmap is not None else None
+            if isinstance(stream, tuple) and stream[1]:
+                fonts[name] = _parse_cmap(stream[1])
+            elif font.get("Subtype") == "Type0":
+                # Two-byte glyph ids with no Unicode mapping; emit nothing rather than noise
+                fonts[name] = (2, {})
+            else:
+                fonts[name] = None
+        return fonts
+
+
+def _parse_cmap(data):
+    """Parse a ToUnicode CMap into (code width, {code: text})."""
+    mapping = {}
+    width = 1
+    parser = _Parser(data)
+    operands = []
+    while True:
+        try:
+            token = parser.value()
+        except PDFError:
+            break
+        if isinstance(token, Operator):
+            if token == b"begincodespacerange":
+                low = parser.value()
+                parser.value()
+                width = max(len(low), 1) if isinstance(low, bytes) else width
+            elif token == b"beginbfchar":
+                while True:
+                    src = parser.value()
+                    if isinstance(src, Operator):
+                        break
+                    dst = parser.value()
+                    mapping[int.from_bytes(src, "big")] = dst.decode("utf-16-be", "replace")
+            elif token == b"beginbfrange":
+                while True:
+                    lo = parser.value()
+                    if isinstance(lo, Operator):
+                        break
+                    hi, dst = parser.value(), parser.value()
+                    lo, hi = int.from_bytes(lo, "big"), int.from_bytes(hi, "big")
+                    if isinstance(dst, list):
+                        for code, text in zip(range(lo, hi + 1), dst):
+                            mapping[code] = text.decode("utf-16-be", "replace")
+                    else:
+                        base = int.from_bytes(dst, "big")
+                        for code in range(lo, hi + 1):
+                            mapping[code] = (base + code - lo).to_bytes(len(dst), "big").decode("utf-16-be", "replace")
+            operands = []
+        else:
+            operands.append(token)
+    return width, mapping
+
+
+def _decode_text(raw, cmap):
+    if cmap is None:
+        return raw.decode("cp1252", "replace")
+    width, mapping = cmap
+    return "".join(
+        mapping.get(int.from_bytes(raw[i:i + width], "big"), "")
+        for i in range(0, len(raw) - width + 1, width)
+    )
+
+
+def _extract_text(data, fonts):
+    """Text of a content stream.
+
+    Plans are mostly vector drawing operators, so only the BT ... ET text
+    objects are tokenized. The gaps between them are searched for the
+    font selections that can appear outside text objects.
+    """
+    font = None
+    lines = [[]]
+    last_matrix = None
+    pos = 0
+    while True:
+        block = _TEXT_OBJECT.search(data, pos)
+        if block is None:
+            break
+        for match in _FONT_SELECT.finditer(data, pos, block.start()):
+            font = fonts.get(_decode_name(match.group(1)))
+        parser = _Parser(data, block.end())
+        operands = []
+        while True:
+            try:
+                token = parser.value()
+            except PDFError:
+                break
+            if not isinstance(token, Operator):
+                operands.append(token)
+                continue
+            if token == b"ET":
+                break
+            if token == b"Tf" and len(operands) >= 2:
+                font = fonts.get(operands[-2])
+            elif token in (b"Td", b"TD") and len(operands) >= 2 and operands[-1]:
+                lines.append([])
+            elif token == b"Tm" and len(operands) >= 6:
+                if last_matrix is not None and operands[-1] != last_matrix:
+                    lines.append([])
+                last_matrix = operands[-1]
+            elif token == b"T*":
+                lines.append([])
+            elif token in (b"Tj", b"'", b'"') and operands and isinstance(operands[-1], bytes):
+                if token != b"Tj":
+                    lines.append([])
+                lines[-1].append(_decode_text(operands[-1], font))
+            elif token == b"TJ" and operands and isinstance(operands[-1], list):
+                for item in operands[-1]:
+                    if isinstance(item, bytes):
+                        lines[-1].append(_decode_text(item, font))
+                    elif isinstance(item, (int, float)) and item < -200:
+                        # Large negative kerning is a word gap
+                        lines[-1].append(" ")
+            operands = []
+        lines.append([])
+        pos = parser.pos
+    text = "\n".join("".join(parts).strip() for parts in lines)
+    return re.sub(r"\n{2,}", "\n", text).strip()
@@ -0,0 +1,453 @@
+"""Semantic retrieval of passages from the document corpus.
+
+Documents are cut into passages of about ``CHUNK_CHARS`` characters at
+paragraph and sentence ends, and each passage is embedded together with
+its document title. The embedder is pluggable: ``HashingEmbedder`` is a
+deterministic, dependency-free feature-hashing model for tests and
+offline use, and ``SentenceTransformerEmbedder`` wraps a local
+sentence-transformers model when that package is installed.
+
+Like the full-text index, the embedding index has a base segment and a
+delta. The base segment is a float32 matrix of unit vectors saved as
+``.npy`` and memory-mapped on open, with one row per passage. Saved edits
+are embedded into a small in-memory delta, logged to an append-only
+journal, and merged into a new base by ``compact()``.
+
+Search is a vectorized dot product over the matrix in blocks, with
+``argpartition`` for the top k. Once the base holds ``IVF_MIN_CHUNKS``
+passages it is also partitioned into about sqrt(n) clusters by
+spherical k-means (an IVF index), and queries scan only the rows of the
+``nprobe`` clusters nearest to the query.
+"""
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import zlib
+
+import numpy as np
+
+from civildoc.store import DATA_DIR
+
+DEFAULT_EMBEDDING_DIR = os.path.join(DATA_DIR, "embeddings")
+
+# Target passage length in characters
+CHUNK_CHARS = 800
+
+# Passages embedded per model call
+EMBED_BATCH = 256
+
+# Base segments at least this large get an IVF partition
+IVF_MIN_CHUNKS = 50_000
+IVF_TRAIN_ITERATIONS = 8
+IVF_SAMPLE_PER_LIST = 64
+
+# Clusters scanned per query when IVF is available
+DEFAULT_NPROBE = 24
+
+# Rows scored per matrix product in exhaustive scans
+SCAN_BLOCK = 65_536
+
+# Journal entries after which the delta is merged into a new base segment
+COMPACT_AFTER = 500
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_PARAGRAPH = re.compile(r"\S(?:.*?\S)?(?=\n\s*\n|\s*\Z)", re.DOTALL)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def document_text(doc):
+    """The text passages are cut from: title, preview and body."""
+    return "\n\n".join(part for part in (doc.get("title"), doc.get("preview"), doc.get("body")) if part)
+
+
+def chunk_spans(text, chunk_chars=CHUNK_CHARS):
+    """``(start, end)`` passages of ``text``, cut at paragraph or sentence ends."""
+    units = []
+    for paragraph in _PARAGRAPH.finditer(text):
+        start, end = paragraph.span()
+        if end - start <= chunk_chars:
+            units.append((start, end))
+            continue
+        sentence_start = start
+        for match in _SENTENCE_END.finditer(text, start, end):
+            units.append((sentence_start, match.start()))
+            sentence_start = match.end()
+        units.append((sentence_start, end))
+
+    spans = []
+    for start, end in units:
+        # Runs of text with no sentence end are cut at a fixed length
+        while end - start > chunk_chars:
+            spans.append((start, start + chunk_chars))
+            start += chunk_chars
+        # Short paragraphs and sentences are joined up to the target length
+        if spans and end - spans[-1][0] <= chunk_chars:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((start, end))
+    return spans
+
+
+class HashingEmbedder:
+    """Deterministic embeddings from hashed word unigrams and bigrams."""
+
+    def __init__(self, dim=256):
+        self.dim = dim
+        self.version = f"hashing-{dim}"
+
+    def embed(self, texts):
+        rows, columns, signs = [], [], []
+        for row, text in enumerate(texts):
+            words = _WORD.findall(text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            for feature in features:
+                h = zlib.crc32(feature.encode("utf-8"))
+                rows.append(row)
+                columns.append(h % self.dim)
+                signs.append(1.0 if h & 0x80000000 else -1.0)
+        flat = np.asarray(rows, dtype=np.int64) * self.dim + np.asarray(columns, dtype=np.int64)
+        vectors = np.bincount(flat, weights=signs, minlength=len(texts) * self.dim)
+        vectors = vectors.reshape(len(texts), self.dim).astype(np.float32)
+        return _normalize(vectors)
+
+
+class SentenceTransformerEmbedder:
+    """A local sentence-transformers model; needs the optional package."""
+
+    def __init__(self, model_name="all-MiniLM-L6-v2", device=None):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device=device)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.version = f"sentence-transformers/{model_name}"
+
+    def embed(self, texts):
+        return np.asarray(
+            self.model.encode(list(texts), batch_size=64, normalize_embeddings=True), dtype=np.float32
+        )
+
+
+def default_embedder():
+    """The model named by ``CIVILDOC_EMBEDDING_MODEL``, else the hashing embedder."""
+    model_name = os.environ.get("CIVILDOC_EMBEDDING_MODEL")
+    return SentenceTransformerEmbedder(model_name) if model_name else HashingEmbedder()
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def embed_documents(embedder, documents, batch_size=EMBED_BATCH):
+    """Chunk ``documents`` and embed their passages in batches.
+
+    Returns ``(vectors, doc_ids, spans)`` with one entry per passage.
+    """
+    doc_ids, spans, texts = [], [], []
+    for doc in documents:
+        text = document_text(doc)
+        for start, end in chunk_spans(text):
+            doc_ids.append(doc["id"])
+            spans.append((start, end))
+            texts.append(f"{doc.get('title', '')}\n\n{text[start:end]}")
+    vectors = np.zeros((len(texts), embedder.dim), dtype=np.float32)
+    for i in range(0, len(texts), batch_size):
+        vectors[i:i + batch_size] = embedder.embed(texts[i:i + batch_size])
+    return vectors, doc_ids, spans
+
+
+def train_ivf(vectors, nlist, iterations=IVF_TRAIN_ITERATIONS, seed=0):
+    """Spherical k-means on a sample of ``vectors``; returns ``(centroids, list_offsets, list_rows)``."""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample_size = min(n, nlist * IVF_SAMPLE_PER_LIST)
+    sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))])
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=nlist)
+        empty = counts == 0
+        sums = np.zeros_like(centroids)
+        sums[~empty] = np.add.reduceat(sample[order], (np.cumsum(counts) - counts)[~empty])
+        # Reseed empty clusters from random sample points
+        sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+
+    assignment = np.empty(n, dtype=np.int32)
+    for i in range(0, n, SCAN_BLOCK):
+        assignment[i:i + SCAN_BLOCK] = np.argmax(np.asarray(vectors[i:i + SCAN_BLOCK]) @ centroids.T, axis=1)
+    list_rows = np.argsort(assignment, kind="stable").astype(np.int32)
+    list_offsets = np.searchsorted(assignment[list_rows], np.arange(nlist + 1)).astype(np.int64)
+    return centroids, list_offsets, list_rows
+
+
+def _top_k(scores, rows, k):
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k)[:k]
+        scores, rows = scores[keep], rows[keep]
+    order = np.argsort(-scores, kind="stable")
+    return scores[order], rows[order]
+
+
+class _VectorSegment:
+    """Immutable base segment: passage vectors, their spans and an optional IVF partition."""
+
+    ARRAYS = ("vectors", "doc_index", "starts", "ends")
+    IVF_ARRAYS = ("centroids", "list_offsets", "list_rows")
+
+    def __init__(self, vectors, doc_index, starts, ends, doc_ids, version, ivf=None):
+        self.vectors = vectors
+        self.doc_index = doc_index
+        self.starts = starts
+        self.ends = ends
+        self.doc_ids = doc_ids
+        self.version = version
+        self.centroids, self.list_offsets, self.list_rows = ivf or (None, None, None)
+        self._ordinals = None
+
+    @classmethod
+    def build(cls, vectors, passage_doc_ids, spans, version, ivf_min_chunks=IVF_MIN_CHUNKS):
+        doc_ids = list(dict.fromkeys(passage_doc_ids))
+        ordinals = {doc_id: i for i, doc_id in enumerate(doc_ids)}
+        doc_index = np.fromiter((ordinals[d] for d in passage_doc_ids), dtype=np.int32, count=len(passage_doc_ids))
+        spans = np.asarray(spans, dtype=np.int32).reshape(-1, 2)
+        ivf = None
+        if len(vectors) >= ivf_min_chunks:
+            ivf = train_ivf(vectors, nlist=int(math.sqrt(len(vectors))))
+        return cls(np.asarray(vectors, dtype=np.float32), doc_index, spans[:, 0].copy(), spans[:, 1].copy(),
+                   doc_ids, version, ivf)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in cls.ARRAYS}
+        ivf = None
+        if meta["ivf"]:
+            ivf = tuple(np.load(os.path.join(path, f"{name}.npy")) for name in cls.IVF_ARRAYS)
+        return cls(arrays["vectors"], arrays["doc_index"], arrays["starts"], arrays["ends"], meta["doc_ids"],
+                   meta["version"], ivf)
+
+    def save(self, path):
+        # Write to a sibling directory and swap it in, so a crash never leaves half an index
+        tmp_path = path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "doc_ids": self.doc_ids, "ivf": self.centroids is not None}, f)
+        for name in self.ARRAYS + (self.IVF_ARRAYS if self.centroids is not None else ()):
+            np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(self, name))
+        old_path = path + ".old"
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    def ordinal(self, doc_id):
+        if self._ordinals is None:
+            self._ordinals = {doc_id: i for i, doc_id in enumerate(self.doc_ids)}
+        return self._ordinals.get(doc_id)
+
+    def search(self, query, k, dead_rows=None, nprobe=DEFAULT_NPROBE):
+        """Best ``k`` ``(scores, rows)``; IVF when trained and ``nprobe`` is set, else exhaustive."""
+        if self.centroids is not None and nprobe:
+            nprobe = min(nprobe, len(self.centroids))
+            probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+            rows = np.sort(np.concatenate([self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]]
+                                           for c in probe]))
+            scores = np.asarray(self.vectors[rows]) @ query
+            if dead_rows is not None:
+                scores[dead_rows[rows]] = -np.inf
+            return _top_k(scores, rows, k)
+
+        best_scores, best_rows = [], []
+        for i in range(0, len(self.vectors), SCAN_BLOCK):
+            scores = np.asarray(self.vectors[i:i + SCAN_BLOCK]) @ query
+            if dead_rows is not None:
+                scores[dead_rows[i:i + SCAN_BLOCK]] = -np.inf
+            scores, rows = _top_k(scores, np.arange(i, i + len(scores)), k)
+            best_scores.append(scores)
+            best_rows.append(rows)
+        if not best_scores:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        return _top_k(np.concatenate(best_scores), np.concatenate(best_rows), k)
+
+
+class EmbeddingIndex:
+    """Passage embeddings with top-k search and incremental updates."""
+
+    def __init__(self, embedder=None, path=DEFAULT_EMBEDDING_DIR, base=None):
+        self.embedder = embedder or HashingEmbedder()
+        self.path = path
+        self._lock = threading.Lock()
+        self._base = base or _VectorSegment.build(
+            np.zeros((0, self.embedder.dim), dtype=np.float32), [], [], self.embedder.version
+        )
+        self._reset_delta()
+
+    @classmethod
+    def open(cls, store, embedder=None, path=DEFAULT_EMBEDDING_DIR):
+        """Load the persisted index, building it from ``store`` if none exists or the model changed."""
+        embedder = embedder or default_embedder()
+        base_path = os.path.join(path, "base")
+        if os.path.exists(base_path):
+            base = _VectorSegment.load(base_path)
+            if base.version == embedder.version:
+                index = cls(embedder, path, base)
+                index._replay_journal()
+                if index._journal_entries >= COMPACT_AFTER:
+                    index.compact()
+                return index
+        index = cls(embedder, path)
+        index.rebuild(store)
+        return index
+
+    @classmethod
+    def from_vectors(cls, vectors, passage_doc_ids, spans, embedder=None, path=DEFAULT_EMBEDDING_DIR):
+        """Build and persist a base segment from precomputed passage vectors."""
+        embedder = embedder or HashingEmbedder(dim=vectors.shape[1])
+        _VectorSegment.build(vectors, passage_doc_ids, spans, embedder.version).save(os.path.join(path, "base"))
+        return cls(embedder, path, _VectorSegment.load(os.path.join(path, "base")))
+
+    def _reset_delta(self):
+        # doc_id -> (vectors, spans) of documents embedded since the base was built
+        self._delta = {}
+        self._delta_matrix = None
+        self._tombstones = np.zeros(len(self._base.doc_ids), dtype=bool)
+        self._dead_rows = None
+        self._journal_entries = 0
+
+    @property
+    def _journal_path(self):
+        return os.path.join(self.path, "journal.jsonl")
+
+    def _replay_journal(self):
+        if not os.path.exists(self._journal_path):
+            return
+        with open(self._journal_path, encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        # Only the last entry per document matters, and live ones are embedded together
+        latest = {entry["id"]: entry for entry in entries}
+        live = [entry for entry in latest.values() if not entry.get("deleted")]
+        vectors, doc_ids, spans = embed_documents(self.embedder, live)
+        for doc_id in latest:
+            self._apply(doc_id)
+        self._add_delta(vectors, doc_ids, spans)
+        self._journal_entries = len(entries)
+
+    def _apply(self, doc_id):
+        ordinal = self._base.ordinal(doc_id)
+        if ordinal is not None and not self._tombstones[ordinal]:
+            self._tombstones[ordinal] = True
+            self._dead_rows = None
+        if self._delta.pop(doc_id, None) is not None:
+            self._delta_matrix = None
+
+    def _add_delta(self, vectors, doc_ids, spans):
+        start = 0
+        for doc_id in dict.fromkeys(doc_ids):
+            end = start
+            while end < len(doc_ids) and doc_ids[end] == doc_id:
+                end += 1
+            self._delta[doc_id] = (vectors[start:end], spans[start:end])
+            start = end
+        self._delta_matrix = None
+
+    def _log(self, entry):
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        self._journal_entries += 1
+
+    def update_document(self, doc):
+        """Re-embed one saved or ingested document without touching the rest of the corpus."""
+        entry = {field: doc.get(field) for field in ("id", "title", "preview", "body")}
+        vectors, doc_ids, spans = embed_documents(self.embedder, [entry])
+        with self._lock:
+            self._apply(doc["id"])
+            self._add_delta(vectors, doc_ids, spans)
+            self._log(entry)
+
+    def remove_document(self, doc_id):
+        with self._lock:
+            self._apply(doc_id)
+            self._log({"id": doc_id, "deleted": True})
+
+    def rebuild(self, store):
+        """Embed every document in ``store`` into a new base segment."""
+        vectors, doc_ids, spans = embed_documents(self.embedder, store.iter_documents())
+        self._swap_base(_VectorSegment.build(vectors, doc_ids, spans, self.embedder.version))
+
+    def compact(self):
+        """Merge the live base rows and the delta into a new base segment, without re-embedding."""
+        with self._lock:
+            base, delta = self._base, dict(self._delta)
+            alive = ~self._tombstones[base.doc_index]
+        vectors = np.concatenate([np.asarray(base.vectors)[alive]] + [v for v, _ in delta.values()])
+        doc_ids = [base.doc_ids[i] for i in base.doc_index[alive]]
+        spans = list(zip(base.starts[alive].tolist(), base.ends[alive].tolist()))
+        for doc_id, (doc_vectors, doc_spans) in delta.items():
+            doc_ids += [doc_id] * len(doc_vectors)
+            spans += doc_spans
+        self._swap_base(_VectorSegment.build(vectors, doc_ids, spans, self.embedder.version))
+
+    def _swap_base(self, base):
+        base.save(os.path.join(self.path, "base"))
+        with self._lock:
+            self._base = _VectorSegment.load(os.path.join(self.path, "base"))
+            self._reset_delta()
+            if os.path.exists(self._journal_path):
+                os.remove(self._journal_path)
+
+    def __len__(self):
+        with self._lock:
+            dead = int(self._tombstones[self._base.doc_index].sum())
+            return len(self._base.doc_index) - dead + sum(len(v) for v, _ in self._delta.values())
+
+    def search_vector(self, query, k=10, nprobe=DEFAULT_NPROBE):
+        """Best ``k`` passages for a unit query vector: ``[{"doc_id", "start", "end", "score"}]``."""
+        with self._lock:
+            base = self._base
+            if self._dead_rows is None and self._tombstones.any():
+                self._dead_rows = self._tombstones[base.doc_index]
+            dead_rows = self._dead_rows
+            if self._delta_matrix is None:
+                self._delta_matrix = (
+                    np.concatenate([v for v, _ in self._delta.values()]) if self._delta
+                    else np.zeros((0, base.vectors.shape[1]), dtype=np.float32),
+                    [(doc_id, span) for doc_id, (_, spans) in self._delta.items() for span in spans]
+                )
+            delta_vectors, delta_passages = self._delta_matrix
+
+        query = np.asarray(query, dtype=np.float32)
+        base_scores, base_rows = base.search(query, k, dead_rows, nprobe)
+        hits = [
+            (float(score), base.doc_ids[base.doc_index[row]], int(base.starts[row]), int(base.ends[row]))
+            for score, row in zip(base_scores, base_rows) if score > -np.inf
+        ]
+        if len(delta_vectors):
+            delta_scores, delta_rows = _top_k(delta_vectors @ query, np.arange(len(delta_vectors)), k)
+            for score, row in zip(delta_scores, delta_rows):
+                doc_id, (start, end) = delta_passages[row]
+                hits.append((float(score), doc_id, start, end))
+        hits.sort(key=lambda hit: -hit[0])
+        return [{"doc_id": doc_id, "start": start, "end": end, "score": score}
+                for score, doc_id, start, end in hits[:k]]
+
+    def search(self, text, k=10, nprobe=DEFAULT_NPROBE):
+        return self.search_vector(self.embedder.embed([text])[0], k, nprobe)
+
+    def passages(self, text, get_document, k=5):
+        """Best ``k`` passages for ``text`` with their document title and passage text."""
+        results = []
+        for hit in self.search(text, k):
+            doc = get_document(hit["doc_id"])
+            if doc is None:
+                continue
+            passage = document_text(doc)[hit["start"]:hit["end"]]
+            results.append(dict(hit, title=doc["title"], text=passage))
+        return results
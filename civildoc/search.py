@@ -0,0 +1,332 @@
+"""Full-text search over document titles, previews and bodies.
+
+The index is a classic inverted index. Each term maps to a posting list
+of document ordinals and field-weighted term frequencies, and queries
+are ranked with BM25. Every query token also matches as a prefix, so
+engineering identifiers can be typed partially: "A4" finds the A42
+highway and "b2" the B24 bridge.
+
+The base segment is stored as flat NumPy arrays (CSR layout) that are
+memory-mapped on startup, so opening the index never re-tokenizes the
+corpus. Saved edits go into a small in-memory delta segment, with its
+own postings per term, and an append-only journal on disk. The delta is replayed on open. Once the
+journal grows long, ``compact()`` folds it back into a new base built
+from the store, on a background thread when an edit triggers it, so
+saves and searches carry on meanwhile.
+"""
+import bisect
+import json
+import math
+import os
+import re
+import shutil
+import threading
+from collections import Counter
+
+import numpy as np
+
+from civildoc.store import DATA_DIR
+
+DEFAULT_INDEX_DIR = os.path.join(DATA_DIR, "search")
+
+# Field weights fold title/preview/body into one BM25F-style term frequency
+FIELD_WEIGHTS = {"title": 10.0, "preview": 4.0, "body": 1.0}
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# A short prefix such as "e" may match thousands of terms; keep the most common
+MAX_PREFIX_EXPANSIONS = 256
+
+# Journal entries after which the delta is merged into a new base segment
+COMPACT_AFTER = 1000
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+def document_terms(doc):
+    """Return ``(weighted term frequencies, weighted length)`` for a document."""
+    tf = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(doc.get(field)):
+            tf[token] += weight
+    return tf, sum(tf.values())
+
+
+class _Segment:
+    """Immutable base segment: sorted terms with CSR posting lists."""
+
+    def __init__(self, terms, offsets, postings, freqs, lengths, doc_ids):
+        self.terms = terms
+        self.offsets = offsets
+        self.postings = postings
+        self.freqs = freqs
+        self.lengths = lengths
+        self.doc_ids = doc_ids
+        self._ordinals = None
+
+    @classmethod
+    def build(cls, documents):
+        doc_ids = []
+        lengths = []
+        term_postings = {}
+        for ordinal, doc in enumerate(documents):
+            tf, length = document_terms(doc)
+            doc_ids.append(doc["id"])
+            lengths.append(length)
+            for term, freq in tf.items():
+                postings = term_postings.get(term)
+                if postings is None:
+                    term_postings[term] = postings = ([], [])
+                postings[0].append(ordinal)
+                postings[1].append(freq)
+
+        terms = sorted(term_postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(term_postings[term][0])
+        postings = np.empty(offsets[-1], dtype=np.int32)
+        freqs = np.empty(offsets[-1], dtype=np.float32)
+        for i, term in enumerate(terms):
+            ordinals, term_freqs = term_postings.pop(term)
+            postings[offsets[i]:offsets[i + 1]] = ordinals
+            freqs[offsets[i]:offsets[i + 1]] = term_freqs
+        return cls(terms, offsets, postings, freqs, np.asarray(lengths, dtype=np.float32), doc_ids)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "terms.json"), encoding="utf-8") as f:
+            terms = json.load(f)
+        with open(os.path.join(path, "doc_ids.json"), encoding="utf-8") as f:
+            doc_ids = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in ("offsets", "postings", "freqs", "lengths")
+        }
+        return cls(terms, arrays["offsets"], arrays["postings"], arrays["freqs"], arrays["lengths"], doc_ids)
+
+    def save(self, path):
+        # Write to a sibling directory and swap it in, so a crash never leaves half an index
+        tmp_path = path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        with open(os.path.join(tmp_path, "terms.json"), "w", encoding="utf-8") as f:
+            json.dump(self.terms, f)
+        with open(os.path.join(tmp_path, "doc_ids.json"), "w", encoding="utf-8") as f:
+            json.dump(self.doc_ids, f)
+        for name in ("offsets", "postings", "freqs", "lengths"):
+            np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(self, name))
+        old_path = path + ".old"
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    def ordinal(self, doc_id):
+        if self._ordinals is None:
+            self._ordinals = {doc_id: i for i, doc_id in enumerate(self.doc_ids)}
+        return self._ordinals.get(doc_id)
+
+    def expand(self, prefix):
+        """Return the term ids that start with ``prefix``, most frequent first if capped."""
+        lo = bisect.bisect_left(self.terms, prefix)
+        hi = bisect.bisect_left(self.terms, prefix + "\U0010ffff")
+        term_ids = np.arange(lo, hi)
+        if len(term_ids) > MAX_PREFIX_EXPANSIONS:
+            doc_freqs = self.offsets[lo + 1:hi + 1] - self.offsets[lo:hi]
+            term_ids = term_ids[np.argsort(-doc_freqs, kind="stable")[:MAX_PREFIX_EXPANSIONS]]
+        return term_ids
+
+
+class SearchIndex:
+    """BM25-ranked inverted index with prefix matching and incremental updates."""
+
+    def __init__(self, path=DEFAULT_INDEX_DIR, base=None, store=None):
+        self.path = path
+        # Source of documents for compactions started by edits; none without it
+        self.store = store
+        self._lock = threading.Lock()
+        self._base = base or _Segment.build([])
+        # Entries logged while a compaction runs, or None when none is running
+        self._compacting = None
+        self._reset_delta()
+
+    @classmethod
+    def open(cls, store, path=DEFAULT_INDEX_DIR):
+        """Load the persisted index, building it from ``store`` only if none exists."""
+        base_path = os.path.join(path, "base")
+        if not os.path.exists(base_path):
+            index = cls(path, store=store)
+            index.compact(store)
+            return index
+        index = cls(path, _Segment.load(base_path), store)
+        index._replay_journal()
+        if index._journal_entries >= COMPACT_AFTER:
+            index.compact(store)
+        return index
+
+    def _reset_delta(self):
+        self._delta = {}
+        # term -> {doc_id: weighted frequency} over the delta, and its terms
+        # in sorted order for prefix lookups
+        self._delta_postings = {}
+        self._delta_terms = []
+        self._tombstones = np.zeros(len(self._base.doc_ids), dtype=bool)
+        self._journal_entries = 0
+
+    @property
+    def _journal_path(self):
+        return os.path.join(self.path, "journal.jsonl")
+
+    def _replay_journal(self):
+        if not os.path.exists(self._journal_path):
+            return
+        with open(self._journal_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    self._apply(json.loads(line))
+                    self._journal_entries += 1
+
+    def _apply(self, entry):
+        doc_id = entry["id"]
+        ordinal = self._base.ordinal(doc_id)
+        if ordinal is not None:
+            self._tombstones[ordinal] = True
+        previous = self._delta.pop(doc_id, None)
+        if previous is not None:
+            for term in previous[0]:
+                postings = {other: freq for other, freq in self._delta_postings[term].items() if other != doc_id}
+                if postings:
+                    self._delta_postings[term] = postings
+                else:
+                    del self._delta_postings[term]
+                    del self._delta_terms[bisect.bisect_left(self._delta_terms, term)]
+        if not entry.get("deleted"):
+            tf, length = document_terms(entry)
+            self._delta[doc_id] = (tf, length)
+            for term, freq in tf.items():
+                postings = self._delta_postings.get(term)
+                if postings is None:
+                    bisect.insort(self._delta_terms, term)
+                    postings = {}
+                # Posting dicts are replaced, never changed, so searches can keep using a snapshot
+                self._delta_postings[term] = {**postings, doc_id: freq}
+
+    def _log(self, entry):
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        self._journal_entries += 1
+        if self._compacting is not None:
+            self._compacting.append(entry)
+
+    def update_document(self, doc):
+        """Re-index one saved document without touching the rest of the corpus."""
+        entry = {field: doc.get(field) for field in FIELD_WEIGHTS}
+        entry["id"] = doc["id"]
+        with self._lock:
+            self._apply(entry)
+            self._log(entry)
+        self._compact_if_long()
+
+    def remove_document(self, doc_id):
+        entry = {"id": doc_id, "deleted": True}
+        with self._lock:
+            self._apply(entry)
+            self._log(entry)
+        self._compact_if_long()
+
+    def _compact_if_long(self):
+        """Start a background compaction once the journal reaches COMPACT_AFTER entries."""
+        with self._lock:
+            if self.store is None or self._compacting is not None or self._journal_entries < COMPACT_AFTER:
+                return
+            self._compacting = []
+        threading.Thread(target=self.compact, args=(self.store,), name="search-compact", daemon=True).start()
+
+    def compact(self, store):
+        """Rebuild the base segment from ``store`` and clear the journal.
+
+        Documents are read in batches, so entries logged while the base is
+        built are applied again on top of it and kept in the new journal.
+        """
+        with self._lock:
+            if self._compacting is None:
+                self._compacting = []
+        try:
+            base = _Segment.build(store.iter_documents())
+            base.save(os.path.join(self.path, "base"))
+        except BaseException:
+            with self._lock:
+                self._compacting = None
+            raise
+        with self._lock:
+            later, self._compacting = self._compacting or [], None
+            self._base = _Segment.load(os.path.join(self.path, "base"))
+            self._reset_delta()
+            if os.path.exists(self._journal_path):
+                os.remove(self._journal_path)
+            for entry in later:
+                self._apply(entry)
+                self._log(entry)
+
+    def __len__(self):
+        return int(len(self._base.doc_ids) - self._tombstones.sum()) + len(self._delta)
+
+    def search(self, text, limit=20):
+        """Return ``[(doc_id, score), ...]`` for the best ``limit`` matches."""
+        tokens = list(dict.fromkeys(tokenize(text)))
+        if not tokens:
+            return []
+
+        with self._lock:
+            base = self._base
+            delta = dict(self._delta)
+            delta_postings = dict(self._delta_postings)
+            delta_terms = list(self._delta_terms)
+            tombstones = self._tombstones.copy()
+
+        total_docs = max(len(base.doc_ids) - int(tombstones.sum()) + len(delta), 1)
+        total_length = float(np.sum(base.lengths, dtype=np.float64)) + sum(length for _, length in delta.values())
+        avg_length = max(total_length / total_docs, 1.0)
+
+        def idf(doc_freq):
+            return math.log(1 + (total_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+        base_norm = K1 * (1 - B + B * np.asarray(base.lengths) / avg_length)
+        base_scores = np.zeros(len(base.doc_ids), dtype=np.float32)
+        delta_scores = Counter()
+
+        for token in tokens:
+            for term_id in base.expand(token):
+                start, end = base.offsets[term_id], base.offsets[term_id + 1]
+                ordinals = base.postings[start:end]
+                freqs = base.freqs[start:end]
+                weight = idf(end - start + len(delta_postings.get(base.terms[term_id], ())))
+                base_scores[ordinals] += weight * freqs * (K1 + 1) / (freqs + base_norm[ordinals])
+            lo = bisect.bisect_left(delta_terms, token)
+            hi = bisect.bisect_left(delta_terms, token + "\U0010ffff")
+            for term in delta_terms[lo:hi]:
+                postings = delta_postings[term]
+                term_id = bisect.bisect_left(base.terms, term)
+                base_df = 0
+                if term_id < len(base.terms) and base.terms[term_id] == term:
+                    base_df = int(base.offsets[term_id + 1] - base.offsets[term_id])
+                weight = idf(base_df + len(postings))
+                for doc_id, freq in postings.items():
+                    norm = K1 * (1 - B + B * delta[doc_id][1] / avg_length)
+                    delta_scores[doc_id] += weight * freq * (K1 + 1) / (freq + norm)
+
+        base_scores[tombstones] = 0
+        candidates = np.flatnonzero(base_scores)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-base_scores[candidates], limit)[:limit]]
+        results = [(base.doc_ids[i], float(base_scores[i])) for i in candidates]
+        results += delta_scores.items()
+        results.sort(key=lambda result: -result[1])
+        return results[:limit]
@@ -0,0 +1,171 @@
+"""Static page chrome for the CivilDoc AI app, built once per process.
+
+The CSS, home header, feature cards and footer never change between
+reruns, so they are assembled and minified here at import time instead
+of being formatted again on every run. Streamlit clears any element a
+full rerun does not emit, so the chrome is still sent on full reruns.
+The interactive regions run as fragments, though, and a click inside
+one reruns only that fragment, so the chrome is not sent again.
+"""
+import re
+import textwrap
+
+import streamlit as st
+
+
+def _minify_css(css):
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};:,>])\s*", r"\1", css)
+    return css.replace(";}", "}").strip()
+
+
+APP_CSS = "<style>" + _minify_css("""
+    .main-header {
+        font-size: 3rem;
+        color: #1e40af;
+        text-align: center;
+        margin-bottom: 2rem;
+        font-weight: bold;
+    }
+
+    .sub-header {
+        font-size: 1.2rem;
+        color: #6b7280;
+        text-align: center;
+        margin-bottom: 3rem;
+    }
+
+    .document-card {
+        border: 1px solid #e5e7eb;
+        border-radius: 0.5rem;
+        padding: 1rem;
+        margin: 1rem 0;
+        background-color: #f9fafb;
+        transition: all 0.3s ease;
+    }
+
+    .document-card:hover {
+        box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
+        transform: translateY(-2px);
+    }
+
+    .status-badge {
+        padding: 0.25rem 0.75rem;
+        border-radius: 9999px;
+        font-size: 0.75rem;
+        font-weight: 600;
+        text-transform: uppercase;
+    }
+
+    .status-draft {
+        background-color: #fef3c7;
+        color: #92400e;
+    }
+
+    .status-completed {
+        background-color: #d1fae5;
+        color: #065f46;
+    }
+
+    .status-review {
+        background-color: #dbeafe;
+        color: #1e40af;
+    }
+
+    .task-card {
+        border-left: 4px solid #3b82f6;
+        background-color: #f8fafc;
+        padding: 1rem;
+        margin: 1rem 0;
+        border-radius: 0 0.5rem 0.5rem 0;
+    }
+
+    .complexity-high {
+        border-left-color: #ef4444;
+    }
+
+    .complexity-medium {
+        border-left-color: #f59e0b;
+    }
+
+    .complexity-low {
+        border-left-color: #10b981;
+    }
+
+    .stProgress > div > div > div > div {
+        background-color: #3b82f6;
+    }
+""") + "</style>"
+
+HOME_HEADER_HTML = '<h1 class="main-header">🏗️ CivilDoc AI</h1>'
+HOME_SUBHEADER_HTML = '<p class="sub-header">AI-Powered Documentation Assistant for Civil Engineers</p>'
+
+FEATURE_CARDS = tuple(textwrap.dedent(card).strip() for card in (
+    """
+    ### 📄 Smart Document Management
+    - Automated document creation
+    - Version control and collaboration
+    - AI-powered content suggestions
+    - Professional templates
+    """,
+    """
+    ### 🤖 AI Agent Automation
+    - Automated report generation
+    - Data extraction from plans
+    - Compliance checking
+    - Real-time progress tracking
+    """,
+    """
+    ### 📊 Data Analysis
+    - Intelligent data processing
+    - Visualization and charts
+    - Technical specifications
+    - Quality control metrics
+    """
+))
+
+# Shown under a document's preview until it has a saved body
+DOCUMENT_DETAILS_MD = textwrap.dedent("""
+    #### Document Details
+
+    This section contains the detailed document content. In a real application, this would display the complete engineering document content, including:
+
+    1. **Project Overview**
+    2. **Technical Specifications**
+    3. **Design Drawings**
+    4. **Materials List**
+    5. **Construction Plan**
+    6. **Quality Control Standards**
+    7. **Safety Requirements**
+    8. **Environmental Impact Assessment**
+
+    Users can directly edit document content here, with AI assistant providing real-time suggestions and formatting help.
+""").strip()
+
+FOOTER_HTML = (
+    '<div style="text-align:center;color:#9ca3af;font-size:0.875rem;">'
+    "© 2023 CivilDoc AI - AI-Powered Documentation Assistant for Civil Engineers | Streamlit Demo"
+    "</div>"
+)
+
+# Markdown bodies that make up the chrome, for payload accounting
+STATIC_BODIES = frozenset((APP_CSS, HOME_HEADER_HTML, HOME_SUBHEADER_HTML, DOCUMENT_DETAILS_MD, FOOTER_HTML) + FEATURE_CARDS)
+
+
+def render_css():
+    st.markdown(APP_CSS, unsafe_allow_html=True)
+
+
+def render_home_header():
+    st.markdown(HOME_HEADER_HTML, unsafe_allow_html=True)
+    st.markdown(HOME_SUBHEADER_HTML, unsafe_allow_html=True)
+
+    # Feature highlights
+    for column, card in zip(st.columns(len(FEATURE_CARDS)), FEATURE_CARDS):
+        with column:
+            st.markdown(card)
+
+
+def render_footer():
+    st.markdown("---")
+    st.markdown(FOOTER_HTML, unsafe_allow_html=True)
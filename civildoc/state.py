@@ -0,0 +1,87 @@
+"""Typed per-session view state for the Streamlit app.
+
+Sessions keep only ids and small view flags. Documents and tasks are
+looked up from the shared store and document cache when a page needs
+them, so memory per session stays flat however large the documents are.
+"""
+import hashlib
+import os
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Key of the AppState object in st.session_state
+STATE_KEY = "app_state"
+
+# Prefix of the user ids given to sessions without sign-in; each session
+# is its own user, so anonymous visitors neither share per-user job limits
+# nor see each other's jobs as their own
+ANONYMOUS_USER = "anonymous"
+
+# Comma-separated emails allowed to see admin panels; when unset, nobody is
+ADMIN_USERS = frozenset(email.strip() for email in os.environ.get("CIVILDOC_ADMINS", "").split(",") if email.strip())
+
+
+class AppState:
+    """Everything a session needs to remember between reruns."""
+
+    __slots__ = (
+        "current_page",
+        "selected_document_id",
+        "edit_mode",
+        "document_cursors",
+        "selected_task_id",
+        "task_run_id"
+    )
+
+    def __init__(self):
+        self.current_page = "home"
+        self.selected_document_id = None
+        self.edit_mode = False
+        # document_cursors[i] is the cursor that starts page i of the document list
+        self.document_cursors = [None]
+        self.selected_task_id = None
+        self.task_run_id = None
+
+    def go_to(self, page):
+        self.current_page = page
+
+    def select_document(self, doc_id, edit_mode=False):
+        self.selected_document_id = doc_id
+        self.edit_mode = edit_mode
+
+    def clear_task(self):
+        self.selected_task_id = None
+        self.task_run_id = None
+
+
+def get_app_state():
+    """Return this session's AppState, creating it on the first run."""
+    if STATE_KEY not in st.session_state:
+        st.session_state[STATE_KEY] = AppState()
+    return st.session_state[STATE_KEY]
+
+
+def current_user_id():
+    """The signed-in user's email, or an anonymous id for this session without authentication."""
+    # st.user replaced st.experimental_user in Streamlit 1.42
+    user = getattr(st, "user", None)
+    if user is None:
+        user = st.experimental_user
+    email = user.get("email")
+    if email:
+        return email
+    session_id = current_session_id()
+    if session_id is None:
+        return ANONYMOUS_USER
+    # Job lists show user ids to everyone, so the session id itself stays out
+    return f"{ANONYMOUS_USER}-{hashlib.blake2b(session_id.encode(), digest_size=4).hexdigest()}"
+
+
+def current_session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
+
+
+def is_admin():
+    return current_user_id() in ADMIN_USERS
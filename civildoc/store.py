@@ -0,0 +1,331 @@
+"""SQLite-backed store for engineering documents and agent tasks.
+
+Documents and tasks live in a single local database file. Listing pages
+go through indexes on status and date, so a page of results costs the
+same whether the corpus holds ten documents or a hundred thousand.
+"""
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from civildoc.cache import register_cache
+
+# Location of the local database and seed data
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.environ.get("CIVILDOC_DATA_DIR", os.path.join(PROJECT_ROOT, "data"))
+DEFAULT_DB_PATH = os.path.join(DATA_DIR, "civildoc.db")
+SEED_DATA_PATH = os.path.join(PROJECT_ROOT, "public", "mock-data.json")
+
+# Columns returned for list views; bodies are only loaded on lookup
+DOCUMENT_LIST_COLUMNS = "id, title, date, status, preview"
+DOCUMENT_COLUMNS = ("title", "date", "status", "preview", "body")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    date TEXT NOT NULL,
+    status TEXT NOT NULL,
+    preview TEXT NOT NULL DEFAULT '',
+    body TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_documents_date ON documents (date DESC, id);
+CREATE INDEX IF NOT EXISTS idx_documents_status ON documents (status, date DESC, id);
+
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    estimated_time TEXT NOT NULL DEFAULT '',
+    complexity TEXT NOT NULL DEFAULT 'Medium',
+    status TEXT NOT NULL DEFAULT 'Available'
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status);
+
+CREATE TABLE IF NOT EXISTS document_pages (
+    doc_id TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    text TEXT NOT NULL DEFAULT '',
+    measurements TEXT NOT NULL DEFAULT '[]',
+    width REAL,
+    height REAL,
+    needs_ocr INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (doc_id, page)
+);
+"""
+
+
+def _task_from_row(row):
+    # Keep the camelCase keys used by mock-data.json and the page code
+    return {
+        "id": row["id"],
+        "title": row["title"],
+        "description": row["description"],
+        "estimatedTime": row["estimated_time"],
+        "complexity": row["complexity"],
+        "status": row["status"]
+    }
+
+
+class DocumentStore:
+    """Documents and tasks persisted in a local SQLite file.
+
+    Connections are opened per thread, since Streamlit serves each session
+    from its own script thread.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # Documents
+
+    def list_documents(self, limit=20, offset=0, status=None):
+        """Return one page of documents, newest first, without bodies."""
+        query = f"SELECT {DOCUMENT_LIST_COLUMNS} FROM documents"
+        params = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY date DESC, id LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        return [dict(row) for row in self._conn().execute(query, params)]
+
+    def page_documents(self, limit=20, cursor=None, status=None):
+        """Return ``(documents, next_cursor)`` for the page starting at ``cursor``.
+
+        Keyset pagination on (date DESC, id) keeps every page an index seek,
+        however deep into the list it is. ``next_cursor`` is None on the
+        last page.
+        """
+        query = f"SELECT {DOCUMENT_LIST_COLUMNS} FROM documents"
+        clauses = []
+        params = []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if cursor:
+            date, doc_id = cursor
+            clauses.append("(date < ? OR (date = ? AND id > ?))")
+            params += [date, date, doc_id]
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY date DESC, id LIMIT ?"
+        params.append(limit + 1)
+        documents = [dict(row) for row in self._conn().execute(query, params)]
+        next_cursor = None
+        if len(documents) > limit:
+            documents = documents[:limit]
+            next_cursor = (documents[-1]["date"], documents[-1]["id"])
+        return documents, next_cursor
+
+    def count_documents(self, status=None):
+        if status:
+            row = self._conn().execute("SELECT COUNT(*) FROM documents WHERE status = ?", (status,)).fetchone()
+        else:
+            row = self._conn().execute("SELECT COUNT(*) FROM documents").fetchone()
+        return row[0]
+
+    def get_document(self, doc_id):
+        row = self._conn().execute("SELECT * FROM documents WHERE id = ?", (doc_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_documents(self, doc_ids):
+        """Return list views of ``doc_ids`` in the given order, skipping unknown ids."""
+        if not doc_ids:
+            return []
+        placeholders = ", ".join("?" * len(doc_ids))
+        rows = self._conn().execute(
+            f"SELECT {DOCUMENT_LIST_COLUMNS} FROM documents WHERE id IN ({placeholders})", list(doc_ids)
+        )
+        by_id = {row["id"]: dict(row) for row in rows}
+        return [by_id[doc_id] for doc_id in doc_ids if doc_id in by_id]
+
+    def iter_documents(self, batch_size=1000):
+        """Yield every document including its body, reading in batches."""
+        cursor = self._conn().execute("SELECT * FROM documents ORDER BY rowid")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield dict(row)
+
+    def upsert_documents(self, documents):
+        """Insert or replace documents in a single transaction."""
+        rows = (
+            (doc["id"], doc["title"], doc["date"], doc["status"], doc.get("preview", ""), doc.get("body"))
+            for doc in documents
+        )
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT INTO documents (id, title, date, status, preview, body) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET title = excluded.title, date = excluded.date, "
+                "status = excluded.status, preview = excluded.preview, body = excluded.body",
+                rows
+            )
+
+    def update_document(self, doc_id, **fields):
+        """Update selected columns of one document, e.g. its body after an edit."""
+        columns = [column for column in fields if column in DOCUMENT_COLUMNS]
+        if not columns:
+            return
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        with self._conn() as conn:
+            conn.execute(
+                f"UPDATE documents SET {assignments} WHERE id = ?",
+                [fields[column] for column in columns] + [doc_id]
+            )
+
+    # Pages of ingested documents
+
+    def upsert_pages(self, doc_id, pages):
+        """Store extracted pages of ``doc_id`` in a single transaction."""
+        rows = (
+            (doc_id, page["page"], page["text"], json.dumps(page["measurements"]),
+             page.get("width"), page.get("height"), int(page.get("needs_ocr", False)))
+            for page in pages
+        )
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT INTO document_pages (doc_id, page, text, measurements, width, height, needs_ocr) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (doc_id, page) DO UPDATE SET text = excluded.text, "
+                "measurements = excluded.measurements, width = excluded.width, height = excluded.height, "
+                "needs_ocr = excluded.needs_ocr",
+                rows
+            )
+
+    def delete_pages(self, doc_id):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM document_pages WHERE doc_id = ?", (doc_id,))
+
+    def iter_pages(self, doc_id, batch_size=100):
+        """Yield the pages of ``doc_id`` in order, reading in batches."""
+        cursor = self._conn().execute(
+            "SELECT * FROM document_pages WHERE doc_id = ? ORDER BY page", (doc_id,)
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                page = dict(row)
+                page["measurements"] = json.loads(page["measurements"])
+                yield page
+
+    # Tasks
+
+    def list_tasks(self):
+        rows = self._conn().execute("SELECT * FROM tasks ORDER BY id")
+        return [_task_from_row(row) for row in rows]
+
+    def get_task(self, task_id):
+        row = self._conn().execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return _task_from_row(row) if row else None
+
+    def upsert_tasks(self, tasks):
+        rows = (
+            (task["id"], task["title"], task.get("description", ""), task.get("estimatedTime", ""),
+             task.get("complexity", "Medium"), task.get("status", "Available"))
+            for task in tasks
+        )
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO tasks (id, title, description, estimated_time, complexity, status) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    # Seed data
+
+    def import_json(self, path=SEED_DATA_PATH):
+        """Bulk-load documents and agent tasks from a mock-data.json style file."""
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        self.upsert_documents(payload.get("documents", []))
+        self.upsert_tasks(payload.get("agentTasks", []))
+
+    def is_empty(self):
+        row = self._conn().execute(
+            "SELECT NOT EXISTS (SELECT 1 FROM documents) AND NOT EXISTS (SELECT 1 FROM tasks)"
+        ).fetchone()
+        return bool(row[0])
+
+
+class DocumentCache:
+    """Process-wide LRU of full documents, shared by every session.
+
+    Sessions hold document ids only and resolve bodies through this cache,
+    so each body is kept in memory once rather than once per session.
+    """
+
+    def __init__(self, store, max_documents=256, name="documents"):
+        self.store = store
+        self.max_documents = max_documents
+        self.name = name
+        self._lock = threading.Lock()
+        self._documents = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        register_cache(self)
+
+    def get(self, doc_id):
+        with self._lock:
+            doc = self._documents.get(doc_id)
+            if doc is not None:
+                self._documents.move_to_end(doc_id)
+                self.hits += 1
+                return doc
+            self.misses += 1
+        doc = self.store.get_document(doc_id)
+        if doc is not None:
+            with self._lock:
+                self._documents[doc_id] = doc
+                while len(self._documents) > self.max_documents:
+                    self._documents.popitem(last=False)
+                    self.evictions += 1
+        return doc
+
+    def invalidate(self, doc_id):
+        with self._lock:
+            if self._documents.pop(doc_id, None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "region": self.name,
+                "entries": len(self._documents),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": 0,
+                "invalidations": self.invalidations
+            }
+
+
+def open_store(path=DEFAULT_DB_PATH, seed_path=SEED_DATA_PATH):
+    """Open the document store, seeding it from mock-data.json on first use."""
+    store = DocumentStore(path)
+    if store.is_empty() and seed_path and os.path.exists(seed_path):
+        store.import_json(seed_path)
+    return store
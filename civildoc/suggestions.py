@@ -0,0 +1,303 @@
+"""Debounced, cached writing-assistant suggestions for documents being edited.
+
+Every commit of the edit-mode text area reruns the page, so suggestions
+cannot call the model on each rerun. ``SuggestionService.suggest()``
+only looks things up:
+
+* the text is split into sections at its headings and each section is
+  hashed;
+* suggestions for a known hash come from an in-memory LRU region, then
+  from a disk cache that survives restarts;
+* sections not found are queued for their document and answered later.
+
+A background thread sends a queued section to the model once its text
+has stayed the same for ``debounce`` seconds, and every queued section
+of a document at the latest ``max_wait`` seconds after its first queued
+change, so a section typed into continuously still gets suggestions.
+Sections superseded by a newer edit in the meantime are dropped without
+a model call. Due sections from every document of the same tenant (the
+user editing it) are sent together, up to ``max_batch`` per call.
+
+When a model call fails, its sections are not queued again until a
+backoff has passed, doubling from ``retry_backoff`` with each failure
+in a row up to ``max_backoff``, so a backend that is down is not called
+once per poll of every open editor.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from civildoc.cache import DiskCache, get_region
+from civildoc.compliance import split_sections
+from civildoc.generation import StubSuggestionModel
+from civildoc.store import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SUGGESTIONS_PATH = os.path.join(DATA_DIR, "suggestions.db")
+
+# Time a changed section must stay unchanged before it goes to the model
+DEBOUNCE_SECONDS = 0.75
+
+# Longest a changed section waits while the document keeps changing
+MAX_WAIT_SECONDS = 3.0
+
+# Sections per model call, and model calls in flight at once
+MAX_BATCH_SECTIONS = 16
+MAX_CONCURRENT_CALLS = 4
+
+# Seconds before a section whose model call failed is sent again; doubles
+# with each failure in a row, up to the maximum
+RETRY_BACKOFF_SECONDS = 2.0
+MAX_BACKOFF_SECONDS = 120.0
+
+MEMORY_ENTRIES = 4096
+DISK_ENTRIES = 100_000
+
+# Latency samples kept for percentiles
+LATENCY_SAMPLES = 4096
+
+
+def section_key(heading, text):
+    return hashlib.blake2b(f"{heading}\n{text}".encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class SuggestionService:
+    """Serves per-section suggestions from cache and batches changed sections to the model."""
+
+    def __init__(self, model=None, path=DEFAULT_SUGGESTIONS_PATH, debounce=DEBOUNCE_SECONDS,
+                 max_wait=MAX_WAIT_SECONDS, max_batch=MAX_BATCH_SECTIONS, max_concurrent_calls=MAX_CONCURRENT_CALLS,
+                 memory_entries=MEMORY_ENTRIES, disk_entries=DISK_ENTRIES,
+                 retry_backoff=RETRY_BACKOFF_SECONDS, max_backoff=MAX_BACKOFF_SECONDS):
+        self.model = model or StubSuggestionModel()
+        self.debounce = debounce
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.max_failures = memory_entries
+        self.memory = get_region("suggestions", max_entries=memory_entries)
+        self.disk = DiskCache("suggestions_disk", path, max_entries=disk_entries)
+        self._cond = threading.Condition()
+        # doc_key -> [first queued at, {section key: (queued at, (heading, text))}, tenant]
+        self._pending = {}
+        # section key -> monotonic time its current text was first requested
+        self._requested_at = {}
+        # Section keys being computed by the model right now
+        self._computing = set()
+        # section key -> (failed calls in a row, monotonic time it may be sent again)
+        self._failures = {}
+        self._in_flight = 0
+        self._closed = False
+        self._calls = ThreadPoolExecutor(max_workers=max_concurrent_calls, thread_name_prefix="suggestions-model")
+        self._thread = threading.Thread(target=self._run, name="suggestions", daemon=True)
+        self._thread.start()
+
+        self.requests = 0
+        self.sections = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.debounced = 0
+        self.model_calls = 0
+        self.sections_sent = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.fresh_latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def suggest(self, doc_key, text, tenant=None):
+        """Suggestions for each section of ``text`` that are ready now.
+
+        Sections that have to go to the model are sent for ``tenant``.
+
+        Returns ``{"sections": [{"heading", "suggestions"}], "pending": n,
+        "failed": n, "retry_in": seconds}`` where ``suggestions`` is None for
+        sections still waiting on the model. ``failed`` sections are not
+        waiting: their last model call failed, and they are queued again by
+        the first call after ``retry_in`` seconds.
+        """
+        start = time.monotonic()
+        version = self.model.version
+        sections = []
+        missing = {}
+        hits = []
+        for heading, section_start, section_end in split_sections(text):
+            section_text = text[section_start:section_end]
+            if not section_text.strip():
+                continue
+            key = section_key(heading, section_text)
+            suggestions = self.memory.get(key, version)
+            if suggestions is not None:
+                hits.append("memory")
+            else:
+                suggestions = self.disk.get(key, version)
+                if suggestions is not None:
+                    hits.append("disk")
+                    self.memory.set(key, suggestions, version)
+                else:
+                    missing[key] = (heading, section_text)
+            sections.append({"heading": heading, "suggestions": suggestions})
+
+        now = time.monotonic()
+        with self._cond:
+            retry_at = [self._failures[key][1] for key in missing if key in self._failures]
+            retry_at = [at for at in retry_at if at > now]
+            for key in list(missing):
+                failure = self._failures.get(key)
+                if failure is not None and failure[1] > now:
+                    del missing[key]
+            self.requests += 1
+            self.sections += len(sections)
+            self.memory_hits += hits.count("memory")
+            self.disk_hits += hits.count("disk")
+            self.latencies.extend([now - start] * len(hits))
+            previous = self._pending.pop(doc_key, None)
+            previous_sections = previous[1] if previous is not None else {}
+            # Unchanged sections keep the time they were first queued
+            queued = {
+                key: (previous_sections[key][0] if key in previous_sections else now, section)
+                for key, section in missing.items() if key not in self._computing
+            }
+            # Sections edited again before they were sent are never sent
+            superseded = previous_sections.keys() - queued.keys()
+            self.debounced += len(superseded)
+            for key in superseded:
+                self._requested_at.pop(key, None)
+            if queued:
+                for key in queued:
+                    self._requested_at.setdefault(key, now)
+                self._pending[doc_key] = [previous[0] if previous is not None else now, queued, tenant]
+                self._cond.notify_all()
+        return {"sections": sections, "pending": len(missing), "failed": len(retry_at),
+                "retry_in": min(retry_at) - now if retry_at else 0.0}
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    batch, next_due = self._take_due(time.monotonic())
+                    if batch:
+                        break
+                    self._cond.wait(None if next_due is None else next_due - time.monotonic())
+                if self._closed:
+                    return
+                self._computing.update(batch)
+                self._in_flight += 1
+            try:
+                self._compute(list(batch.items()))
+            finally:
+                with self._cond:
+                    self._computing.difference_update(batch)
+                    self._in_flight -= 1
+                    self._cond.notify_all()
+
+    def _take_due(self, now):
+        """Remove and return due sections with their tenants, and the time the next one falls due."""
+        # Caller holds self._cond
+        batch = {}
+        next_due = None
+        for doc_key in list(self._pending):
+            first, sections, tenant = self._pending[doc_key]
+            flush_all = now >= first + self.max_wait
+            for key, (queued_at, section) in list(sections.items()):
+                due_at = min(queued_at + self.debounce, first + self.max_wait)
+                if flush_all or due_at <= now:
+                    batch[key] = (tenant, section)
+                    del sections[key]
+                elif next_due is None or due_at < next_due:
+                    next_due = due_at
+            if not sections:
+                del self._pending[doc_key]
+        return batch, next_due
+
+    def _compute(self, items):
+        by_tenant = {}
+        for key, (tenant, section) in items:
+            by_tenant.setdefault(tenant, []).append((key, section))
+        calls = [(tenant, sections[i:i + self.max_batch])
+                 for tenant, sections in by_tenant.items() for i in range(0, len(sections), self.max_batch)]
+        list(self._calls.map(self._compute_batch, *zip(*calls)))
+
+    def _compute_batch(self, tenant, batch):
+        version = self.model.version
+        try:
+            results = self.model.suggest_batch([section for _, section in batch], tenant=tenant)
+        except Exception:
+            logger.exception("Suggestion model call failed for %d sections", len(batch))
+            now = time.monotonic()
+            with self._cond:
+                self.errors += 1
+                for key, _ in batch:
+                    self._requested_at.pop(key, None)
+                    failures = self._failures.pop(key, (0, 0.0))[0] + 1
+                    self._failures[key] = (
+                        failures, now + min(self.max_backoff, self.retry_backoff * 2 ** (failures - 1))
+                    )
+                # Oldest failures go first once the table is full
+                while len(self._failures) > self.max_failures:
+                    del self._failures[next(iter(self._failures))]
+            return
+        for (key, _), suggestions in zip(batch, results):
+            self.memory.set(key, suggestions, version)
+        self.disk.set_many([(key, suggestions) for (key, _), suggestions in zip(batch, results)], version)
+        now = time.monotonic()
+        with self._cond:
+            self.model_calls += 1
+            self.sections_sent += len(batch)
+            for key, _ in batch:
+                self._failures.pop(key, None)
+                requested_at = self._requested_at.pop(key, None)
+                if requested_at is not None:
+                    self.latencies.append(now - requested_at)
+                    self.fresh_latencies.append(now - requested_at)
+
+    def wait_idle(self, timeout=None):
+        """Block until nothing is queued or being computed; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stats(self):
+        now = time.monotonic()
+        with self._cond:
+            served = self.memory_hits + self.disk_hits
+            latencies = list(self.latencies)
+            fresh = list(self.fresh_latencies)
+            return {
+                "requests": self.requests,
+                "sections": self.sections,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "hit_rate": served / self.sections if self.sections else 0.0,
+                "debounced": self.debounced,
+                "model_calls": self.model_calls,
+                "sections_sent": self.sections_sent,
+                "errors": self.errors,
+                "backing_off": sum(1 for _, retry_at in self._failures.values() if retry_at > now),
+                "p50_ms": percentile(latencies, 0.50) * 1000,
+                "p95_ms": percentile(latencies, 0.95) * 1000,
+                "fresh_p50_ms": percentile(fresh, 0.50) * 1000,
+                "fresh_p95_ms": percentile(fresh, 0.95) * 1000
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._calls.shutdown()
@@ -0,0 +1,113 @@
+"""Content-addressed cache of agent task results.
+
+A task's output depends only on its inputs, so results are stored under
+a hash of them and never need invalidating:
+
+* the task itself (id, title and description);
+* the input documents, i.e. the passages retrieved for the task, each
+  identified by its document id and a hash of its text;
+* the pipeline version, the generator's ``version``.
+
+A completed run is stored under the hash of all three, so running a task
+again on unchanged inputs returns its report without generating
+anything. Each step's section is also stored, under the hash of the
+inputs that step declares in ``"uses"`` (``"task"``, ``"documents"`` and
+``"sections"`` for the sections before it). When an input changes, the
+steps that do not use it come from the cache and only the others are
+generated again.
+
+Entries live in a ``DiskCache`` bounded by total size, which evicts the
+least recently read first.
+"""
+import hashlib
+import json
+import os
+import threading
+
+from civildoc.cache import DiskCache
+from civildoc.store import DATA_DIR
+
+DEFAULT_TASK_CACHE_PATH = os.path.join(DATA_DIR, "task_cache.db")
+
+# Total size of cached runs and sections, and entries kept
+MAX_BYTES = 64 * 1024 * 1024
+MAX_ENTRIES = 100_000
+
+# Inputs a step depends on when it does not say
+DEFAULT_USES = ("task", "documents", "sections")
+
+
+def content_hash(value):
+    return hashlib.blake2b(json.dumps(value, sort_keys=True).encode("utf-8", "surrogatepass"),
+                           digest_size=16).hexdigest()
+
+
+def task_inputs(task, passages):
+    """Hashes of the inputs of ``task``, given the passages it cites."""
+    return {
+        "task": content_hash([task["id"], task["title"], task.get("description", "")]),
+        "documents": content_hash([[passage.get("doc_id"), content_hash(passage["text"])] for passage in passages])
+    }
+
+
+class TaskResultCache:
+    """Completed runs and step sections keyed by task, inputs and pipeline version."""
+
+    def __init__(self, path=DEFAULT_TASK_CACHE_PATH, max_bytes=MAX_BYTES, max_entries=MAX_ENTRIES):
+        self.disk = DiskCache("task_results", path, max_entries=max_entries, max_bytes=max_bytes)
+        self._lock = threading.Lock()
+        self.run_hits = 0
+        self.run_misses = 0
+        self.step_hits = 0
+        self.step_misses = 0
+
+    def get_run(self, version, inputs):
+        """Sections of a completed run with these inputs, or None."""
+        value = self.disk.get(content_hash(["run", version, inputs]))
+        with self._lock:
+            if value is None:
+                self.run_misses += 1
+            else:
+                self.run_hits += 1
+        return value
+
+    def set_run(self, version, inputs, sections):
+        self.disk.set(content_hash(["run", version, inputs]), sections)
+
+    def _step_key(self, version, inputs, index, step, sections):
+        uses = step.get("uses", DEFAULT_USES)
+        depends_on = {name: inputs[name] for name in uses if name in inputs}
+        if "sections" in uses:
+            depends_on["sections"] = content_hash(sections)
+        return content_hash(["step", version, index, step["name"], depends_on])
+
+    def get_step(self, version, inputs, index, step, sections):
+        """Cached section of step ``index``, after ``sections``, or None."""
+        value = self.disk.get(self._step_key(version, inputs, index, step, sections))
+        with self._lock:
+            if value is None:
+                self.step_misses += 1
+            else:
+                self.step_hits += 1
+        return value
+
+    def set_step(self, version, inputs, index, step, sections, text):
+        self.disk.set(self._step_key(version, inputs, index, step, sections), text)
+
+    def stats(self):
+        disk = self.disk.stats()
+        with self._lock:
+            steps = self.step_hits + self.step_misses
+            runs = self.run_hits + self.run_misses
+            return {
+                "run_hits": self.run_hits,
+                "run_misses": self.run_misses,
+                "run_hit_rate": self.run_hits / runs if runs else 0.0,
+                "step_hits": self.step_hits,
+                "step_misses": self.step_misses,
+                "step_hit_rate": self.step_hits / steps if steps else 0.0,
+                "entries": disk["entries"],
+                "bytes": disk["bytes"],
+                "max_bytes": self.disk.max_bytes,
+                "evictions": disk["evictions"]
+            }
@@ -0,0 +1,271 @@
+"""Background execution engine for AI agent tasks.
+
+Launching a task queues a job in the persistent ``JobQueue``. A
+dispatcher thread claims runnable jobs in priority order, within the
+per-user and heavy-job limits, and hands them to a shared worker pool.
+Each running job reports its progress into a ``ProgressStore`` that the
+page polls at a bounded rate, so the server only does work for jobs that
+are actually running, not for every open browser tab.
+
+Steps stream their output: every chunk a generator yields is appended to
+the run's sections straight away, so the page can show the first part
+of a report long before the last step finishes. Step progress and the
+final output are also written back to the queue, so every session sees
+every job.
+
+Each finished step is checkpointed to the queue before the next starts.
+A job claimed with checkpointed steps, after a crash, a redeploy or
+``resume()``, only runs the steps after them. The dispatcher renews the
+lease on the jobs its engine runs, and requeues jobs whose worker let
+its lease expire, so a job survives its server process without another
+process taking it over while it still runs.
+
+Given a ``TaskResultCache``, a task run on unchanged inputs is answered
+from the cache, and otherwise each step whose inputs are unchanged is;
+see civildoc/task_cache.py. Every step says in ``"uses"`` which inputs
+its section depends on.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from civildoc.generation import StubGenerator
+from civildoc.jobs import (
+    CANCELLED, COMPLETED, DEFAULT_PRIORITY, FAILED, FINISHED_STATES, LEASE_SECONDS, PENDING, RUNNING, JobQueue
+)
+from civildoc.task_cache import task_inputs
+
+# Execution steps shared by every agent task
+TASK_STEPS = [
+    {"name": "Analyze Project Scope", "desc": "Collect and analyze basic project information",
+     "uses": ("task", "documents")},
+    {"name": "Environmental Data Collection", "desc": "Gather relevant environmental data and historical records",
+     "uses": ("task",)},
+    {"name": "Impact Assessment Analysis", "desc": "Analyze potential environmental impacts of the project",
+     "uses": ("task",)},
+    {"name": "Mitigation Measures Recommendation", "desc": "Propose environmental protection and mitigation measures",
+     "uses": ("task",)},
+    {"name": "Generate Final Report", "desc": "Integrate all information to generate complete report",
+     "uses": ("task", "sections")}
+]
+
+# Steps mostly wait on the model backend, so the pool is sized like the
+# standard library's default for I/O-bound work rather than one per core
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# Jobs one user may have running at once
+DEFAULT_USER_LIMIT = 4
+
+# Share of workers that High-complexity jobs may occupy
+HEAVY_SHARE = 0.5
+
+# Seconds between queue polls when nothing wakes the dispatcher, which
+# picks up jobs queued by other server processes
+DISPATCH_INTERVAL = 1.0
+
+
+class ProgressStore:
+    """Thread-safe, process-wide record of task runs and their progress."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._runs = {}
+
+    def create(self, run_id, task, total_steps):
+        with self._lock:
+            self._runs[run_id] = {
+                "run_id": run_id,
+                "task_id": task["id"],
+                "title": task["title"],
+                "status": RUNNING,
+                "step": 0,
+                "total_steps": total_steps,
+                "submitted_at": None,
+                "resumed_from": 0,
+                "started_at": time.time(),
+                "finished_at": None,
+                "error": None,
+                "sections": []
+            }
+        return run_id
+
+    def update(self, run_id, **fields):
+        with self._lock:
+            self._runs[run_id].update(fields)
+
+    def append_output(self, run_id, step_index, chunk):
+        """Append a streamed chunk to the output section of one step."""
+        with self._lock:
+            sections = self._runs[run_id]["sections"]
+            while len(sections) <= step_index:
+                sections.append("")
+            sections[step_index] += chunk
+
+    def get(self, run_id):
+        """Return a snapshot of a run, or None if it is unknown."""
+        with self._lock:
+            run = self._runs.get(run_id)
+            if not run:
+                return None
+            snapshot = dict(run)
+            snapshot["sections"] = list(run["sections"])
+            return snapshot
+
+    def discard(self, run_id):
+        with self._lock:
+            self._runs.pop(run_id, None)
+
+
+class TaskEngine:
+    """Runs queued agent tasks on a shared worker pool."""
+
+    def __init__(self, max_workers=None, generator=None, steps=None, queue=None,
+                 user_limit=DEFAULT_USER_LIMIT, heavy_share=HEAVY_SHARE, cache=None, lease_seconds=LEASE_SECONDS):
+        self.steps = steps or TASK_STEPS
+        self.generator = generator or StubGenerator()
+        self.cache = cache
+        self.queue = queue or JobQueue()
+        self.store = ProgressStore()
+        self.max_workers = max_workers or DEFAULT_WORKERS
+        self.user_limit = user_limit
+        self.heavy_limit = max(1, int(self.max_workers * heavy_share))
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="agent-task")
+        self._cancel_events = {}
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._dispatcher = threading.Thread(target=self._dispatch, name="agent-task-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, task, user_id="local", priority=DEFAULT_PRIORITY):
+        """Queue a task for execution and return its job id."""
+        job_id = self.queue.submit(task, user_id, priority, total_steps=len(self.steps))
+        self._wakeup.set()
+        return job_id
+
+    def cancel(self, run_id):
+        if self.queue.cancel_pending(run_id):
+            return
+        event = self._cancel_events.get(run_id)
+        if event is not None:
+            event.set()
+
+    def resume(self, run_id):
+        """Queue a stopped or failed job again; finished steps are not run again."""
+        if not self.queue.resume(run_id):
+            return False
+        self._wakeup.set()
+        return True
+
+    def status(self, run_id):
+        """Live state of a job running here, otherwise its queue record."""
+        return self.store.get(run_id) or self.queue.get(run_id)
+
+    def list_jobs(self, limit=50, user_id=None):
+        return self.queue.list_jobs(limit=limit, user_id=user_id)
+
+    def shutdown(self, wait=True):
+        self._closed = True
+        self._wakeup.set()
+        self._dispatcher.join()
+        self._executor.shutdown(wait=wait)
+
+    def _dispatch(self):
+        # Renew leases a few times per lease, so one late beat does not lose them
+        beat_interval = self.lease_seconds / 3
+        next_beat = 0
+        while not self._closed:
+            if time.monotonic() >= next_beat:
+                # Jobs of a dead worker continue here from their last checkpoint
+                self.queue.heartbeat(self.worker_id)
+                self.queue.requeue_expired(self.lease_seconds)
+                next_beat = time.monotonic() + beat_interval
+            self._claim()
+            self._wakeup.wait(min(DISPATCH_INTERVAL, beat_interval))
+            self._wakeup.clear()
+
+    def _claim(self):
+        with self._lock:
+            free = self.max_workers - self._in_flight
+        for job in self.queue.claim(free, self.user_limit, self.heavy_limit, worker_id=self.worker_id):
+            with self._lock:
+                self._in_flight += 1
+            self._cancel_events[job["id"]] = threading.Event()
+            try:
+                self._executor.submit(self._execute, job)
+            except RuntimeError:
+                # The interpreter is exiting; the job is requeued once its lease expires
+                self._closed = True
+                return
+
+    def _finish(self, run_id, **fields):
+        fields["finished_at"] = time.time()
+        self.store.update(run_id, **fields)
+        self.queue.update(run_id, **fields)
+
+    def _execute(self, job):
+        run_id = job["id"]
+        task = job["task"]
+        cancelled = self._cancel_events[run_id]
+        self.store.create(run_id, task, len(self.steps))
+        # Steps checkpointed by an earlier attempt are kept, not run again
+        sections = list(job.get("sections") or [])[:len(self.steps)]
+        for i, text in enumerate(sections):
+            self.store.append_output(run_id, i, text)
+        self.store.update(run_id, submitted_at=job["submitted_at"], started_at=job["started_at"],
+                          step=len(sections), resumed_from=len(sections))
+        try:
+            passages = inputs = None
+            if self.cache is not None:
+                passages = self.generator.input_documents(task)
+                inputs = task_inputs(task, passages)
+                cached = self.cache.get_run(self.generator.version, inputs)
+                if cached is not None:
+                    self._finish(run_id, status=COMPLETED, step=len(cached), sections=cached)
+                    return
+            for i, step in enumerate(self.steps[len(sections):], len(sections)):
+                # Steps answered from the cache never reach the check below
+                if cancelled.is_set():
+                    self._finish(run_id, status=CANCELLED, sections=sections)
+                    return
+                text = None
+                if self.cache is not None:
+                    text = self.cache.get_step(self.generator.version, inputs, i, step, sections)
+                if text is not None:
+                    self.store.append_output(run_id, i, text)
+                else:
+                    chunks = []
+                    stream = (self.generator.stream_step(task, step, sections, tenant=job["user_id"])
+                              if passages is None else
+                              self.generator.stream_step(task, step, sections, passages=passages,
+                                                         tenant=job["user_id"]))
+                    for chunk in stream:
+                        # Checking between chunks keeps Stop responsive
+                        if cancelled.is_set():
+                            self._finish(run_id, status=CANCELLED, sections=sections)
+                            return
+                        chunks.append(chunk)
+                        self.store.append_output(run_id, i, chunk)
+                    text = "".join(chunks)
+                    if self.cache is not None:
+                        self.cache.set_step(self.generator.version, inputs, i, step, sections, text)
+                sections.append(text)
+                self.store.update(run_id, step=i + 1)
+                self.queue.checkpoint(run_id, i + 1, sections)
+            if self.cache is not None:
+                self.cache.set_run(self.generator.version, inputs, sections)
+            self._finish(run_id, status=COMPLETED, sections=sections)
+        except Exception as exc:
+            self._finish(run_id, status=FAILED, error=str(exc), sections=sections)
+        finally:
+            self._cancel_events.pop(run_id, None)
+            self.store.discard(run_id)
+            with self._lock:
+                self._in_flight -= 1
+            self._wakeup.set()
@@ -0,0 +1,224 @@
+"""Timing spans and rerun counts for the Streamlit pages.
+
+Instrumentation is off unless ``CIVILDOC_TELEMETRY`` is set to 1 when
+the server starts. While off, ``span()`` returns one shared no-op
+context manager, ``timed()`` returns the function it decorates
+unchanged, and the record functions return at once, so instrumented
+code runs as if uninstrumented.
+
+While on, every span adds its duration to a per-name histogram with
+fixed millisecond buckets. Recording costs two clock reads and one
+dictionary update under a lock. The collected data, plus the hit and
+miss counters every cache keeps anyway (``civildoc.cache.all_stats()``),
+can be exported as Prometheus text or as JSON lines. Exports count
+sessions and their reruns but leave out session ids.
+"""
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+from civildoc.cache import all_stats
+
+ENABLED = os.environ.get("CIVILDOC_TELEMETRY", "").lower() in ("1", "true", "yes", "on")
+
+# Upper bounds of the span duration histogram buckets, in milliseconds
+BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 10000)
+_BUCKETS_NS = tuple(int(bound * 1e6) for bound in BUCKETS_MS)
+
+# Sessions not seen for this long are dropped from the rerun table
+SESSION_TTL_SECONDS = 3600
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class _SpanStats:
+    __slots__ = ("count", "total_ns", "max_ns", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = [0] * (len(_BUCKETS_NS) + 1)
+
+
+class Telemetry:
+    """Process-wide span histograms and per-session rerun counts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans = {}
+        self._sessions = {}
+        self.started_at = time.time()
+
+    def record_span(self, name, elapsed_ns):
+        bucket = 0
+        while bucket < len(_BUCKETS_NS) and elapsed_ns > _BUCKETS_NS[bucket]:
+            bucket += 1
+        with self._lock:
+            stats = self._spans.get(name)
+            if stats is None:
+                stats = self._spans[name] = _SpanStats()
+            stats.count += 1
+            stats.total_ns += elapsed_ns
+            if elapsed_ns > stats.max_ns:
+                stats.max_ns = elapsed_ns
+            stats.buckets[bucket] += 1
+
+    def record_rerun(self, session_id, page):
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = {"reruns": 0, "pages": {}, "last_seen": now}
+                # Forget idle sessions as new ones arrive
+                stale = [key for key, value in self._sessions.items() if now - value["last_seen"] > SESSION_TTL_SECONDS]
+                for key in stale:
+                    del self._sessions[key]
+            session["reruns"] += 1
+            session["pages"][page] = session["pages"].get(page, 0) + 1
+            session["last_seen"] = now
+
+    def span_rows(self):
+        """One row per span name, slowest total first."""
+        with self._lock:
+            spans = {name: (s.count, s.total_ns, s.max_ns, list(s.buckets)) for name, s in self._spans.items()}
+        rows = []
+        for name, (count, total_ns, max_ns, buckets) in spans.items():
+            rows.append({
+                "span": name,
+                "calls": count,
+                "mean_ms": total_ns / count / 1e6,
+                "p95_ms": _bucket_quantile(buckets, count, 0.95, max_ns),
+                "max_ms": max_ns / 1e6,
+                "total_s": total_ns / 1e9
+            })
+        rows.sort(key=lambda row: -row["total_s"])
+        return rows
+
+    def session_rows(self):
+        with self._lock:
+            sessions = {key: dict(value, pages=dict(value["pages"])) for key, value in self._sessions.items()}
+        return [
+            {"session": key, "reruns": value["reruns"], "pages": value["pages"], "last_seen": value["last_seen"]}
+            for key, value in sorted(sessions.items(), key=lambda item: -item[1]["reruns"])
+        ]
+
+    def prometheus_text(self):
+        """Spans, reruns and cache statistics in Prometheus text format."""
+        lines = [
+            "# HELP civildoc_span_seconds Duration of instrumented page sections and functions.",
+            "# TYPE civildoc_span_seconds histogram"
+        ]
+        with self._lock:
+            spans = {name: (s.count, s.total_ns, list(s.buckets)) for name, s in self._spans.items()}
+        for name, (count, total_ns, buckets) in sorted(spans.items()):
+            label = _label(name)
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS_MS, buckets):
+                cumulative += bucket
+                lines.append(f'civildoc_span_seconds_bucket{{span="{label}",le="{bound / 1000:g}"}} {cumulative}')
+            lines.append(f'civildoc_span_seconds_bucket{{span="{label}",le="+Inf"}} {count}')
+            lines.append(f'civildoc_span_seconds_sum{{span="{label}"}} {total_ns / 1e9:.6f}')
+            lines.append(f'civildoc_span_seconds_count{{span="{label}"}} {count}')
+
+        sessions = self.session_rows()
+        lines += [
+            "# HELP civildoc_reruns_total Full script reruns across live sessions.",
+            "# TYPE civildoc_reruns_total counter",
+            f"civildoc_reruns_total {sum(session['reruns'] for session in sessions)}",
+            "# HELP civildoc_sessions Sessions seen in the last hour.",
+            "# TYPE civildoc_sessions gauge",
+            f"civildoc_sessions {len(sessions)}"
+        ]
+
+        for metric, kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"),
+                             ("invalidations", "counter"), ("entries", "gauge")):
+            suffix = "_total" if kind == "counter" else ""
+            lines.append(f"# TYPE civildoc_cache_{metric}{suffix} {kind}")
+            for region in all_stats():
+                lines.append(f'civildoc_cache_{metric}{suffix}{{region="{_label(region["region"])}"}} {region[metric]}')
+        return "\n".join(lines) + "\n"
+
+    def jsonl(self):
+        """One JSON object per span, session and cache region."""
+        timestamp = time.time()
+        records = [dict(row, type="span") for row in self.span_rows()]
+        records += [{"type": "session", "reruns": row["reruns"], "pages": row["pages"], "last_seen": row["last_seen"]}
+                    for row in self.session_rows()]
+        records += [dict(region, type="cache") for region in all_stats()]
+        return "".join(json.dumps(dict(record, ts=timestamp)) + "\n" for record in records)
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._sessions.clear()
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _bucket_quantile(buckets, count, fraction, max_ns):
+    """Upper bound of the bucket holding the ``fraction`` quantile, in milliseconds."""
+    target = count * fraction
+    seen = 0
+    for bound, bucket in zip(BUCKETS_MS, buckets):
+        seen += bucket
+        if seen >= target:
+            return min(bound, max_ns / 1e6)
+    return max_ns / 1e6
+
+
+_telemetry = Telemetry()
+
+
+def get_telemetry():
+    return _telemetry
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        _telemetry.record_span(self.name, time.perf_counter_ns() - self.start)
+        return False
+
+
+def span(name):
+    """Context manager timing the enclosed block as ``name``."""
+    return _Span(name) if ENABLED else _NULL_SPAN
+
+
+def timed(name=None):
+    """Decorator timing every call as ``name`` (default: the function's qualified name)."""
+    def decorator(func):
+        if not ENABLED:
+            return func
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _telemetry.record_span(span_name, time.perf_counter_ns() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def record_rerun(session_id, page):
+    if ENABLED:
+        _telemetry.record_rerun(session_id, page)
@@ -0,0 +1,311 @@
+"""Revision history of edited documents, stored as chunk-level diffs.
+
+Each saved body is cut into content-defined chunks: a line ends a chunk
+when its CRC falls under a threshold proportional to its length, so
+chunks average ``TARGET_CHUNK`` bytes and boundaries depend only on
+nearby text. An edit therefore changes one or two chunks and the rest
+line up with the previous revision again.
+
+Chunks are compressed and stored once, addressed by their BLAKE2b hash,
+and shared by every revision and document that contains them. A
+revision records only how its chunk list differs from the previous one,
+except every ``SNAPSHOT_INTERVAL`` revisions, which store the full list.
+Checking out a revision replays at most that many small diffs and reads
+the chunks it needs in a few indexed queries.
+"""
+import difflib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from civildoc.store import DATA_DIR
+
+DEFAULT_VERSIONS_PATH = os.path.join(DATA_DIR, "versions.db")
+
+# Chunk sizes in bytes; lines longer than MAX_CHUNK are split at fixed offsets
+TARGET_CHUNK = 4096
+MIN_CHUNK = 512
+MAX_CHUNK = 16384
+
+# Every Nth revision stores its full chunk list
+SNAPSHOT_INTERVAL = 50
+
+DIGEST_SIZE = 16
+
+# Decompressed chunks kept in memory for checkouts, in bytes
+CHUNK_CACHE_BYTES = 64 * 1024 * 1024
+
+# Hashes per "IN (...)" query, below SQLite's variable limit
+_QUERY_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    hash BLOB PRIMARY KEY,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS revisions (
+    doc_id TEXT NOT NULL,
+    rev INTEGER NOT NULL,
+    saved_at REAL NOT NULL,
+    author TEXT NOT NULL,
+    message TEXT NOT NULL DEFAULT '',
+    size INTEGER NOT NULL,
+    stored_bytes INTEGER NOT NULL,
+    snapshot INTEGER NOT NULL,
+    digest BLOB NOT NULL,
+    manifest BLOB NOT NULL,
+    PRIMARY KEY (doc_id, rev)
+);
+"""
+
+# Columns for history views; manifests are only read on checkout
+REVISION_COLUMNS = "doc_id, rev, saved_at, author, message, size, stored_bytes, snapshot"
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest()
+
+
+def chunk_bytes(data):
+    """Split ``data`` into content-defined chunks, cut at line ends."""
+    chunks = []
+    current = []
+    size = 0
+    for line in data.splitlines(keepends=True):
+        if len(line) > MAX_CHUNK:
+            if current:
+                chunks.append(b"".join(current))
+                current, size = [], 0
+            chunks += [line[i:i + MAX_CHUNK] for i in range(0, len(line), MAX_CHUNK)]
+            continue
+        current.append(line)
+        size += len(line)
+        # A line ends a chunk with probability len(line) / TARGET_CHUNK
+        if size >= MAX_CHUNK or (size >= MIN_CHUNK and zlib.crc32(line) * TARGET_CHUNK < len(line) << 32):
+            chunks.append(b"".join(current))
+            current, size = [], 0
+    if current:
+        chunks.append(b"".join(current))
+    return chunks
+
+
+def diff_chunk_lists(old, new):
+    """Ops turning chunk list ``old`` into ``new``: ``["c", start, end]`` copies, ``["i", hex, ...]`` inserts."""
+    # Edits are local, so trim the common prefix and suffix before diffing
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    ops = [["c", 0, prefix]] if prefix else []
+    matcher = difflib.SequenceMatcher(None, old[prefix:len(old) - suffix], new[prefix:len(new) - suffix],
+                                      autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(["c", prefix + i1, prefix + i2])
+        elif tag in ("replace", "insert"):
+            ops.append(["i"] + [h.hex() for h in new[prefix + j1:prefix + j2]])
+    if suffix:
+        ops.append(["c", len(old) - suffix, len(old)])
+    return ops
+
+
+def apply_chunk_diff(old, ops):
+    new = []
+    for op in ops:
+        if op[0] == "c":
+            new += old[op[1]:op[2]]
+        else:
+            new += [bytes.fromhex(h) for h in op[1:]]
+    return new
+
+
+class VersionStore:
+    """Document revisions in a local SQLite file, with content-addressed chunks."""
+
+    def __init__(self, path=DEFAULT_VERSIONS_PATH, cache_bytes=CHUNK_CACHE_BYTES):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._chunk_cache = OrderedDict()
+        self._chunk_cache_size = 0
+        self.cache_bytes = cache_bytes
+        # doc_id -> (rev, chunk list) of the latest revision seen by this process
+        self._heads = {}
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; commit() opens its own write transaction
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def head(self, doc_id):
+        """Number of the latest revision of ``doc_id``, or None if it has none."""
+        row = self._conn().execute("SELECT MAX(rev) FROM revisions WHERE doc_id = ?", (doc_id,)).fetchone()
+        return row[0]
+
+    def commit(self, doc_id, text, author, message=""):
+        """Save ``text`` as a new revision and return it, or None if it equals the latest one."""
+        data = text.encode("utf-8")
+        digest = _digest(data)
+        chunks = chunk_bytes(data)
+        hashes = [_digest(chunk) for chunk in chunks]
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            head = conn.execute(
+                "SELECT rev, digest FROM revisions WHERE doc_id = ? ORDER BY rev DESC LIMIT 1", (doc_id,)
+            ).fetchone()
+            if head is not None and head["digest"] == digest:
+                conn.execute("ROLLBACK")
+                return None
+
+            stored = 0
+            # Only chunks not already stored are compressed and written
+            known = self._known_hashes(set(hashes))
+            new_chunks = {}
+            for chunk, chunk_hash in zip(chunks, hashes):
+                if chunk_hash not in known and chunk_hash not in new_chunks:
+                    new_chunks[chunk_hash] = chunk
+            for chunk_hash, chunk in new_chunks.items():
+                compressed = zlib.compress(chunk, 6)
+                conn.execute("INSERT OR IGNORE INTO chunks (hash, size, data) VALUES (?, ?, ?)",
+                             (chunk_hash, len(chunk), compressed))
+                stored += len(compressed)
+
+            rev = 1 if head is None else head["rev"] + 1
+            snapshot = head is None or (rev - 1) % SNAPSHOT_INTERVAL == 0
+            if not snapshot:
+                ops = diff_chunk_lists(self._chunk_list(doc_id, head["rev"]), hashes)
+                manifest = zlib.compress(json.dumps(ops, separators=(",", ":")).encode())
+                # A rewrite can diff larger than the full list
+                snapshot = len(manifest) >= len(hashes) * DIGEST_SIZE
+            if snapshot:
+                manifest = b"".join(hashes)
+            stored += len(manifest)
+
+            revision = {
+                "doc_id": doc_id,
+                "rev": rev,
+                "saved_at": time.time(),
+                "author": author,
+                "message": message,
+                "size": len(data),
+                "stored_bytes": stored,
+                "snapshot": int(snapshot)
+            }
+            conn.execute(
+                f"INSERT INTO revisions ({REVISION_COLUMNS}, digest, manifest) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (*revision.values(), digest, manifest)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        with self._lock:
+            self._heads[doc_id] = (rev, hashes)
+            for chunk_hash, chunk in new_chunks.items():
+                self._cache_chunk(chunk_hash, chunk)
+        return revision
+
+    def _known_hashes(self, hashes):
+        hashes = list(hashes)
+        known = set()
+        for i in range(0, len(hashes), _QUERY_BATCH):
+            batch = hashes[i:i + _QUERY_BATCH]
+            rows = self._conn().execute(
+                f"SELECT hash FROM chunks WHERE hash IN ({', '.join('?' * len(batch))})", batch
+            )
+            known.update(row[0] for row in rows)
+        return known
+
+    def _chunk_list(self, doc_id, rev):
+        with self._lock:
+            cached = self._heads.get(doc_id)
+        if cached is not None and cached[0] == rev:
+            return cached[1]
+        # Replay diffs forward from the nearest snapshot at or before rev
+        rows = self._conn().execute(
+            "SELECT snapshot, manifest FROM revisions WHERE doc_id = ? AND rev <= ? AND rev >= "
+            "(SELECT MAX(rev) FROM revisions WHERE doc_id = ? AND rev <= ? AND snapshot = 1) ORDER BY rev",
+            (doc_id, rev, doc_id, rev)
+        ).fetchall()
+        if not rows:
+            raise KeyError(f"{doc_id} has no revision {rev}")
+        manifest = rows[0]["manifest"]
+        hashes = [manifest[i:i + DIGEST_SIZE] for i in range(0, len(manifest), DIGEST_SIZE)]
+        for row in rows[1:]:
+            if row["snapshot"]:
+                manifest = row["manifest"]
+                hashes = [manifest[i:i + DIGEST_SIZE] for i in range(0, len(manifest), DIGEST_SIZE)]
+            else:
+                hashes = apply_chunk_diff(hashes, json.loads(zlib.decompress(row["manifest"])))
+        return hashes
+
+    def _cache_chunk(self, chunk_hash, chunk):
+        # Caller holds self._lock
+        if chunk_hash in self._chunk_cache:
+            self._chunk_cache.move_to_end(chunk_hash)
+            return
+        self._chunk_cache[chunk_hash] = chunk
+        self._chunk_cache_size += len(chunk)
+        while self._chunk_cache_size > self.cache_bytes:
+            _, evicted = self._chunk_cache.popitem(last=False)
+            self._chunk_cache_size -= len(evicted)
+
+    def _read_chunks(self, hashes):
+        chunks = {}
+        with self._lock:
+            for chunk_hash in hashes:
+                chunk = self._chunk_cache.get(chunk_hash)
+                if chunk is not None:
+                    chunks[chunk_hash] = chunk
+        missing = list(set(hashes) - chunks.keys())
+        for i in range(0, len(missing), _QUERY_BATCH):
+            batch = missing[i:i + _QUERY_BATCH]
+            rows = self._conn().execute(
+                f"SELECT hash, data FROM chunks WHERE hash IN ({', '.join('?' * len(batch))})", batch
+            )
+            for row in rows:
+                chunks[row["hash"]] = zlib.decompress(row["data"])
+        with self._lock:
+            for chunk_hash in missing:
+                self._cache_chunk(chunk_hash, chunks[chunk_hash])
+        return b"".join(chunks[chunk_hash] for chunk_hash in hashes)
+
+    def checkout(self, doc_id, rev=None):
+        """Text of revision ``rev`` of ``doc_id`` (the latest when None)."""
+        if rev is None:
+            rev = self.head(doc_id)
+            if rev is None:
+                raise KeyError(f"{doc_id} has no revisions")
+        return self._read_chunks(self._chunk_list(doc_id, rev)).decode("utf-8")
+
+    def history(self, doc_id, limit=50):
+        """Revisions of ``doc_id``, newest first, without their contents."""
+        rows = self._conn().execute(
+            f"SELECT {REVISION_COLUMNS} FROM revisions WHERE doc_id = ? ORDER BY rev DESC LIMIT ?", (doc_id, limit)
+        )
+        return [dict(row) for row in rows]
+
+    def stored_bytes(self, doc_id):
+        """Bytes written for ``doc_id``'s revisions: new compressed chunks plus manifests."""
+        row = self._conn().execute("SELECT SUM(stored_bytes) FROM revisions WHERE doc_id = ?", (doc_id,)).fetchone()
+        return row[0] or 0
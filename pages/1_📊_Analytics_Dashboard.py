@@ -1,22 +1,49 @@
+import os
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from civildoc.components import render_profiling_panel
+from civildoc.state import current_session_id, is_admin
+from civildoc.telemetry import record_rerun, span, timed
 
 st.set_page_config(
     page_title="Analytics Dashboard - CivilDoc AI",
     page_icon="📊",
     layout="wide"
 )
+record_rerun(current_session_id(), "analytics")
 
 st.title("📊 Analytics Dashboard")
 st.markdown("Real-time insights into your engineering documentation and AI task performance")
 
-# Generate sample data
-@st.cache_data
-def generate_sample_data():
+# numpy, pandas and plotly are imported after the header, so a cold worker
+# sends it while they load; plotly.express is imported only by the figure
+# builders, on a figure cache miss
+import numpy as np
+import pandas as pd
+from civildoc.analytics import ACTIVITY_METRICS, EventAggregate
+from civildoc.cache import all_stats, get_region, load_snapshot, save_snapshot
+from civildoc.downsample import METHODS, downsample, max_points_for_width
+from civildoc.events import EventLog, default_range
+from civildoc.figures import cached_figure
+from civildoc.store import DATA_DIR
+
+# Rollups and figures are saved here and restored by the next worker
+CACHE_SNAPSHOT_PATH = os.path.join(DATA_DIR, "dashboard_cache.pickle")
+SNAPSHOT_REGIONS = ("dashboard", "figures")
+
+PROJECT_TYPES = ['Highway Design', 'Bridge Analysis', 'Soil Testing', 'Environmental Impact', 'Building Plans']
+TASK_TYPES = ['Environmental Report', 'Data Extraction', 'Compliance Check']
+
+# Project types distribution
+project_types = pd.DataFrame({
+    'type': PROJECT_TYPES,
+    'count': [45, 32, 28, 19, 36],
+    'ai_assistance_rate': [85, 92, 78, 95, 88]
+})
+
+# Seed an empty event log with a year of sample events
+@timed()
+def generate_sample_data(log):
     # Document activity data
     dates = pd.date_range(start='2023-01-01', end='2023-12-31', freq='D')
     doc_activity = pd.DataFrame({
@@ -25,82 +52,120 @@ def generate_sample_data():
         'documents_edited': np.random.poisson(5, len(dates)),
         'ai_tasks_completed': np.random.poisson(3, len(dates))
     })
-    
-    # Project types distribution
-    project_types = pd.DataFrame({
-        'type': ['Highway Design', 'Bridge Analysis', 'Soil Testing', 'Environmental Impact', 'Building Plans'],
-        'count': [45, 32, 28, 19, 36],
-        'ai_assistance_rate': [85, 92, 78, 95, 88]
-    })
+    project_weights = project_types['count'] / project_types['count'].sum()
+    # One append for every metric, so each day partition is written once
+    event_dates = np.concatenate([np.repeat(dates.values, doc_activity[metric]) for metric in ACTIVITY_METRICS])
+    log.append(
+        "activity",
+        event_dates,
+        metric=np.repeat(np.array(ACTIVITY_METRICS, dtype=object),
+                         [doc_activity[metric].sum() for metric in ACTIVITY_METRICS]),
+        project_type=np.random.choice(PROJECT_TYPES, len(event_dates), p=project_weights)
+    )
     
     # Task completion times
-    task_times = pd.DataFrame({
-        'task_type': ['Environmental Report', 'Data Extraction', 'Compliance Check'] * 10,
-        'completion_time': np.random.normal([35, 12, 25], [8, 3, 5], 30),
-        'accuracy': np.random.normal([96, 94, 98], [2, 3, 1], 30)
-    })
-    
-    return doc_activity, project_types, task_times
+    log.append(
+        "task_results",
+        np.sort(np.random.choice(dates.values, 30)),
+        task_type=TASK_TYPES * 10,
+        project_type=np.random.choice(PROJECT_TYPES, 30, p=project_weights),
+        completion_time=np.random.normal(np.tile([35, 12, 25], 10), np.tile([8, 3, 5], 10)),
+        accuracy=np.random.normal(np.tile([96, 94, 98], 10), np.tile([2, 3, 1], 10))
+    )
 
-doc_activity, project_types, task_times = generate_sample_data()
+# Event log shared by every session
+@st.cache_resource
+def get_event_log():
+    log = EventLog()
+    if log.is_empty():
+        generate_sample_data(log)
+    return log
 
-# Key Metrics Row
-col1, col2, col3, col4 = st.columns(4)
+# Dashboard rollups, one aggregate per filter combination in the "dashboard"
+# region; when the event log grows, only the rows appended since the
+# aggregate was last brought up to date are read and folded in
+dashboard_region = get_region("dashboard", max_entries=32, ttl=3600)
 
-with col1:
-    total_docs = doc_activity['documents_created'].sum()
-    st.metric(
-        label="📄 Total Documents",
-        value=f"{total_docs:,}",
-        delta=f"+{doc_activity['documents_created'].tail(7).sum()} this week"
-    )
+@timed("analytics.load_dashboard_data")
+def load_dashboard_data(start, end, project_types=None, task_types=None):
+    key = (start, end, project_types, task_types)
+    previous = dashboard_region.get(key)
+    aggregate = (previous or EventAggregate(*key)).updated(get_event_log())
+    if aggregate is not previous:
+        dashboard_region.set(key, aggregate)
+    return aggregate.analytics
 
-with col2:
-    total_tasks = doc_activity['ai_tasks_completed'].sum()
-    st.metric(
-        label="🤖 AI Tasks Completed", 
-        value=f"{total_tasks:,}",
-        delta=f"+{doc_activity['ai_tasks_completed'].tail(7).sum()} this week"
-    )
+# Restore the previous worker's rollups and figures once per process
+@st.cache_resource
+@timed()
+def restore_dashboard_caches():
+    return load_snapshot(CACHE_SNAPSHOT_PATH)
 
-with col3:
-    avg_accuracy = task_times['accuracy'].mean()
-    st.metric(
-        label="🎯 Average Accuracy",
-        value=f"{avg_accuracy:.1f}%",
-        delta="+1.2% vs last month"
-    )
+restore_dashboard_caches()
 
-with col4:
-    avg_time = task_times['completion_time'].mean()
-    st.metric(
-        label="⏱️ Avg Completion Time",
-        value=f"{avg_time:.1f} min",
-        delta="-3.5 min improvement"
-    )
+# Filters; an empty selection means all values
+log = get_event_log()
+default_start, default_end = default_range(log, "activity")
+history = log.days("activity")
+first_day = min(history[0].astype(date), default_start) if history else default_start
+with st.sidebar.expander("🔎 Filters", expanded=True):
+    selected_range = st.date_input("Date range", value=(default_start, default_end),
+                                   min_value=first_day, max_value=default_end)
+    selected_projects = st.multiselect("Project types", log.dictionary("activity", "project_type"),
+                                       placeholder="All project types")
+    selected_tasks = st.multiselect("Task types", log.dictionary("task_results", "task_type"),
+                                    placeholder="All task types")
 
-st.markdown("---")
+# A range still being picked has only its start date
+start_date, end_date = selected_range if len(selected_range) == 2 else (selected_range[0], selected_range[0])
+project_filter = tuple(sorted(selected_projects)) or None
+task_filter = tuple(sorted(selected_tasks)) or None
+shown_project_types = project_types[project_types['type'].isin(project_filter)] if project_filter else project_types
 
-# Charts Row 1
-col1, col2 = st.columns(2)
+with span("analytics.data"):
+    # Figures are cached per event log watermark
+    data_version = log.watermark()
+    analytics = load_dashboard_data(start_date, end_date, project_filter, task_filter)
+    doc_activity = analytics.daily_frame()
+    task_times = analytics.task_sample_frame()
+
+# Approximate rendered chart widths, used to cap points per trace
+HALF_CHART_WIDTH_PX = 600
+FULL_CHART_WIDTH_PX = 1200
+
+# Figure builders; each runs only when its figure is not in the figure cache
+def build_activity_figure(doc_activity, activity_method):
+    import plotly.graph_objects as go
 
-with col1:
-    st.subheader("📈 Document Activity Trend")
-    
     # Create activity trend chart
     fig_activity = go.Figure()
     
+    # Cap points per trace to what the half-width chart can show
+    activity_points = max_points_for_width(HALF_CHART_WIDTH_PX)
+    created_x, created_y = downsample(
+        doc_activity['date'],
+        doc_activity['documents_created'].rolling(7).mean(),
+        activity_points,
+        method=activity_method
+    )
+    tasks_x, tasks_y = downsample(
+        doc_activity['date'],
+        doc_activity['ai_tasks_completed'].rolling(7).mean(),
+        activity_points,
+        method=activity_method
+    )
+    
     fig_activity.add_trace(go.Scatter(
-        x=doc_activity['date'],
-        y=doc_activity['documents_created'].rolling(7).mean(),
+        x=created_x,
+        y=created_y,
         mode='lines',
         name='Documents Created',
         line=dict(color='#3b82f6')
     ))
     
     fig_activity.add_trace(go.Scatter(
-        x=doc_activity['date'],
-        y=doc_activity['ai_tasks_completed'].rolling(7).mean(),
+        x=tasks_x,
+        y=tasks_y,
         mode='lines',
         name='AI Tasks Completed',
         line=dict(color='#10b981')
@@ -112,12 +177,11 @@ with col1:
         xaxis_title="Date",
         yaxis_title="Count (7-day average)"
     )
-    
-    st.plotly_chart(fig_activity, use_container_width=True)
+    return fig_activity
+
+def build_projects_figure(project_types):
+    import plotly.express as px
 
-with col2:
-    st.subheader("🏗️ Project Types Distribution")
-    
     # Create project types pie chart
     fig_projects = px.pie(
         project_types, 
@@ -127,14 +191,11 @@ with col2:
     )
     
     fig_projects.update_layout(height=400)
-    st.plotly_chart(fig_projects, use_container_width=True)
+    return fig_projects
 
-# Charts Row 2
-col1, col2 = st.columns(2)
+def build_performance_figure(task_times):
+    import plotly.express as px
 
-with col1:
-    st.subheader("🚀 AI Task Performance")
-    
     # Create task performance scatter plot
     fig_performance = px.scatter(
         task_times,
@@ -151,12 +212,11 @@ with col1:
         xaxis_title="Completion Time (minutes)",
         yaxis_title="Accuracy (%)"
     )
-    
-    st.plotly_chart(fig_performance, use_container_width=True)
+    return fig_performance
+
+def build_assistance_figure(project_types):
+    import plotly.express as px
 
-with col2:
-    st.subheader("🎯 AI Assistance Rate by Project Type")
-    
     # Create AI assistance rate bar chart
     fig_assistance = px.bar(
         project_types,
@@ -172,7 +232,116 @@ with col2:
         yaxis_title="AI Assistance Rate (%)",
         showlegend=False
     )
+    return fig_assistance
+
+def build_monthly_figure(analytics, monthly_method):
+    import plotly.graph_objects as go
+
+    # Monthly rollup
+    monthly_data = analytics.monthly_frame()
+    
+    monthly_points = max_points_for_width(FULL_CHART_WIDTH_PX)
+    created_x, created_y = downsample(
+        monthly_data.index, monthly_data['documents_created'], monthly_points, method=monthly_method
+    )
+    tasks_x, tasks_y = downsample(
+        monthly_data.index, monthly_data['ai_tasks_completed'], monthly_points, method=monthly_method
+    )
+    
+    fig_monthly = go.Figure()
+    
+    fig_monthly.add_trace(go.Bar(
+        x=created_x,
+        y=created_y,
+        name='Documents Created',
+        marker_color='#3b82f6'
+    ))
+    
+    fig_monthly.add_trace(go.Bar(
+        x=tasks_x,
+        y=tasks_y,
+        name='AI Tasks Completed',
+        marker_color='#10b981'
+    ))
     
+    fig_monthly.update_layout(
+        height=400,
+        barmode='group',
+        xaxis_title="Month",
+        yaxis_title="Count"
+    )
+    return fig_monthly
+
+# Downsampling method per time-series chart
+with st.sidebar.expander("📉 Chart Downsampling"):
+    activity_method = st.selectbox("Document Activity Trend", METHODS, index=METHODS.index("lttb"))
+    monthly_method = st.selectbox("Monthly Trends", METHODS, index=METHODS.index("minmax"))
+
+# Key Metrics Row
+col1, col2, col3, col4 = st.columns(4)
+
+with col1:
+    total_docs = doc_activity['documents_created'].sum()
+    st.metric(
+        label="📄 Total Documents",
+        value=f"{total_docs:,}",
+        delta=f"+{doc_activity['documents_created'].tail(7).sum()} this week"
+    )
+
+with col2:
+    total_tasks = doc_activity['ai_tasks_completed'].sum()
+    st.metric(
+        label="🤖 AI Tasks Completed", 
+        value=f"{total_tasks:,}",
+        delta=f"+{doc_activity['ai_tasks_completed'].tail(7).sum()} this week"
+    )
+
+with col3:
+    avg_accuracy = analytics.accuracy.overall_mean()
+    st.metric(
+        label="🎯 Average Accuracy",
+        value=f"{avg_accuracy:.1f}%" if not np.isnan(avg_accuracy) else "–",
+        delta="+1.2% vs last month"
+    )
+
+with col4:
+    avg_time = analytics.completion_time.overall_mean()
+    st.metric(
+        label="⏱️ Avg Completion Time",
+        value=f"{avg_time:.1f} min" if not np.isnan(avg_time) else "–",
+        delta="-3.5 min improvement"
+    )
+
+st.markdown("---")
+
+# Charts Row 1
+col1, col2 = st.columns(2)
+
+with col1, span("analytics.chart.activity"):
+    st.subheader("📈 Document Activity Trend")
+    fig_activity = cached_figure("activity", data_version, (start_date, end_date, project_filter, activity_method),
+                                 lambda: build_activity_figure(doc_activity, activity_method))
+    st.plotly_chart(fig_activity, use_container_width=True)
+
+with col2, span("analytics.chart.projects"):
+    st.subheader("🏗️ Project Types Distribution")
+    fig_projects = cached_figure("projects", None, (project_filter,),
+                                 lambda: build_projects_figure(shown_project_types))
+    st.plotly_chart(fig_projects, use_container_width=True)
+
+# Charts Row 2
+col1, col2 = st.columns(2)
+
+with col1, span("analytics.chart.performance"):
+    st.subheader("🚀 AI Task Performance")
+    fig_performance = cached_figure("performance", data_version, (start_date, end_date, project_filter, task_filter),
+                                    lambda: build_performance_figure(task_times))
+    st.plotly_chart(fig_performance, use_container_width=True)
+
+with col2, span("analytics.chart.assistance"):
+    st.subheader("🎯 AI Assistance Rate by Project Type")
+    fig_assistance = cached_figure("assistance", None, (project_filter,),
+                                   lambda: build_assistance_figure(shown_project_types))
     st.plotly_chart(fig_assistance, use_container_width=True)
 
 st.markdown("---")
@@ -182,7 +351,7 @@ st.subheader("📋 Detailed Analytics")
 
 tab1, tab2, tab3 = st.tabs(["📊 Performance Metrics", "📈 Trends Analysis", "🔍 Task Insights"])
 
-with tab1:
+with tab1, span("analytics.tab.performance"):
     col1, col2 = st.columns(2)
     
     with col1:
@@ -205,53 +374,23 @@ with tab1:
             'Value': [
                 f"{doc_activity['ai_tasks_completed'].sum():,}",
                 "98.5%",
-                f"{task_times['accuracy'].mean():.1f}%",
+                f"{analytics.accuracy.overall_mean():.1f}%",
                 "2,400+ hours"
             ]
         })
         st.dataframe(task_stats, use_container_width=True, hide_index=True)
 
-with tab2:
+with tab2, span("analytics.tab.trends"):
     st.markdown("### 📈 Monthly Trends")
-    
-    # Monthly aggregation
-    monthly_data = doc_activity.set_index('date').resample('M').sum()
-    
-    fig_monthly = go.Figure()
-    
-    fig_monthly.add_trace(go.Bar(
-        x=monthly_data.index,
-        y=monthly_data['documents_created'],
-        name='Documents Created',
-        marker_color='#3b82f6'
-    ))
-    
-    fig_monthly.add_trace(go.Bar(
-        x=monthly_data.index,
-        y=monthly_data['ai_tasks_completed'],
-        name='AI Tasks Completed',
-        marker_color='#10b981'
-    ))
-    
-    fig_monthly.update_layout(
-        height=400,
-        barmode='group',
-        xaxis_title="Month",
-        yaxis_title="Count"
-    )
-    
+    fig_monthly = cached_figure("monthly", data_version, (start_date, end_date, project_filter, monthly_method),
+                                lambda: build_monthly_figure(analytics, monthly_method))
     st.plotly_chart(fig_monthly, use_container_width=True)
 
-with tab3:
+with tab3, span("analytics.tab.insights"):
     st.markdown("### 🔍 Task Type Analysis")
     
     # Task insights
-    task_insights = task_times.groupby('task_type').agg({
-        'completion_time': ['mean', 'std', 'min', 'max'],
-        'accuracy': ['mean', 'std']
-    }).round(2)
-    
-    task_insights.columns = ['Avg Time', 'Time Std', 'Min Time', 'Max Time', 'Avg Accuracy', 'Accuracy Std']
+    task_insights = analytics.task_stats_frame().round(2)
     
     st.dataframe(task_insights, use_container_width=True)
     
@@ -261,7 +400,25 @@ with tab3:
     st.info("⚡ **Data Extraction** is fastest - great for time-sensitive projects")
     st.warning("🔍 **Compliance Checks** have variable timing - consider optimization")
 
-# Real-time updates simulation
+# Refresh reruns the page, which folds in any events appended meanwhile
 if st.button("🔄 Refresh Data"):
-    st.cache_data.clear()
     st.rerun()
+
+# Keep newly computed rollups and figures for the next worker; only written
+# when a run added something
+save_snapshot(CACHE_SNAPSHOT_PATH, SNAPSHOT_REGIONS)
+
+# Cache statistics
+with st.sidebar.expander("🗄️ Cache Statistics"):
+    cache_stats = pd.DataFrame(all_stats())
+    if not cache_stats.empty:
+        st.dataframe(cache_stats.set_index("region"), use_container_width=True)
+        st.download_button(
+            "Export JSON",
+            cache_stats.to_json(orient="records"),
+            file_name="cache_stats.json",
+            mime="application/json"
+        )
+
+if is_admin():
+    render_profiling_panel(current_session_id())
@@ -1,180 +1,131 @@
 import streamlit as st
 import json
 import time
-import random
 from datetime import datetime
 import base64
-# Import deployment functions with error handling
-try:
-    from streamlit_deploy import setup_deployment, display_deployment_info, get_deployment_status
-except ImportError:
-    # Fallback functions if streamlit_deploy is not available
-    def setup_deployment():
-        st.set_page_config(
-            page_title="CivilDoc AI - Documentation Assistant",
-            page_icon="🏗️",
-            layout="wide",
-            initial_sidebar_state="expanded"
-        )
-    
-    def display_deployment_info():
-        pass
-    
-    def get_deployment_status():
-        return {
-            "environment": "Local Development",
-            "streamlit_version": st.__version__,
-            "is_production": False
-        }
+from civildoc.deployment import setup_deployment, display_deployment_info, get_deployment_status
+from civildoc.shell import DOCUMENT_DETAILS_MD, render_css, render_footer, render_home_header
+from civildoc.telemetry import record_rerun, span, timed
 
 # Setup deployment configuration
 setup_deployment()
 
-# Custom CSS for better styling
-st.markdown("""
-<style>
-    .main-header {
-        font-size: 3rem;
-        color: #1e40af;
-        text-align: center;
-        margin-bottom: 2rem;
-        font-weight: bold;
-    }
-    
-    .sub-header {
-        font-size: 1.2rem;
-        color: #6b7280;
-        text-align: center;
-        margin-bottom: 3rem;
-    }
-    
-    .document-card {
-        border: 1px solid #e5e7eb;
-        border-radius: 0.5rem;
-        padding: 1rem;
-        margin: 1rem 0;
-        background-color: #f9fafb;
-        transition: all 0.3s ease;
-    }
-    
-    .document-card:hover {
-        box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
-        transform: translateY(-2px);
-    }
-    
-    .status-badge {
-        padding: 0.25rem 0.75rem;
-        border-radius: 9999px;
-        font-size: 0.75rem;
-        font-weight: 600;
-        text-transform: uppercase;
-    }
-    
-    .status-draft {
-        background-color: #fef3c7;
-        color: #92400e;
-    }
-    
-    .status-completed {
-        background-color: #d1fae5;
-        color: #065f46;
-    }
-    
-    .status-review {
-        background-color: #dbeafe;
-        color: #1e40af;
-    }
-    
-    .task-card {
-        border-left: 4px solid #3b82f6;
-        background-color: #f8fafc;
-        padding: 1rem;
-        margin: 1rem 0;
-        border-radius: 0 0.5rem 0.5rem 0;
-    }
-    
-    .complexity-high {
-        border-left-color: #ef4444;
-    }
-    
-    .complexity-medium {
-        border-left-color: #f59e0b;
-    }
-    
-    .complexity-low {
-        border-left-color: #10b981;
-    }
-    
-    .stProgress > div > div > div > div {
-        background-color: #3b82f6;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# Load mock data
-@st.cache_data
-def load_mock_data():
-    return {
-        "documents": [
-            {
-                "id": "doc-1",
-                "title": "Highway Design Report",
-                "date": "2023-10-15",
-                "status": "Draft",
-                "preview": "This report outlines the design specifications for the A42 highway extension project including traffic flow analysis, structural requirements, and environmental considerations..."
-            },
-            {
-                "id": "doc-2",
-                "title": "Structural Analysis - B24 Bridge",
-                "date": "2023-09-28",
-                "status": "Completed",
-                "preview": "Comprehensive structural integrity analysis of the B24 bridge over River Thames, including load capacity assessments and material stress evaluations..."
-            },
-            {
-                "id": "doc-3",
-                "title": "Soil Testing Report - NW Region",
-                "date": "2023-11-02",
-                "status": "In Review",
-                "preview": "Detailed results of soil composition and stability testing in the North West development area, covering geological surveys and foundation recommendations..."
-            }
-        ],
-        "agentTasks": [
-            {
-                "id": "task-1",
-                "title": "Generate Environmental Impact Report",
-                "description": "Create a comprehensive environmental impact assessment for the London Underground extension project, including air quality, noise pollution, and ecosystem effects analysis",
-                "estimatedTime": "45 minutes",
-                "complexity": "High",
-                "status": "Available"
-            },
-            {
-                "id": "task-2",
-                "title": "Extract Data from Building Plans",
-                "description": "Automatically extract key measurements, specifications, and technical details from uploaded architectural and engineering building plans using AI-powered document analysis",
-                "estimatedTime": "15 minutes",
-                "complexity": "Medium",
-                "status": "Available"
-            },
-            {
-                "id": "task-3",
-                "title": "Compliance Check - Building Regulations",
-                "description": "Perform automated compliance verification against current UK building regulations, safety codes, and industry standards with detailed flagging of potential issues",
-                "estimatedTime": "30 minutes",
-                "complexity": "High",
-                "status": "Available"
-            }
-        ]
-    }
+# Static chrome is prebuilt once per process; see civildoc/shell.py
+with span("page.css"):
+    render_css()
 
-# Helper functions
-def get_status_class(status):
-    status_map = {
-        "Draft": "status-draft",
-        "Completed": "status-completed", 
-        "In Review": "status-review"
-    }
-    return status_map.get(status, "status-draft")
+# The remaining modules load numpy, PIL and the stores; importing them after
+# the chrome lets a cold worker send its first bytes sooner
+from civildoc.backend import BackendError, BackendGenerator, BackendSuggestionModel, default_backend
+from civildoc.compliance import ComplianceChecker
+from civildoc.components import render_document_card, render_document_list, render_profiling_panel
+from civildoc.ingest import POOL_WORKERS, SUPPORTED_EXTENSIONS, ingest_files, make_pool, save_upload
+from civildoc.search import SearchIndex
+from civildoc.generation import StubGenerator
+from civildoc.jobs import DEFAULT_PRIORITY, PRIORITIES
+from civildoc.retrieval import EmbeddingIndex
+from civildoc.state import current_session_id, current_user_id, get_app_state, is_admin
+from civildoc.store import DocumentCache, open_store
+from civildoc.suggestions import SuggestionService
+from civildoc.task_cache import TaskResultCache
+from civildoc.tasks import TaskEngine, TASK_STEPS, CANCELLED, COMPLETED, FINISHED_STATES, PENDING, RUNNING
+from civildoc.versions import VersionStore
+
+# Shared document store, opened once per server process
+@st.cache_resource
+@timed()
+def get_document_store():
+    return open_store()
+
+# Full-text index over the same database
+@st.cache_resource
+@timed()
+def get_search_index():
+    return SearchIndex.open(get_document_store())
+
+# Shared cache of full documents, so bodies are held once per process
+@st.cache_resource
+@timed()
+def get_document_cache():
+    return DocumentCache(get_document_store())
+
+# Process pool for extracting uploaded plans, shared by every session
+@st.cache_resource
+@timed()
+def get_ingest_pool():
+    return make_pool()
+
+# Compiled building regulation rules; block results are shared by every session
+@st.cache_resource
+@timed()
+def get_compliance_checker():
+    return ComplianceChecker.from_file(executor=get_ingest_pool(), workers=POOL_WORKERS)
+
+# Writing-assistant suggestions, cached per section and shared by every session
+@st.cache_resource
+@timed()
+def get_suggestion_service():
+    client = get_backend_client()
+    return SuggestionService(model=BackendSuggestionModel(client) if client else None)
+
+# Seconds between suggestion polls while changed sections wait on the model
+SUGGESTION_POLL_INTERVAL = 1.0
+
+# Revision history of edited documents
+@st.cache_resource
+@timed()
+def get_version_store():
+    return VersionStore()
+
+# Revisions listed in the history view
+HISTORY_LIMIT = 50
+
+# Documents shown per page on the Document Management page
+DOCUMENTS_PAGE_SIZE = 20
 
+# Model backend client shared by every session, None when
+# CIVILDOC_BACKEND_URL is unset and the offline stubs are used
+@st.cache_resource
+@timed()
+def get_backend_client():
+    return default_backend()
+
+# Passage embeddings for semantic retrieval over the same database
+@st.cache_resource
+@timed()
+def get_embedding_index():
+    return EmbeddingIndex.open(get_document_store())
+
+# Passages of existing reports cited by generated reports
+RETRIEVED_PASSAGES = 3
+
+# Completed task outputs and step sections, keyed by their inputs
+@st.cache_resource
+@timed()
+def get_task_cache():
+    return TaskResultCache()
+
+# Shared task engine, one per server process
+@st.cache_resource
+@timed()
+def get_task_engine():
+    index = get_embedding_index()
+    cache = get_document_cache()
+    retriever = lambda text: index.passages(text, cache.get, k=RETRIEVED_PASSAGES)
+    client = get_backend_client()
+    generator = BackendGenerator(client, retriever) if client else StubGenerator(retriever=retriever)
+    return TaskEngine(generator=generator, cache=get_task_cache())
+
+# Seconds between progress polls while a task is running
+TASK_POLL_INTERVAL = 0.5
+
+# Seconds between job list polls while any job is queued or running
+JOB_LIST_POLL_INTERVAL = 2.0
+
+# Jobs shown in the job queue table
+JOB_LIST_LIMIT = 50
+
+# Helper functions
 def get_complexity_class(complexity):
     complexity_map = {
         "High": "complexity-high",
@@ -183,225 +134,417 @@ def get_complexity_class(complexity):
     }
     return complexity_map.get(complexity, "complexity-medium")
 
-# Initialize session state
-if 'current_page' not in st.session_state:
-    st.session_state.current_page = 'home'
-if 'selected_document' not in st.session_state:
-    st.session_state.selected_document = None
-if 'selected_task' not in st.session_state:
-    st.session_state.selected_task = None
-if 'task_running' not in st.session_state:
-    st.session_state.task_running = False
-if 'edit_mode' not in st.session_state:
-    st.session_state.edit_mode = False
-
-# Sidebar navigation
-st.sidebar.markdown("## 🏗️ CivilDoc AI")
-st.sidebar.markdown("*AI-Powered Documentation Assistant*")
-st.sidebar.markdown("---")
-
-# Navigation buttons
-if st.sidebar.button("🏠 Home", use_container_width=True):
-    st.session_state.current_page = 'home'
-    st.rerun()
-
-if st.sidebar.button("📄 Document Management", use_container_width=True):
-    st.session_state.current_page = 'documents'
-    st.rerun()
-
-if st.sidebar.button("🤖 AI Agent Tasks", use_container_width=True):
-    st.session_state.current_page = 'ai_tasks'
-    st.rerun()
-
-st.sidebar.markdown("---")
-st.sidebar.markdown("### Quick Actions")
-if st.sidebar.button("✨ Try Demo Features", use_container_width=True):
-    st.sidebar.success("Demo features are fully interactive!")
-
-st.sidebar.markdown("---")
-# Display deployment info in sidebar
-status = get_deployment_status()
-st.sidebar.markdown(f"**Environment:** {status['environment']}")
-st.sidebar.markdown(f"**Streamlit:** v{status['streamlit_version']}")
-
-# Add deployment info expander
-display_deployment_info()
+# Per-session state: ids and small view flags only
+state = get_app_state()
+record_rerun(current_session_id(), state.current_page)
+
+# Sidebar navigation; callbacks update state before the rerun, so one click is one run
+with span("page.sidebar"):
+    st.sidebar.markdown("## 🏗️ CivilDoc AI")
+    st.sidebar.markdown("*AI-Powered Documentation Assistant*")
+    st.sidebar.markdown("---")
+
+    # Navigation buttons
+    st.sidebar.button("🏠 Home", use_container_width=True, on_click=state.go_to, args=("home",))
+    st.sidebar.button("📄 Document Management", use_container_width=True, on_click=state.go_to, args=("documents",))
+    st.sidebar.button("🤖 AI Agent Tasks", use_container_width=True, on_click=state.go_to, args=("ai_tasks",))
+
+    st.sidebar.markdown("---")
+    st.sidebar.markdown("### Quick Actions")
+    if st.sidebar.button("✨ Try Demo Features", use_container_width=True):
+        st.sidebar.success("Demo features are fully interactive!")
+
+    st.sidebar.markdown("---")
+    # Display deployment info in sidebar
+    status = get_deployment_status()
+    st.sidebar.markdown(f"**Environment:** {status['environment']}")
+    st.sidebar.markdown(f"**Streamlit:** v{status['streamlit_version']}")
+
+    # Add deployment info expander
+    display_deployment_info()
 
 # Load data
-data = load_mock_data()
+store = get_document_store()
 
-# Main content based on current page
-if st.session_state.current_page == 'home':
-    # Home page
-    st.markdown('<h1 class="main-header">🏗️ CivilDoc AI</h1>', unsafe_allow_html=True)
-    st.markdown('<p class="sub-header">AI-Powered Documentation Assistant for Civil Engineers</p>', unsafe_allow_html=True)
-    
-    # Feature highlights
-    col1, col2, col3 = st.columns(3)
-    
+# Interactive regions run as fragments: clicks inside them rerun only the
+# fragment, and the static chrome around them is not sent again.
+
+def commit_revision(doc, content, message):
+    versions = get_version_store()
+    # The body from before the first edit becomes revision 1
+    if doc.get("body") and versions.head(doc["id"]) is None:
+        versions.commit(doc["id"], doc["body"], author=current_user_id(), message="Original")
+    revision = versions.commit(doc["id"], content, author=current_user_id(), message=message)
+    if revision is None:
+        return None
+    get_document_store().update_document(doc["id"], body=content)
+    get_document_cache().invalidate(doc["id"])
+    # Re-index just this document instead of rebuilding the indexes
+    get_search_index().update_document(dict(doc, body=content))
+    get_embedding_index().update_document(dict(doc, body=content))
+    return revision
+
+@timed()
+def save_document(doc):
+    content = st.session_state[f"document_body_{doc['id']}"]
+    revision = commit_revision(doc, content, "Edited")
+    get_app_state().edit_mode = False
+    if revision is None:
+        st.toast("No changes to save")
+    else:
+        st.toast(f"Document saved as revision {revision['rev']}!")
+
+def restore_revision(doc, rev):
+    revision = commit_revision(doc, get_version_store().checkout(doc["id"], rev), f"Restored revision {rev}")
+    if revision is not None:
+        st.toast(f"Revision {rev} restored as revision {revision['rev']}")
+
+@timed()
+def ingest_uploads(uploads):
+    # Files go to disk first so worker processes can read them page by page
+    names = {save_upload(upload): upload.name for upload in uploads}
+    progress = st.progress(0.0, text="Extracting pages...")
+    added = 0
+    failed = []
+    for event in ingest_files(list(names), get_document_store(), executor=get_ingest_pool(), workers=POOL_WORKERS):
+        if event["type"] == "progress" and event["pages_total"]:
+            progress.progress(
+                event["pages_done"] / event["pages_total"],
+                text=f"Extracted {event['pages_done']:,} of {event['pages_total']:,} pages"
+            )
+        elif event["type"] == "document":
+            get_document_cache().invalidate(event["document"]["id"])
+            get_search_index().update_document(event["document"])
+            get_embedding_index().update_document(event["document"])
+            added += 1
+        elif event["type"] == "failed":
+            if event["id"]:
+                get_document_cache().invalidate(event["id"])
+            failed.append(names[event["path"]])
+    if failed:
+        st.warning(f"Could not read {', '.join(failed)}. Check that the file{'s are' if len(failed) != 1 else ' is'} not damaged or password-protected.")
+    if added or not failed:
+        st.success(f"Added {added} document{'s' if added != 1 else ''} from your uploads!")
+
+@st.fragment
+@timed("page.documents")
+def documents_page():
+    # Search box and new document button
+    col1, col2 = st.columns([3, 1])
     with col1:
-        st.markdown("""
-        ### 📄 Smart Document Management
-        - Automated document creation
-        - Version control and collaboration
-        - AI-powered content suggestions
-        - Professional templates
-        """)
-    
+        search_query = st.text_input(
+            "Search documents",
+            key="document_search",
+            placeholder="🔍 Search titles and content, e.g. A42 or soil testing",
+            label_visibility="collapsed"
+        )
     with col2:
-        st.markdown("""
-        ### 🤖 AI Agent Automation
-        - Automated report generation
-        - Data extraction from plans
-        - Compliance checking
-        - Real-time progress tracking
-        """)
+        with st.popover("➕ New Document", use_container_width=True):
+            uploads = st.file_uploader(
+                "Upload building plans (PDF or images)",
+                type=[extension.lstrip(".") for extension in SUPPORTED_EXTENSIONS],
+                accept_multiple_files=True,
+                key="plan_uploads"
+            )
+            if st.button("📥 Extract and Add", disabled=not uploads, use_container_width=True):
+                ingest_uploads(uploads)
     
-    with col3:
-        st.markdown("""
-        ### 📊 Data Analysis
-        - Intelligent data processing
-        - Visualization and charts
-        - Technical specifications
-        - Quality control metrics
-        """)
+    st.markdown("---")
+    
+    # Search results, or the document list one window at a time
+    if search_query.strip():
+        hits = get_search_index().search(search_query, limit=DOCUMENTS_PAGE_SIZE)
+        results = store.get_documents([doc_id for doc_id, score in hits])
+        st.caption(f"{len(results)} matching document{'s' if len(results) != 1 else ''}" if results else "No matching documents")
+        action, doc = None, None
+        for result in results:
+            result_action = render_document_card(result)
+            if result_action:
+                action, doc = result_action, result
+    else:
+        action, doc = render_document_list(store, state.document_cursors, page_size=DOCUMENTS_PAGE_SIZE)
+    if action:
+        state.select_document(doc["id"], edit_mode=action == "edit")
     
+    # Document detail view
+    doc = get_document_cache().get(state.selected_document_id) if state.selected_document_id else None
+    if not doc:
+        return
     st.markdown("---")
     
-    # Quick stats
-    col1, col2, col3, col4 = st.columns(4)
+    col1, col2 = st.columns([3, 1])
     with col1:
-        st.metric("Documents", "3", "2 this month")
+        st.markdown(f"## 📋 {doc['title']}")
     with col2:
-        st.metric("AI Tasks Available", "3", "100% success rate")
-    with col3:
-        st.metric("Processing Time", "< 2 min", "⚡ Fast")
-    with col4:
-        st.metric("Accuracy", "99.5%", "✅ Reliable")
-
-elif st.session_state.current_page == 'documents':
-    # Document Management page
-    st.markdown("# 📄 Document Management")
-    st.markdown("Manage your engineering documents with AI-powered assistance")
+        st.button("❌ Close", on_click=state.select_document, args=(None,))
     
-    # Add new document button
-    col1, col2 = st.columns([3, 1])
+    # Document metadata
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.info(f"**Status:** {doc['status']}")
     with col2:
-        if st.button("➕ New Document", use_container_width=True):
-            st.success("New document creation feature would open here!")
-    
-    st.markdown("---")
+        st.info(f"**Created:** {doc['date']}")
+    with col3:
+        st.info(f"**Type:** Engineering Report")
     
-    # Document list
-    for doc in data["documents"]:
-        status_class = get_status_class(doc["status"])
+    # Document content
+    if state.edit_mode:
+        st.markdown("### ✏️ Edit Mode")
+        st.text_area(
+            "Document Content",
+            value=doc.get("body") or f"{doc['preview']}\n\nThis section contains the detailed document content. In a real application, this would display the complete engineering document content, including:\n\n1. Project Overview\n2. Technical Specifications\n3. Design Drawings\n4. Materials List\n5. Construction Plan\n6. Quality Control Standards\n7. Safety Requirements\n8. Environmental Impact Assessment\n\nUsers can directly edit document content here, with AI assistant providing real-time suggestions and formatting help.",
+            height=300,
+            key=f"document_body_{doc['id']}"
+        )
         
-        with st.container():
-            st.markdown(f"""
-            <div class="document-card">
-                <div style="display: flex; justify-content: between; align-items: center; margin-bottom: 1rem;">
-                    <h3 style="margin: 0; color: #1f2937;">{doc['title']}</h3>
-                    <span class="status-badge {status_class}">{doc['status']}</span>
-                </div>
-                <p style="color: #6b7280; margin-bottom: 1rem;">{doc['preview']}</p>
-                <div style="display: flex; justify-content: between; align-items: center;">
-                    <small style="color: #9ca3af;">Created: {doc['date']}</small>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+        # AI Writing Assistant
+        st.markdown("### 🤖 AI Writing Assistant")
+        with st.expander("AI Suggestions", expanded=True):
+            result = get_suggestion_service().suggest(suggestion_key(doc["id"]),
+                                                      st.session_state[f"document_body_{doc['id']}"],
+                                                      tenant=current_user_id())
+            polling = result["pending"] > 0
+            st.fragment(render_suggestions, run_every=SUGGESTION_POLL_INTERVAL if polling else None)(
+                doc["id"], result, polling
+            )
             
-            col1, col2, col3 = st.columns([1, 1, 2])
+            col1, col2, col3 = st.columns(3)
             with col1:
-                if st.button(f"👁️ View", key=f"view_{doc['id']}"):
-                    st.session_state.selected_document = doc
-                    st.session_state.edit_mode = False
+                generate_charts = st.button("📊 Generate Charts")
             with col2:
-                if st.button(f"✏️ Edit", key=f"edit_{doc['id']}"):
-                    st.session_state.selected_document = doc
-                    st.session_state.edit_mode = True
-    
-    # Document detail view
-    if st.session_state.selected_document:
-        st.markdown("---")
-        doc = st.session_state.selected_document
+                st.toggle("🔍 Check Compliance", key="live_compliance",
+                          help="Re-check the text against building regulations as you edit")
+            with col3:
+                optimize_content = st.button("✨ Optimize Content")
+            if generate_charts or optimize_content:
+                render_backend_action("charts" if generate_charts else "optimize",
+                                      st.session_state[f"document_body_{doc['id']}"])
         
-        col1, col2 = st.columns([3, 1])
-        with col1:
-            st.markdown(f"## 📋 {doc['title']}")
-        with col2:
-            if st.button("❌ Close"):
-                st.session_state.selected_document = None
-                st.rerun()
-        
-        # Document metadata
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.info(f"**Status:** {doc['status']}")
-        with col2:
-            st.info(f"**Created:** {doc['date']}")
-        with col3:
-            st.info(f"**Type:** Engineering Report")
+        if st.session_state.get("live_compliance"):
+            render_compliance_findings(st.session_state[f"document_body_{doc['id']}"])
         
-        # Document content
-        if st.session_state.edit_mode:
-            st.markdown("### ✏️ Edit Mode")
-            content = st.text_area(
-                "Document Content",
-                value=f"{doc['preview']}\n\nThis section contains the detailed document content. In a real application, this would display the complete engineering document content, including:\n\n1. Project Overview\n2. Technical Specifications\n3. Design Drawings\n4. Materials List\n5. Construction Plan\n6. Quality Control Standards\n7. Safety Requirements\n8. Environmental Impact Assessment\n\nUsers can directly edit document content here, with AI assistant providing real-time suggestions and formatting help.",
-                height=300
-            )
-            
-            # AI Writing Assistant
-            st.markdown("### 🤖 AI Writing Assistant")
-            with st.expander("AI Suggestions", expanded=True):
-                st.success("💡 **Suggestion:** You can add more technical details to improve this report")
-                st.info("📊 **Detected:** Document lacks data charts, would you like AI to generate relevant charts?")
-                st.success("✅ **Format Check:** Document structure meets engineering standards")
-                
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    if st.button("📊 Generate Charts"):
-                        st.success("Chart generation would start here!")
-                with col2:
-                    if st.button("🔍 Check Compliance"):
-                        st.success("Compliance check would run here!")
-                with col3:
-                    if st.button("✨ Optimize Content"):
-                        st.success("Content optimization would begin here!")
-            
-            if st.button("💾 Save Changes", type="primary"):
-                st.success("Document saved successfully!")
-                st.session_state.edit_mode = False
-                st.rerun()
+        st.button("💾 Save Changes", type="primary", on_click=save_document, args=(doc,))
+    else:
+        st.markdown("### 📄 Document Content")
+        if doc.get("body"):
+            st.markdown(doc["body"])
         else:
-            st.markdown("### 📄 Document Content")
             st.markdown(doc['preview'])
-            st.markdown("""
-            #### Document Details
-            
-            This section contains the detailed document content. In a real application, this would display the complete engineering document content, including:
-            
-            1. **Project Overview**
-            2. **Technical Specifications**  
-            3. **Design Drawings**
-            4. **Materials List**
-            5. **Construction Plan**
-            6. **Quality Control Standards**
-            7. **Safety Requirements**
-            8. **Environmental Impact Assessment**
-            
-            Users can directly edit document content here, with AI assistant providing real-time suggestions and formatting help.
-            """)
+            st.markdown(DOCUMENT_DETAILS_MD)
+        render_history(doc)
 
-elif st.session_state.current_page == 'ai_tasks':
-    # AI Agent Tasks page
-    st.markdown("# 🤖 AI Agent Tasks")
-    st.markdown("Select a task for the AI agent to complete for you")
+@timed()
+def render_history(doc):
+    revisions = get_version_store().history(doc["id"], limit=HISTORY_LIMIT)
+    with st.expander(f"🕘 Version History ({len(revisions)} revision{'s' if len(revisions) != 1 else ''})"):
+        if not revisions:
+            st.info("No saved revisions yet. Edits saved from Edit Mode appear here.")
+            return
+        st.dataframe(
+            [
+                {
+                    "Revision": r["rev"],
+                    "Saved": datetime.fromtimestamp(r["saved_at"]).strftime("%Y-%m-%d %H:%M"),
+                    "Author": r["author"],
+                    "Change": r["message"],
+                    "Size (KB)": round(r["size"] / 1024, 1),
+                    "Stored (KB)": round(r["stored_bytes"] / 1024, 1)
+                }
+                for r in revisions
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
+        rev = st.selectbox(
+            "View revision",
+            [r["rev"] for r in revisions],
+            format_func=lambda n: f"Revision {n}",
+            key=f"history_rev_{doc['id']}"
+        )
+        st.text_area("Revision content", get_version_store().checkout(doc["id"], rev), height=300, disabled=True,
+                     key=f"history_body_{doc['id']}_{rev}")
+        st.button("↩️ Restore this revision", disabled=rev == revisions[0]["rev"],
+                  on_click=restore_revision, args=(doc, rev))
+
+def suggestion_key(doc_id):
+    return f"{current_user_id()}:{doc_id}"
+
+SUGGESTION_ICONS = {"success": "💡", "info": "📊", "warning": "⚠️"}
+
+# Cached sections show at once; changed ones fill in as the model answers
+@timed()
+def render_suggestions(doc_id, result, polling):
+    if polling:
+        result = get_suggestion_service().suggest(suggestion_key(doc_id), st.session_state[f"document_body_{doc_id}"],
+                                                  tenant=current_user_id())
+    for section in result["sections"]:
+        for suggestion in section["suggestions"] or ():
+            show = getattr(st, suggestion["kind"], st.info)
+            show(f"{SUGGESTION_ICONS.get(suggestion['kind'], '💡')} **{section['heading'] or 'Introduction'}:** "
+                 f"{suggestion['text']}")
+    if result["pending"]:
+        st.caption(f"⏳ Updating suggestions for {result['pending']} changed section"
+                   f"{'s' if result['pending'] != 1 else ''}...")
+    if result["failed"]:
+        st.caption(f"⚠️ The writing assistant is unavailable for {result['failed']} section"
+                   f"{'s' if result['failed'] != 1 else ''}. Suggestions are requested again on the first "
+                   f"edit after {result['retry_in']:.0f} s.")
     
-    st.markdown("---")
+    # Stop polling and redraw once every section has its suggestions or
+    # is waiting out a failed model call
+    if polling and not result["pending"]:
+        st.rerun()
+
+# Only blocks changed since the last check are re-checked
+@timed()
+def render_compliance_findings(body):
+    start = time.perf_counter()
+    findings = get_compliance_checker().check(body)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    st.markdown("### 🔍 Compliance Findings")
+    if not findings:
+        st.success(f"✅ No issues found against building regulations ({elapsed_ms:.0f} ms)")
+        return
+    st.caption(f"{len(findings)} flagged clause(s), checked in {elapsed_ms:.0f} ms")
+    st.dataframe(
+        [
+            {
+                "Line": f["line"],
+                "Rule": f["rule_id"],
+                "Severity": f["severity"].title(),
+                "Section": f["section"] or "—",
+                "Issue": f["message"],
+                "Clause": f["excerpt"]
+            }
+            for f in findings
+        ],
+        hide_index=True,
+        use_container_width=True
+    )
+
+def render_backend_action(operation, text):
+    """Result of the "charts" or "optimize" backend operation on ``text``."""
+    client = get_backend_client()
+    if client is None:
+        st.success("Chart generation would start here!" if operation == "charts"
+                   else "Content optimization would begin here!")
+        return
+    try:
+        with st.spinner("Waiting for the model..."):
+            result = client.call(operation, {"text": text}, tenant=current_user_id())
+    except BackendError as exc:
+        st.error(f"The model backend failed: {exc}")
+        return
+    if operation == "charts":
+        if not result["charts"]:
+            st.info("No sections with enough figures to chart")
+        for chart in result["charts"]:
+            st.caption(chart["title"])
+            st.bar_chart(chart["values"])
+    else:
+        st.success(f"Optimized content ({result['changes']} line{'s' if result['changes'] != 1 else ''} changed)")
+        st.code(result["text"], language="markdown")
+
+def launch_task(task):
+    state = get_app_state()
+    state.selected_task_id = task["id"]
+    state.task_run_id = get_task_engine().submit(
+        task,
+        user_id=current_user_id(),
+        priority=PRIORITIES[st.session_state.get("job_priority", "Normal")]
+    )
+
+def stop_task(run_id):
+    get_task_engine().cancel(run_id)
+
+def resume_task(run_id):
+    get_task_engine().resume(run_id)
+
+# Only this fragment reruns while the task is in flight
+@timed()
+def render_task_progress(run_id, polling):
+    run = get_task_engine().status(run_id)
+    if run is None:
+        st.warning("Task run is no longer available.")
+        return
+    
+    st.progress(run["step"] / run["total_steps"])
+    if run.get("resumed_from"):
+        st.caption(f"↩️ Resumed after step {run['resumed_from']}; checkpointed steps were not run again")
+    
+    for i, step in enumerate(TASK_STEPS):
+        if i < run["step"]:
+            st.success(f"✅ **{step['name']}** - {step['desc']}")
+        elif i == run["step"] and run["status"] not in FINISHED_STATES:
+            st.info(f"🔄 **{step['name']}** - {step['desc']} (In Progress...)")
+        else:
+            st.write(f"⏳ **{step['name']}** - {step['desc']}")
+    
+    # Output streamed so far, section by section
+    if run["sections"] and run["status"] not in FINISHED_STATES:
+        st.markdown("### 📄 Generated Content")
+        st.markdown("".join(run["sections"]) + "▌")
+    
+    # Stop polling and redraw the page once the run has finished
+    if polling and run["status"] in FINISHED_STATES:
+        st.rerun()
+
+# Every queued, running and finished job, refreshed while any is active
+@timed()
+def render_job_queue(polling):
+    engine = get_task_engine()
+    counts = engine.queue.counts()
+    st.caption(" · ".join(f"{status.title()}: {n:,}" for status, n in sorted(counts.items())) or "No jobs yet")
+    
+    jobs = engine.list_jobs(limit=JOB_LIST_LIMIT)
+    if jobs:
+        now = time.time()
+        priority_names = {value: name for name, value in PRIORITIES.items()}
+        st.dataframe(
+            [{
+                "Task": job["title"],
+                "User": job["user_id"],
+                "Priority": priority_names.get(job["priority"], job["priority"]),
+                "Complexity": job["complexity"],
+                "Status": job["status"].title(),
+                "Progress": f"{job['step']}/{job['total_steps']}",
+                "Waited (s)": round((job["started_at"] or now) - job["submitted_at"], 1),
+                "Runtime (s)": round((job["finished_at"] or now) - job["started_at"], 1) if job["started_at"] else None
+            } for job in jobs],
+            hide_index=True,
+            use_container_width=True
+        )
+    
+    # Reuse of cached results by the jobs run so far
+    cache = get_task_cache().stats()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("♻️ Runs from cache", f"{cache['run_hits']:,} of {cache['run_hits'] + cache['run_misses']:,}",
+                  help="Runs on unchanged inputs return the stored report without generating anything")
+    with col2:
+        st.metric("♻️ Steps from cache", f"{cache['step_hits']:,} of {cache['step_hits'] + cache['step_misses']:,}",
+                  help="When an input changed, steps that do not depend on it are reused")
+    with col3:
+        st.metric("🗄️ Result cache size", f"{cache['bytes'] / 2**20:.1f} MB",
+                  f"{cache['evictions']:,} evicted", delta_color="off",
+                  help=f"Least recently used results are evicted above {cache['max_bytes'] / 2**20:.0f} MB")
+    
+    # Stop polling once the queue has drained
+    if polling and not counts.get(PENDING) and not counts.get(RUNNING):
+        st.rerun()
+
+@st.fragment
+@timed("page.ai_tasks")
+def ai_tasks_page():
+    st.selectbox(
+        "Priority for new jobs",
+        list(PRIORITIES),
+        index=list(PRIORITIES.values()).index(DEFAULT_PRIORITY),
+        key="job_priority"
+    )
     
     # Task list
-    for task in data["agentTasks"]:
+    for task in store.list_tasks():
         complexity_class = get_complexity_class(task["complexity"])
         
         with st.container():
@@ -418,96 +561,118 @@ elif st.session_state.current_page == 'ai_tasks':
             </div>
             """, unsafe_allow_html=True)
             
-            if st.button(f"🚀 Launch Task", key=f"launch_{task['id']}"):
-                st.session_state.selected_task = task
-                st.session_state.task_running = True
-                st.rerun()
+            st.button(f"🚀 Launch Task", key=f"launch_{task['id']}", on_click=launch_task, args=(task,))
+    
+    # Job queue
+    st.markdown("---")
+    st.markdown("### 📋 Job Queue")
+    counts = get_task_engine().queue.counts()
+    polling = bool(counts.get(PENDING) or counts.get(RUNNING))
+    st.fragment(render_job_queue, run_every=JOB_LIST_POLL_INTERVAL if polling else None)(polling)
+    
+    # A signed-in user's new session, after a refresh or an expired
+    # session, picks up their unfinished job; anonymous users are per session
+    if not state.task_run_id:
+        for job in get_task_engine().list_jobs(limit=JOB_LIST_LIMIT, user_id=current_user_id()):
+            if job["status"] in (PENDING, RUNNING):
+                state.selected_task_id, state.task_run_id = job["task_id"], job["id"]
+                break
     
     # Task execution view
-    if st.session_state.selected_task and st.session_state.task_running:
-        st.markdown("---")
-        task = st.session_state.selected_task
+    task = store.get_task(state.selected_task_id) if state.selected_task_id else None
+    if not (task and state.task_run_id):
+        return
+    st.markdown("---")
+    run = get_task_engine().status(state.task_run_id)
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.markdown(f"## 🔄 Executing: {task['title']}")
+    with col2:
+        if run is not None and run["status"] not in FINISHED_STATES:
+            st.button("⏹️ Stop Task", on_click=stop_task, args=(state.task_run_id,))
+    
+    # Task info
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.info(f"**Complexity:** {task['complexity']}")
+    with col2:
+        st.info(f"**Estimated Time:** {task['estimatedTime']}")
+    with col3:
+        st.info(f"**Status:** {run['status'].title() if run else 'Unknown'}")
+    
+    if run is not None and run["status"] == PENDING:
+        st.info("⏳ Queued behind higher-priority or shorter jobs; it starts as soon as a worker is free.")
+    
+    st.markdown("### 📋 Execution Steps")
+    
+    polling = run is not None and run["status"] not in FINISHED_STATES
+    st.fragment(render_task_progress, run_every=TASK_POLL_INTERVAL if polling else None)(
+        state.task_run_id, polling
+    )
+    
+    if run is not None and run["status"] == COMPLETED:
+        st.success("🎉 Task completed successfully!")
         
-        col1, col2 = st.columns([3, 1])
+        # Generated content
+        st.markdown("### 📄 Generated Content Preview")
+        with st.expander(task["title"], expanded=True):
+            st.markdown("".join(run["sections"]))
+            
+            if st.button("📥 Download Report"):
+                st.success("Report download would start here!")
+        
+        st.button("🔄 Run Another Task", on_click=state.clear_task)
+    elif run is not None and run["status"] in FINISHED_STATES:
+        if run["status"] == CANCELLED:
+            st.warning(f"⏹️ Task stopped after {run['step']} of {run['total_steps']} steps")
+        else:
+            st.error(f"Task ended with status: {run['status']}" + (f" ({run['error']})" if run.get("error") else ""))
+        col1, col2 = st.columns(2)
         with col1:
-            st.markdown(f"## 🔄 Executing: {task['title']}")
+            st.button("▶️ Resume Task", on_click=resume_task, args=(state.task_run_id,),
+                      help="Continue after the last finished step; finished steps are not run again")
         with col2:
-            if st.button("⏹️ Stop Task"):
-                st.session_state.task_running = False
-                st.session_state.selected_task = None
-                st.rerun()
-        
-        # Task info
-        col1, col2, col3 = st.columns(3)
+            st.button("🔄 Run Another Task", on_click=state.clear_task)
+
+# Main content based on current page
+if state.current_page == 'home':
+    # Home page
+    with span("page.home"):
+        render_home_header()
+
+        st.markdown("---")
+
+        # Quick stats
+        col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.info(f"**Complexity:** {task['complexity']}")
+            st.metric("Documents", f"{store.count_documents():,}", "2 this month")
         with col2:
-            st.info(f"**Estimated Time:** {task['estimatedTime']}")
+            st.metric("AI Tasks Available", f"{len(store.list_tasks())}", "100% success rate")
         with col3:
-            st.info("**Status:** Running")
-        
-        st.markdown("### 📋 Execution Steps")
-        
-        # Execution steps
-        steps = [
-            {"name": "Analyze Project Scope", "desc": "Collect and analyze basic project information"},
-            {"name": "Environmental Data Collection", "desc": "Gather relevant environmental data and historical records"},
-            {"name": "Impact Assessment Analysis", "desc": "Analyze potential environmental impacts of the project"},
-            {"name": "Mitigation Measures Recommendation", "desc": "Propose environmental protection and mitigation measures"},
-            {"name": "Generate Final Report", "desc": "Integrate all information to generate complete report"}
-        ]
-        
-        # Simulate progress
-        if 'step_progress' not in st.session_state:
-            st.session_state.step_progress = 0
-        
-        progress_bar = st.progress(st.session_state.step_progress / len(steps))
-        
-        for i, step in enumerate(steps):
-            if i < st.session_state.step_progress:
-                st.success(f"✅ **{step['name']}** - {step['desc']}")
-            elif i == st.session_state.step_progress:
-                st.info(f"🔄 **{step['name']}** - {step['desc']} (In Progress...)")
-            else:
-                st.write(f"⏳ **{step['name']}** - {step['desc']}")
-        
-        # Auto-progress simulation
-        if st.session_state.step_progress < len(steps):
-            time.sleep(0.1)  # Small delay for demo
-            if random.random() < 0.3:  # 30% chance to progress each refresh
-                st.session_state.step_progress += 1
-            st.rerun()
-        else:
-            st.success("🎉 Task completed successfully!")
-            
-            # Generated content
-            st.markdown("### 📄 Generated Content Preview")
-            with st.expander("Environmental Impact Report", expanded=True):
-                st.markdown("""
-                #### Report Outline:
-                
-                1. **Project Overview and Background**
-                2. **Environmental Baseline Survey** 
-                3. **Potential Environmental Impact Analysis**
-                4. **Environmental Protection Measures**
-                5. **Monitoring and Management Plan**
-                
-                ✅ **Report generation completed, meets environmental department requirements**
-                """)
-                
-                if st.button("📥 Download Report"):
-                    st.success("Report download would start here!")
-            
-            if st.button("🔄 Run Another Task"):
-                st.session_state.task_running = False
-                st.session_state.selected_task = None
-                st.session_state.step_progress = 0
-                st.rerun()
+            st.metric("Processing Time", "< 2 min", "⚡ Fast")
+        with col4:
+            st.metric("Accuracy", "99.5%", "✅ Reliable")
+
+elif state.current_page == 'documents':
+    # Document Management page
+    st.markdown("# 📄 Document Management")
+    st.markdown("Manage your engineering documents with AI-powered assistance")
+    documents_page()
+
+elif state.current_page == 'ai_tasks':
+    # AI Agent Tasks page
+    st.markdown("# 🤖 AI Agent Tasks")
+    st.markdown("Select a task for the AI agent to complete for you")
+    
+    st.markdown("---")
+    ai_tasks_page()
 
 # Footer
-st.markdown("---")
-st.markdown("""
-<div style="text-align: center; color: #9ca3af; font-size: 0.875rem;">
-    © 2023 CivilDoc AI - AI-Powered Documentation Assistant for Civil Engineers | Streamlit Demo
-</div>
-""", unsafe_allow_html=True)
+with span("page.footer"):
+    render_footer()
+
+# Profiling panel for admins, below the deployment info; rendered last so
+# it includes this run's spans
+if is_admin():
+    render_profiling_panel(current_session_id())